@@ -1,7 +1,31 @@
+import json
 import streamlit as st
-import streamlit.components.v1 as components
-import re
 import time
+import uuid
+
+from visualizer.timing import collect, import_traces, phase, profiled, timed_imports
+
+# Timed on the process's cold start and shown in the diagnostics panel; free on later reruns.
+# Modules only one feature needs (the upload parser, cProfile) are imported where it runs.
+with timed_imports("startup"):
+    import streamlit.components.v1 as components
+
+    from visualizer.cache import (
+        FRAME_CACHE_EAGER, buffer_key, lookup_parse, parse_with_key, player_cached, prerender_frames,
+        remember_parse, result_store, stage_patch_cached, stage_shell_cached, trace_cached, warm_from_store
+    )
+    from visualizer.metrics import REGISTRY, SIZE_BUCKETS, start_exporters, timer
+    from visualizer.preview import LivePreview
+    from visualizer.render import FRONTEND_DIR
+    from visualizer.sandbox import ParseLimitExceeded, stream_parse
+    from visualizer.store import enable_default_store
+
+# The app keeps its artifacts on disk by default; load the most used parses and frames from there,
+# once per process, in the background.
+enable_default_store()
+warm_from_store()
+# Publish the metrics below on METRICS_PORT and/or METRICS_FILE; also once per process.
+start_exporters()
 
 # Page configuration
 st.set_page_config(
@@ -87,402 +111,342 @@ st.markdown("""
 # ---------- SESSION STATE ----------
 if 'step' not in st.session_state:
     st.session_state.step = 0
-if 'parsed_data' not in st.session_state:
-    st.session_state.parsed_data = None
+if 'parse_ref' not in st.session_state:
+    # Only a handle on the shared result store; see current_parse()
+    st.session_state.parse_ref = None
 if 'auto_play' not in st.session_state:
     st.session_state.auto_play = False
 if 'show_animation' not in st.session_state:
     st.session_state.show_animation = False
 if 'sample' not in st.session_state:
     st.session_state.sample = None
+if 'client_player' not in st.session_state:
+    st.session_state.client_player = True
+if 'autoplay_due' not in st.session_state:
+    st.session_state.autoplay_due = 0.0
+if 'celebrate' not in st.session_state:
+    st.session_state.celebrate = False
+if 'last_trace' not in st.session_state:
+    st.session_state.last_trace = None
+if 'last_profile' not in st.session_state:
+    st.session_state.last_profile = ""
+if 'profile_pending' not in st.session_state:
+    st.session_state.profile_pending = False
+if 'stage_source' not in st.session_state:
+    st.session_state.stage_source = None
+if 'stage_request' not in st.session_state:
+    st.session_state.stage_request = None
+if 'live_preview' not in st.session_state:
+    st.session_state.live_preview = False
+if 'preview' not in st.session_state:
+    # Background parser of the editor's text while live preview is on
+    st.session_state.preview = None
+if 'preview_seen' not in st.session_state:
+    # Generation of the last live preview result counted in the metrics
+    st.session_state.preview_seen = 0
+
+# Seconds each step stays on screen during autoplay
+AUTOPLAY_INTERVAL = 1.2
+# Seconds between checks of the Analysis panel while a live preview parse is pending
+PREVIEW_POLL_INTERVAL = 0.25
+# Upload parsing: objects listed as soon as they are found, and seconds between progress updates
+UPLOAD_PREVIEW_OBJECTS = 10
+UPLOAD_PROGRESS_INTERVAL = 0.2
+
+# ---------- METRICS ----------
+# Registered on the first run; later reruns get the same metrics back. See visualizer.metrics.
+SESSIONS = REGISTRY.counter(
+    "visualizer_sessions_total", "Browser sessions started; reruns_total over this is reruns per session.")
+RERUNS = REGISTRY.counter("visualizer_reruns_total", "Full-page script reruns.")
+RERUN_SECONDS = REGISTRY.histogram("visualizer_rerun_seconds", "Wall time of full-page script reruns.")
+FRAGMENT_RUNS = REGISTRY.counter(
+    "visualizer_fragment_runs_total", "Runs of each fragment, on its own or inside a full rerun.", ["fragment"])
+PARSE_SECONDS = REGISTRY.histogram(
+    "visualizer_parse_seconds", "Time to a parse result, cached or not, by where the source came from.", ["source"])
+PARSE_ERRORS = REGISTRY.counter(
+    "visualizer_parse_errors_total", "Parse results that were an error, by where the source came from.", ["source"])
+RENDER_SECONDS = REGISTRY.histogram(
+    "visualizer_render_seconds", "Time to a rendered player, stage shell or step patch, cached or not.", ["kind"])
+HTML_BYTES = REGISTRY.histogram(
+    "visualizer_component_html_bytes", "Size of the HTML, or a step patch's JSON, handed to a component.", ["kind"],
+    buckets=SIZE_BUCKETS)
+AUTOPLAY_SESSIONS = REGISTRY.recent_gauge(
+    "visualizer_autoplay_sessions", "Sessions whose server-side player autoplayed a step recently.",
+    window=3 * AUTOPLAY_INTERVAL)
+
+if 'metrics_id' not in st.session_state:
+    # Anonymous id of this session in the metrics, set on its first run
+    st.session_state.metrics_id = uuid.uuid4().hex
+    SESSIONS.inc()
+
+# Animation stage that stays loaded in the browser and is patched step by step
+constructor_stage = components.declare_component("constructor_stage", path=FRONTEND_DIR)
+
+# Built-in examples; a session remembers the one it loaded by name, not by text
+STUDENT_SAMPLE = '''#include <iostream>
+#include <string>
+using namespace std;
 
+class Student {
+private:
+    string name;
+    int age;
+    string major;
 
-class CPPCodeParser:
-    def __init__(self):
-        self.class_name = ""
-        self.private_members = []
-        self.constructor_params = []
-        self.objects = []
-        self.error = None
+public:
+    Student(string n, int a, string m) {
+        name = n;
+        age = a;
+        major = m;
+    }
 
-    def parse(self, code: str):
-        try:
-            # Reset
-            self.class_name = ""
-            self.private_members = []
-            self.constructor_params = []
-            self.objects = []
-            self.error = None
-
-            # Extract class name
-            class_match = re.search(r'\bclass\s+(\w+)\b', code)
-            if class_match:
-                self.class_name = class_match.group(1)
-            else:
-                return {"error": "No class found. Please include a C++ class definition."}
-
-            # Extract private members (basic)
-            private_section = re.search(r'private:\s*(.*?)(?=public:|protected:|};)', code, re.DOTALL)
-            if private_section:
-                private_text = private_section.group(1)
-                members = re.findall(r'\b(\w+)\s+(\w+)\s*;', private_text)
-                self.private_members = [name for _typ, name in members]
-
-            # Extract constructor params (IMPORTANT FIX: match ClassName(...), not main(...))
-            ctor_match = re.search(rf'\b{re.escape(self.class_name)}\s*\((.*?)\)\s*(?::[^\{{]]*)?\{{', code, re.DOTALL)
-            if ctor_match:
-                params_text = ctor_match.group(1).strip()
-                if params_text:
-                    # naive param capture: take last identifier in each comma-separated param
-                    raw_params = [p.strip() for p in params_text.split(",")]
-                    params = []
-                    for p in raw_params:
-                        # remove default values
-                        p = p.split("=")[0].strip()
-                        m = re.findall(r'(\w+)\s*$', p)
-                        if m:
-                            params.append(m[-1])
-                    self.constructor_params = params
-
-            # Extract object creations in main (basic pattern: ClassName obj(...);)
-            main_section = re.search(r'\bint\s+main\s*\(.*?\)\s*\{(.*)\}', code, re.DOTALL)
-            if main_section:
-                main_text = main_section.group(1)
-                obj_pattern = rf'\b{re.escape(self.class_name)}\s+(\w+)\s*\((.*?)\)\s*;'
-                objects = re.findall(obj_pattern, main_text, re.DOTALL)
-
-                for obj_name, params_str in objects:
-                    # Split by commas (simple)
-                    raw = [p.strip() for p in params_str.split(",")] if params_str.strip() else []
-                    # Strip quotes for display
-                    cleaned = [p.strip().strip('"').strip("'") for p in raw]
-                    self.objects.append({"name": obj_name, "params": cleaned})
-
-            return {
-                "class_name": self.class_name,
-                "private_members": self.private_members,
-                "constructor_params": self.constructor_params,
-                "objects": self.objects,
-                "error": None
-            }
-
-        except Exception as e:
-            return {"error": str(e)}
-
-
-def create_animation_html(step: int, parsed_data: dict) -> str:
-    """Return FULL HTML (with CSS) for components.html() rendering."""
-    if not parsed_data or parsed_data.get("error"):
-        return "<div style='color:red;padding:20px;font-family:sans-serif;'>No valid data to display</div>"
-
-    class_name = parsed_data.get("class_name", "Student")
-    private_members = parsed_data.get("private_members", ["name", "age", "major"])
-    constructor_params = parsed_data.get("constructor_params", ["n", "a", "m"])
-    objects = parsed_data.get("objects", []) or [{"name": "student1", "params": ["Ali Raza", "20", "Computer Science"]}]
-
-    step_texts = [
-        "📌 main() calls constructor",
-        "⚡ Control transfers to constructor",
-        "📦 Parameters are being passed",
-        f"🔧 Initializing: {private_members[0] if private_members else 'member1'}",
-        f"🔧 Initializing: {private_members[1] if len(private_members) > 1 else 'member2'}",
-        f"🔧 Initializing: {private_members[2] if len(private_members) > 2 else 'member3'}",
-        "✅ Constructor completes",
-        "🔄 Control returns to main()",
-        "📢 display() method called",
-        "🎉 Object successfully created!"
-    ]
-    current_text = step_texts[step] if step < len(step_texts) else "Complete!"
-
-    # build private members html
-    private_members_html = "".join([f'<div class="private-member">• {m}</div>' for m in private_members])
-
-    # constructor body (assignment view)
-    constructor_body_html = ""
-    if 2 <= step <= 6:
-        constructor_body_html += """
-        <div class="ctor-box">
-            <h4 class="ctor-title">⚙️ Constructor Execution:</h4>
-        """
-        for i, member in enumerate(private_members):
-            if i < len(constructor_params):
-                constructor_body_html += f'<div class="ctor-line">{member} = {constructor_params[i]};</div>'
-        constructor_body_html += "</div>"
-
-    # objects html
-    objects_html = ""
-    for i, obj in enumerate(objects):
-        active = (i == 0 and step < 7)
-        bg = "#FFD700" if active else "#363636"
-        text = "black" if active else "#FFD700"
-        border = "#FFD700" if active else "#666"
-        value_color = "black" if active else "white"
-
-        status_badge = ""
-        if i == 0:
-            if 1 <= step <= 6:
-                status_badge = '<span class="status-badge creating-badge">⚡ CREATING</span>'
-            elif step >= 7:
-                status_badge = '<span class="status-badge created-badge">✓ CREATED</span>'
-
-        table_rows = ""
-        for j in range(min(3, len(private_members))):
-            value = obj["params"][j] if j < len(obj["params"]) else "..."
-            init_done = (step > j + 3 and i == 0)
-            status_class = "init-check" if init_done else "init-pending"
-            status_text = "✓ Initialized" if init_done else "○ Pending"
-
-            table_rows += f"""
-            <tr>
-                <td style="color:{text};">{private_members[j]}</td>
-                <td style="color:{value_color};">{value}</td>
-                <td><span class="{status_class}">{status_text}</span></td>
-            </tr>
-            """
+    void display() {
+        cout << "Name: " << name << ", Age: " << age << ", Major: " << major << endl;
+    }
+};
 
-        objects_html += f"""
-        <div class="obj-card" style="background:{bg};border:2px solid {border};">
-            <div class="obj-title" style="color:{text};">
-                <span>{obj["name"]}</span>
-                {status_badge}
-            </div>
-            <table class="member-table">
-                <thead>
-                    <tr><th>Member</th><th>Value</th><th>Status</th></tr>
-                </thead>
-                <tbody>
-                    {table_rows}
-                </tbody>
-            </table>
-        </div>
-        """
-
-    # parameter flow
-    parameter_html = ""
-    if 2 <= step <= 3 and objects:
-        pills = ""
-        for i, param in enumerate(constructor_params):
-            if i < len(objects[0]["params"]):
-                pills += f'<div class="parameter-pill">{param}: {objects[0]["params"][i]}</div>'
-        parameter_html = f"""
-        <div class="param-area">
-            <div class="param-row">{pills}</div>
-            <div class="arrow-animation">⬇️ ⬇️ ⬇️ PARAMETERS FLOWING TO CONSTRUCTOR ⬇️ ⬇️ ⬇️</div>
-        </div>
-        """
-
-    # control flow
-    control_html = ""
-    if step > 0:
-        control_text = "⚡ CONTROL IN main() FUNCTION" if (step < 2 or step > 6) else "🔧 CONTROL INSIDE CONSTRUCTOR"
-        control_html = f'<div class="control-flow">{control_text}</div>'
-
-    # IMPORTANT: Include CSS INSIDE this HTML because components.html() is an iframe.
-    html = f"""
-    <html>
-    <head>
-      <meta charset="utf-8" />
-      <style>
-        body {{
-          margin: 0;
-          font-family: 'Segoe UI', Arial, sans-serif;
-          color: white;
-        }}
-
-        .wrapper {{
-          border: 4px solid #4CAF50;
-          border-radius: 20px;
-          padding: 25px;
-          background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-          box-shadow: 0 20px 30px rgba(0,0,0,0.3);
-        }}
-
-        .step-badge {{
-          background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%);
-          color: black;
-          padding: 15px 25px;
-          border-radius: 50px;
-          font-weight: bold;
-          font-size: 22px;
-          text-align: center;
-          margin-bottom: 20px;
-          border: 2px solid white;
-        }}
-
-        .grid {{
-          display: flex;
-          gap: 25px;
-          margin-top: 10px;
-        }}
-
-        .class-box {{
-          background: #1E1E1E;
-          border-radius: 15px;
-          padding: 20px;
-          border: 3px solid #4CAF50;
-          box-shadow: 0 5px 15px rgba(0,0,0,0.3);
-          flex: 1;
-        }}
-
-        .object-box {{
-          background: #2D2D2D;
-          border-radius: 15px;
-          padding: 20px;
-          border: 3px solid #FFD700;
-          box-shadow: 0 5px 15px rgba(0,0,0,0.3);
-          flex: 1;
-        }}
-
-        .private-member {{
-          color: #FF6B6B;
-          font-size: 16px;
-          margin: 8px 0;
-          padding-left: 10px;
-          font-family: 'Courier New', monospace;
-        }}
-
-        .public-member {{
-          color: #6BFF6B;
-          font-size: 16px;
-          margin: 8px 0;
-          padding-left: 10px;
-          font-family: 'Courier New', monospace;
-        }}
-
-        .ctor-box {{
-          margin-top: 20px;
-          padding: 15px;
-          background: #2D2D2D;
-          border-radius: 10px;
-          border-left: 5px solid #FFD700;
-        }}
-        .ctor-title {{ color:#FFD700; margin:0 0 10px 0; }}
-        .ctor-line {{
-          color: white;
-          font-family: monospace;
-          margin: 5px 0;
-        }}
-
-        .obj-card {{
-          border-radius: 12px;
-          padding: 15px;
-          margin: 15px 0;
-          transition: all 0.3s;
-        }}
-        .obj-title {{
-          font-size: 20px;
-          font-weight: 700;
-          display:flex;
-          justify-content: space-between;
-          align-items:center;
-          margin-bottom: 10px;
-        }}
-
-        .status-badge {{
-          padding: 5px 12px;
-          border-radius: 20px;
-          font-size: 12px;
-          font-weight: 700;
-        }}
-        .creating-badge {{ background:#FFD700; color:black; }}
-        .created-badge {{ background:#4CAF50; color:white; }}
-
-        .member-table {{
-          width: 100%;
-          border-collapse: collapse;
-        }}
-        .member-table th {{
-          color: #FFD700;
-          text-align: left;
-          padding: 8px;
-          border-bottom: 2px solid #FFD700;
-        }}
-        .member-table td {{
-          padding: 8px;
-          border-bottom: 1px solid #444;
-        }}
-        .init-check {{ color:#4CAF50; font-weight: 800; }}
-        .init-pending {{ color:#BBB; }}
-
-        .param-area {{ margin-top: 25px; text-align:center; }}
-        .param-row {{
-          display:flex;
-          justify-content:center;
-          gap: 20px;
-          flex-wrap: wrap;
-          margin-bottom: 10px;
-        }}
-        .parameter-pill {{
-          background: linear-gradient(135deg, #FF6B6B 0%, #FF8E8E 100%);
-          color: white;
-          padding: 10px 18px;
-          border-radius: 30px;
-          font-weight: bold;
-          font-size: 16px;
-          border: 2px solid white;
-          box-shadow: 0 5px 10px rgba(0,0,0,0.2);
-          animation: bounce 1s infinite;
-        }}
-        @keyframes bounce {{
-          0%,100% {{ transform: translateY(0); }}
-          50% {{ transform: translateY(-8px); }}
-        }}
-
-        .arrow-animation {{
-          font-size: 18px;
-          color: #FFD700;
-          font-weight: 800;
-          margin-top: 6px;
-        }}
-
-        .control-flow {{
-          background: #2D2D2D;
-          padding: 12px;
-          border-radius: 50px;
-          text-align: center;
-          font-weight: bold;
-          font-size: 18px;
-          margin-top: 20px;
-          border: 3px solid #FFD700;
-          color: #FFD700;
-        }}
-      </style>
-    </head>
-    <body>
-      <div class="wrapper">
-        <div class="step-badge">Step {step + 1}/10: {current_text}</div>
-
-        <div class="grid">
-          <div class="class-box">
-            <h2 style="color:#4CAF50;margin-top:0;border-bottom:2px solid #4CAF50;padding-bottom:10px;">📦 {class_name} Class</h2>
-
-            <div style="margin:20px 0;">
-              <h3 style="color:#FF6B6B;margin:10px 0;">🔒 Private Members:</h3>
-              {private_members_html}
-            </div>
-
-            <div style="margin:20px 0;">
-              <h3 style="color:#6BFF6B;margin:10px 0;">🔓 Public Methods:</h3>
-              <div class="public-member">+ {class_name}({', '.join(constructor_params)})</div>
-              <div class="public-member">+ display()</div>
-            </div>
-
-            {constructor_body_html}
-          </div>
-
-          <div class="object-box">
-            <h2 style="color:#FFD700;margin-top:0;border-bottom:2px solid #FFD700;padding-bottom:10px;">🎯 Objects</h2>
-            {objects_html}
-          </div>
+int main() {
+    Student student1("Ali Raza", 20, "Computer Science");
+    student1.display();
+    return 0;
+}'''
+SAMPLES = {"student": STUDENT_SAMPLE}
+
+
+def current_parse():
+    """This session's parse result, looked up in the store shared by all sessions."""
+    ref = st.session_state.parse_ref
+    return ref.data if ref is not None else None
+
+
+def show_parse(key, parsed):
+    """Point this session at a parse result and rewind the player."""
+    if FRAME_CACHE_EAGER and not parsed.get("error"):
+        prerender_frames(key, parsed)
+    st.session_state.parse_ref = result_store.acquire(key, parsed)
+    st.session_state.step = 0
+    st.session_state.auto_play = False
+    st.session_state.show_animation = True
+
+
+def record_parse(source, seconds, parsed):
+    """Count one parse result, and how long it took to get, in the metrics."""
+    PARSE_SECONDS.labels(source).observe(seconds)
+    if parsed.get("error"):
+        PARSE_ERRORS.labels(source).inc()
+
+
+def queue_preview():
+    """Parse the editor's text in the background when live preview is on; superseded parses are dropped."""
+    if not st.session_state.live_preview:
+        if st.session_state.preview is not None:
+            st.session_state.preview.cancel()
+        return
+    if st.session_state.preview is None:
+        st.session_state.preview = LivePreview()
+    st.session_state.preview.submit(st.session_state.code_input)
+
+
+def analysis_panel(polling=False):
+    """The Analysis column, run as a fragment that polls only while a live preview parse is pending."""
+    FRAGMENT_RUNS.labels("analysis_panel").inc()
+    preview = st.session_state.preview if st.session_state.live_preview else None
+    result = preview.result if preview is not None else None
+    parsed = result.parsed if result is not None else current_parse()
+    if result is not None and result.generation != st.session_state.preview_seen:
+        st.session_state.preview_seen = result.generation
+        record_parse("preview", result.seconds, result.parsed)
+
+    if parsed and not parsed.get("error"):
+        data = parsed
+        classes = data.get('classes') or ()
+        if len(classes) > 1:
+            # One line per class or struct in the symbol table
+            summary = "".join(
+                f"<p><b>{c['kind'].capitalize()} {c['name']}:</b> {len(c['private_members'])} members, "
+                f"{len(c['constructor_params'])} constructor params</p>"
+                for c in classes
+            )
+        else:
+            summary = f"""
+            <p><b>Class:</b> {data.get('class_name', 'N/A')}</p>
+            <p><b>Private Members:</b> {len(data.get('private_members', []))}</p>
+            <p><b>Constructor Params:</b> {len(data.get('constructor_params', []))}</p>
+            """
+        st.markdown(f"""
+        <div class="success-box">
+            <h4>✅ Code Parsed Successfully!</h4>
+            {summary}
+            <p><b>Objects Found:</b> {len(data.get('objects', []))}</p>
         </div>
+        """, unsafe_allow_html=True)
+    elif parsed and parsed.get("error"):
+        st.error(f"❌ {parsed['error']}")
+
+    if preview is not None and preview.pending:
+        st.caption("⏳ Parsing your latest edit...")
+    elif result is not None:
+        st.caption(f"🔴 Live preview, parsed in {result.seconds * 1e3:.0f} ms")
+        if polling:
+            # The newest result is on screen; rerun once so the panel stops polling.
+            st.rerun()
+
+
+def server_player():
+    """Button-driven player, run as a fragment so autoplay ticks rerun only this part."""
+    FRAGMENT_RUNS.labels("server_player").inc()
+    key = st.session_state.parse_ref.key
+    parsed = current_parse()
+    last = len(trace_cached(key, parsed)) - 1
+    if st.session_state.auto_play:
+        AUTOPLAY_SESSIONS.mark(st.session_state.metrics_id)
+    else:
+        AUTOPLAY_SESSIONS.discard(st.session_state.metrics_id)
+
+    # Auto-play: each timer tick advances one step; a tick that arrives right
+    # after Play was pressed (or after a full rerun) is not yet due.
+    if st.session_state.auto_play and time.monotonic() >= st.session_state.autoplay_due:
+        if st.session_state.step < last:
+            st.session_state.step += 1
+            st.session_state.autoplay_due = time.monotonic() + AUTOPLAY_INTERVAL / 2
+
+    c1, c2, c3, c4, c5 = st.columns(5)
+    with c1:
+        if st.button("⏮️ First", use_container_width=True):
+            st.session_state.step = 0
+            st.session_state.auto_play = False
+            st.rerun()
+    with c2:
+        if st.button("⏪ Prev", use_container_width=True):
+            st.session_state.step = max(0, st.session_state.step - 1)
+            st.session_state.auto_play = False
+            st.rerun()
+    with c3:
+        play_text = "⏸️ Pause" if st.session_state.auto_play else "▶️ Play"
+        if st.button(play_text, use_container_width=True):
+            st.session_state.auto_play = not st.session_state.auto_play
+            st.session_state.autoplay_due = time.monotonic() + AUTOPLAY_INTERVAL / 2
+            st.rerun()
+    with c4:
+        if st.button("⏩ Next", use_container_width=True):
+            st.session_state.step = min(last, st.session_state.step + 1)
+            st.session_state.auto_play = False
+            st.rerun()
+    with c5:
+        if st.button("⏭️ Last", use_container_width=True):
+            st.session_state.step = last
+            st.session_state.auto_play = False
+            st.rerun()
+
+    st.session_state.step = min(st.session_state.step, last)
+    st.progress((st.session_state.step + 1) / (last + 1), text=f"**Step {st.session_state.step + 1}/{last + 1}**")
+
+    # The stage gets its shell once per parse, then one small patch per step.
+    reply = st.session_state.get("stage")
+    if reply and reply.get("request") != st.session_state.stage_request:
+        # The browser lost the shell (page reload or remount) and asked for it again.
+        st.session_state.stage_request = reply.get("request")
+        if reply.get("need_shell") == key:
+            st.session_state.stage_source = None
+    shell = None
+    if st.session_state.stage_source != key:
+        with timer(RENDER_SECONDS.labels("stage_shell")):
+            shell = stage_shell_cached(key, parsed)
+        HTML_BYTES.labels("stage_shell").observe(len(shell["html"]))
+        st.session_state.stage_source = key
+    with timer(RENDER_SECONDS.labels("stage_patch")):
+        patch = stage_patch_cached(key, st.session_state.step, parsed)
+    HTML_BYTES.labels("stage_patch").observe(len(json.dumps(patch)))
+    with phase("stage_patch", len(shell["html"]) if shell else 0):
+        constructor_stage(source=key, shell=shell, patch=patch, key="stage", default=None)
+
+    if st.session_state.auto_play and st.session_state.step >= last:
+        # A full rerun recreates the fragment without its timer.
+        st.session_state.auto_play = False
+        st.session_state.celebrate = True
+        st.rerun()
+
+
+def parse_upload(uploaded):
+    """Stream-parse an uploaded file in the sandbox, showing progress and the first objects as they are found."""
+    start = time.perf_counter()
+    buf = uploaded.getbuffer()
+    key = buffer_key(buf)
+    parsed = lookup_parse(key)
+    if parsed is None:
+        progress = st.progress(0.0, text="Scanning upload...")
+        preview = st.empty()
+
+        def show_progress(scanned, total, classes, objects, first):
+            progress.progress(scanned / max(total, 1),
+                              text=f"Scanning upload... {objects} objects of {classes} classes")
+            if objects <= UPLOAD_PREVIEW_OBJECTS:
+                preview.markdown("\n".join(
+                    f"- `{o['class_name']} {o['name']}({', '.join(o['params'])})`" for o in first
+                ))
+
+        try:
+            with phase("stream_parse", len(buf)) as p:
+                parsed = stream_parse(buf, show_progress, UPLOAD_PROGRESS_INTERVAL, UPLOAD_PREVIEW_OBJECTS)
+                p.output_size = len(parsed.get("objects") or ())
+        except ParseLimitExceeded as e:
+            parsed = {"error": str(e)}  # not remembered: whether it fits also depends on the load
+        else:
+            remember_parse(key, parsed)
+        progress.progress(1.0, text=f"Scanned {len(buf):,} bytes")
+    record_parse("upload", time.perf_counter() - start, parsed)
+    show_parse(key, parsed)
+
+
+def parse_project_upload(uploaded):
+    """Parse a zipped multi-file project, following its #include "..." directives from main."""
+    from visualizer.project import ProjectError, load_zip, parse_project
+    start = time.perf_counter()
+    try:
+        files = load_zip(uploaded.getbuffer())
+    except ProjectError as e:
+        record_parse("project", time.perf_counter() - start, {"error": str(e)})
+        st.error(str(e))
+        return
+    with phase("project_parse", sum(len(text) for text in files.values())):
+        key, parsed = parse_project(files)
+    record_parse("project", time.perf_counter() - start, parsed)
+    show_parse(key, parsed)
+
+
+def diagnostics_panel():
+    """Per-phase timings of the previous rerun, plus an opt-in cProfile capture."""
+    trace = st.session_state.last_trace
+    if trace:
+        st.caption(f"Previous rerun: {trace['seconds'] * 1000:.1f} ms")
+        st.dataframe(
+            [
+                {"phase": p["phase"], "ms": round(p["seconds"] * 1000, 3), "in": p["input_size"], "out": p["output_size"]}
+                for p in trace["phases"]
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
 
-        {parameter_html}
-        {control_html}
-      </div>
-    </body>
-    </html>
-    """
-    return html
+    for imports in import_traces():
+        with st.expander(f"Cold-start imports ({imports.name}): {imports.seconds * 1000:.1f} ms, "
+                         f"{len(imports.modules)} modules"):
+            st.caption("Per-module times: python -m benchmarks.bench_startup, which runs under -X importtime.")
+            st.dataframe(
+                [{"module": module} for module in imports.modules],
+                hide_index=True,
+                use_container_width=True
+            )
+
+    if st.session_state.profile_pending:
+        st.caption("⏳ The next rerun will be profiled.")
+    elif st.button("🔬 Profile next rerun", use_container_width=True):
+        st.session_state.profile_pending = True
+        st.rerun()
+
+    if st.session_state.last_profile:
+        with st.expander("cProfile report"):
+            st.code(st.session_state.last_profile, language="text")
 
 
 def main():
@@ -507,34 +471,27 @@ def main():
         st.markdown("## 🎯 Sample Codes")
 
         if st.button("📚 Student Class Example", use_container_width=True):
-            st.session_state.sample = '''#include <iostream>
-#include <string>
-using namespace std;
-
-class Student {
-private:
-    string name;
-    int age;
-    string major;
-
-public:
-    Student(string n, int a, string m) {
-        name = n;
-        age = a;
-        major = m;
-    }
+            st.session_state.sample = "student"
+            st.rerun()
 
-    void display() {
-        cout << "Name: " << name << ", Age: " << age << ", Major: " << major << endl;
-    }
-};
+        st.markdown("---")
+        st.markdown("## ⚙️ Player")
+        st.toggle(
+            "⚡ Instant client-side player",
+            key="client_player",
+            help="Step through and autoplay the animation in the browser without reloading the page."
+        )
+        st.toggle(
+            "🔴 Live preview",
+            key="live_preview",
+            on_change=queue_preview,
+            help="Update the Analysis panel in the background after each edit, without generating the animation."
+        )
 
-int main() {
-    Student student1("Ali Raza", 20, "Computer Science");
-    student1.display();
-    return 0;
-}'''
-            st.rerun()
+        st.markdown("---")
+        st.markdown("## 🩺 Diagnostics")
+        if st.toggle("Show timings", key="show_diagnostics"):
+            diagnostics_panel()
 
     # Main content
     col1, col2 = st.columns([3, 2])
@@ -542,113 +499,71 @@ int main() {
     with col1:
         st.markdown("### 📝 Enter Your C++ Code")
 
-        default_code = st.session_state.sample or '''#include <iostream>
-#include <string>
-using namespace std;
-
-class Student {
-private:
-    string name;
-    int age;
-    string major;
-
-public:
-    Student(string n, int a, string m) {
-        name = n;
-        age = a;
-        major = m;
-    }
-
-    void display() {
-        cout << "Name: " << name << ", Age: " << age << ", Major: " << major << endl;
-    }
-};
-
-int main() {
-    Student student1("Ali Raza", 20, "Computer Science");
-    student1.display();
-    return 0;
-}'''
+        default_code = SAMPLES.get(st.session_state.sample, STUDENT_SAMPLE)
 
         cpp_code = st.text_area(
             "##",
             value=default_code,
             height=300,
             key="code_input",
+            on_change=queue_preview,
             label_visibility="collapsed"
         )
 
         if st.button("🎬 Generate Animation", use_container_width=True):
-            parser = CPPCodeParser()
-            parsed = parser.parse(cpp_code)
-            st.session_state.parsed_data = parsed
-            st.session_state.step = 0
-            st.session_state.auto_play = False
-            st.session_state.show_animation = True
+            # Reparsed from the shown result's sections, so an edit costs what it changed.
+            ref = st.session_state.parse_ref
+            start = time.perf_counter()
+            key, parsed = parse_with_key(cpp_code, base=ref.key if ref is not None else None)
+            record_parse("editor", time.perf_counter() - start, parsed)
+            show_parse(key, parsed)
+
+        uploaded = st.file_uploader(
+            "📂 Or upload a large C++ file",
+            type=["cpp", "cc", "cxx", "h", "hpp"],
+            key="upload"
+        )
+        if uploaded is not None and st.button("📥 Parse Uploaded File", use_container_width=True):
+            parse_upload(uploaded)
+
+        project = st.file_uploader(
+            "🗂️ Or upload a project (.zip of headers and sources)",
+            type=["zip"],
+            key="project_upload"
+        )
+        if project is not None and st.button("📦 Parse Project", use_container_width=True):
+            parse_project_upload(project)
 
+    parsed = current_parse()
     with col2:
         st.markdown("### 📊 Analysis")
-        if st.session_state.parsed_data and not st.session_state.parsed_data.get("error"):
-            data = st.session_state.parsed_data
-            st.markdown(f"""
-            <div class="success-box">
-                <h4>✅ Code Parsed Successfully!</h4>
-                <p><b>Class:</b> {data.get('class_name', 'N/A')}</p>
-                <p><b>Private Members:</b> {len(data.get('private_members', []))}</p>
-                <p><b>Constructor Params:</b> {len(data.get('constructor_params', []))}</p>
-                <p><b>Objects Found:</b> {len(data.get('objects', []))}</p>
-            </div>
-            """, unsafe_allow_html=True)
-        elif st.session_state.parsed_data and st.session_state.parsed_data.get("error"):
-            st.error(f"❌ {st.session_state.parsed_data['error']}")
+        # Never blocks on a parse: each tick shows the newest finished result.
+        preview = st.session_state.preview if st.session_state.live_preview else None
+        polling = preview is not None and preview.pending
+        st.fragment(run_every=PREVIEW_POLL_INTERVAL if polling else None)(analysis_panel)(polling)
 
     # Animation Player
-    if st.session_state.show_animation and st.session_state.parsed_data and not st.session_state.parsed_data.get("error"):
+    if st.session_state.show_animation and parsed and not parsed.get("error"):
         st.markdown("---")
         st.markdown("## 🎬 Animation Player")
 
-        c1, c2, c3, c4, c5 = st.columns(5)
-        with c1:
-            if st.button("⏮️ First", use_container_width=True):
-                st.session_state.step = 0
-                st.session_state.auto_play = False
-                st.rerun()
-        with c2:
-            if st.button("⏪ Prev", use_container_width=True):
-                st.session_state.step = max(0, st.session_state.step - 1)
-                st.session_state.auto_play = False
-                st.rerun()
-        with c3:
-            play_text = "⏸️ Pause" if st.session_state.auto_play else "▶️ Play"
-            if st.button(play_text, use_container_width=True):
-                st.session_state.auto_play = not st.session_state.auto_play
-                st.rerun()
-        with c4:
-            if st.button("⏩ Next", use_container_width=True):
-                st.session_state.step = min(9, st.session_state.step + 1)
-                st.session_state.auto_play = False
-                st.rerun()
-        with c5:
-            if st.button("⏭️ Last", use_container_width=True):
-                st.session_state.step = 9
-                st.session_state.auto_play = False
-                st.rerun()
-
-        st.progress((st.session_state.step + 1) / 10, text=f"**Step {st.session_state.step + 1}/10**")
-
-        # ✅ Render animation HTML correctly (no raw HTML text)
-        html_anim = create_animation_html(st.session_state.step, st.session_state.parsed_data)
-        components.html(html_anim, height=720, scrolling=True)
-
-        # Auto-play
-        if st.session_state.auto_play:
-            if st.session_state.step < 9:
-                time.sleep(1.2)
-                st.session_state.step += 1
-                st.rerun()
-            else:
-                st.session_state.auto_play = False
-                st.balloons()
+        if st.session_state.client_player:
+            # Every step ships in one document; stepping and autoplay run in the browser.
+            key = st.session_state.parse_ref.key
+            with timer(RENDER_SECONDS.labels("player")):
+                html_player = player_cached(key, st.session_state.step, parsed)
+            HTML_BYTES.labels("player").observe(len(html_player))
+            with phase("components_html", len(html_player)):
+                components.html(html_player, height=800, scrolling=True)
+        else:
+            # While autoplaying, the fragment reruns itself on a timer instead of
+            # holding the script thread in time.sleep() between steps.
+            run_every = AUTOPLAY_INTERVAL if st.session_state.auto_play else None
+            st.fragment(run_every=run_every)(server_player)()
+
+        if st.session_state.celebrate:
+            st.session_state.celebrate = False
+            st.balloons()
 
     st.markdown("---")
     st.markdown("""
@@ -659,4 +574,16 @@ int main() {
 
 
 if __name__ == "__main__":
-    main()
+    # Every rerun is timed; it is also profiled when the diagnostics panel asked for it.
+    profile_this_run = st.session_state.profile_pending
+    st.session_state.profile_pending = False
+    try:
+        with collect("rerun") as trace, profiled(profile_this_run) as profile:
+            trace.input_size = len(st.session_state.get("code_input") or "")
+            main()
+    finally:
+        RERUNS.inc()
+        RERUN_SECONDS.observe(trace.seconds)
+        st.session_state.last_trace = trace.to_dict()
+        if profile_this_run:
+            st.session_state.last_profile = profile.text
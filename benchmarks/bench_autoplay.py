@@ -0,0 +1,171 @@
+"""Model how many concurrently autoplaying sessions one process sustains.
+
+Usage::
+
+    python -m benchmarks.bench_autoplay [--workers 16] [--interval 0.2] [--sessions 8,16,32,64,128,256]
+                                        [--tick SECONDS]
+
+This is a model of the server, not a run of it: Streamlit's ``AppTest``
+swaps a process-wide runtime on every run, so sessions of the real app
+cannot autoplay side by side in one process (see
+:mod:`benchmarks.loadtest`, which runs them in separate processes). What
+the model does take from the real app is the cost of a rerun: unless
+``--tick`` gives it, the cost of an autoplay tick is first measured by
+driving ``app.py`` through ``AppTest`` to the end of an autoplay, as
+``loadtest`` does.
+
+Every modelled session steps through the sample's execution trace, and each
+rerun renders frames with ``create_animation_html`` for as long as a real
+tick takes. Reruns execute on a fixed pool of ``--workers`` threads,
+standing in for the script threads one server process can afford.
+
+* ``sleep``: the old autoplay. Each rerun renders, then sleeps for the
+  interval on its worker before queueing the next step.
+* ``timer``: the fragment-based autoplay. Each rerun only renders, and one
+  scheduler thread queues the next step once the interval has elapsed.
+
+Lag is how long a step that is due waits for a free worker. A session count
+counts as sustained while the p95 lag stays under a quarter of the interval.
+The numbers compare the two ways of scheduling autoplay; for what a
+deployment holds, run ``benchmarks.loadtest`` against it.
+"""
+import argparse
+import heapq
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from visualizer.cache import parse_cached
+from visualizer.events import compile_trace
+from visualizer.render import create_animation_html
+
+from benchmarks.bench_parser import make_source
+
+
+class _Scheduler:
+    """Single thread that submits callbacks to a pool once they are due."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call_at(self, due, fn, *args):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (due, self._seq, fn, args))
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _due, _seq, fn, args = heapq.heappop(self._heap)
+                self._pool.submit(fn, *args)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure_tick(timeout: float = 60) -> float:
+    """Median seconds of an autoplay tick of the real app, over one session played to the end."""
+    from benchmarks.loadtest import _Session  # imports Streamlit; not needed with --tick
+
+    session = _Session(timeout)
+    session.run(steps=0, client_player=False)
+    return statistics.median(session.timings["autoplay_tick"])
+
+
+def run(mode: str, sessions: int, workers: int, interval: float, parsed: dict, tick: float = 0.0) -> float:
+    """Autoplay ``sessions`` modelled sessions to the end; return the p95 lag in seconds.
+
+    Each rerun renders its step, and renders it again until ``tick`` seconds have passed.
+    """
+    lags = []
+    lock = threading.Lock()
+    done = threading.Semaphore(0)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    trace = compile_trace(parsed)
+    scheduler = _Scheduler(pool) if mode == "timer" else None
+
+    def rerun(step, due):
+        lag = time.perf_counter() - due
+        busy_until = time.perf_counter() + tick
+        create_animation_html(step, parsed, trace)
+        while time.perf_counter() < busy_until:
+            create_animation_html(step, parsed, trace)
+        with lock:
+            lags.append(lag)
+        if step + 1 >= len(trace):
+            done.release()
+            return
+        if mode == "sleep":
+            time.sleep(interval)
+            pool.submit(rerun, step + 1, time.perf_counter())
+        else:
+            due = time.perf_counter() + interval
+            scheduler.call_at(due, rerun, step + 1, due)
+
+    start = time.perf_counter()
+    for _ in range(sessions):
+        pool.submit(rerun, 0, start)
+    for _ in range(sessions):
+        done.acquire()
+    if scheduler:
+        scheduler.stop()
+    pool.shutdown()
+    return _percentile(lags, 95)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--interval", type=float, default=0.2,
+                    help="seconds per autoplay step (the app uses 1.2)")
+    ap.add_argument("--sessions", default="8,16,32,64,128,256")
+    ap.add_argument("--tick", type=float, default=0.0,
+                    help="seconds of work per rerun (default: measure an autoplay tick of app.py)")
+    args = ap.parse_args(argv)
+
+    tick = args.tick
+    if tick <= 0:
+        tick = measure_tick()
+        print(f"measured autoplay tick of app.py: {tick * 1e3:.1f} ms (median)")
+    parsed = parse_cached(make_source(2048))
+    budget = args.interval / 4
+    sustained = {"sleep": 0, "timer": 0}
+
+    print(f"model, {tick * 1e3:.1f} ms per rerun:")
+    print(f"{'sessions':>9}{'sleep p95 lag s':>17}{'timer p95 lag s':>17}")
+    for sessions in (int(s) for s in args.sessions.split(",")):
+        row = {}
+        for mode in ("sleep", "timer"):
+            row[mode] = run(mode, sessions, args.workers, args.interval, parsed, tick)
+            if row[mode] <= budget:
+                sustained[mode] = max(sustained[mode], sessions)
+        print(f"{sessions:>9}{row['sleep']:>17.3f}{row['timer']:>17.3f}")
+    print(f"modelled max sustained sessions ({args.workers} workers, p95 lag <= {budget:.3f}s): "
+          f"sleep={sustained['sleep']} timer={sustained['timer']}")
+
+
+if __name__ == "__main__":
+    main()
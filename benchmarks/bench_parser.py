@@ -0,0 +1,170 @@
+"""Compare the single-pass parser with the legacy regex cascade.
+
+Usage::
+
+    python -m benchmarks.bench_parser [--sizes 1K,10K,100K,1M,10M] [--legacy-max 256K]
+
+Two inputs are generated at every size: a well-formed translation unit whose
+``main`` declares many objects, and a malformed one whose object declarations
+never close their argument list. The malformed case is where the lazy DOTALL
+patterns of the old parser backtrack; the legacy path is skipped above
+``--legacy-max`` so the run finishes in reasonable time.
+
+The run ends with a linearity check on adversarial inputs (see
+:data:`ADVERSARIAL`): each is parsed at doubling sizes, and the process exits
+with status 1 when doubling the input more than :data:`MAX_DOUBLING_RATIO`
+times the parse time.
+"""
+import argparse
+import re
+import sys
+import time
+
+from visualizer.parser import CPPCodeParser
+
+_HEADER = '''#include <iostream>
+#include <string>
+using namespace std;
+
+class Student {
+private:
+    string name;
+    int age;
+    string major;
+
+public:
+    Student(string n, int a, string m) {
+        name = n;
+        age = a;
+        major = m;
+    }
+};
+
+int main() {
+'''
+
+
+def legacy_parse(code: str) -> dict:
+    """The regex cascade ``CPPCodeParser.parse`` used before the tokenizer."""
+    class_match = re.search(r'\bclass\s+(\w+)\b', code)
+    if not class_match:
+        return {"error": "No class found. Please include a C++ class definition."}
+    class_name = class_match.group(1)
+    private_members = []
+    constructor_params = []
+    objects = []
+
+    private_section = re.search(r'private:\s*(.*?)(?=public:|protected:|};)', code, re.DOTALL)
+    if private_section:
+        members = re.findall(r'\b(\w+)\s+(\w+)\s*;', private_section.group(1))
+        private_members = [name for _typ, name in members]
+
+    ctor_match = re.search(rf'\b{re.escape(class_name)}\s*\((.*?)\)\s*(?::[^\{{]]*)?\{{', code, re.DOTALL)
+    if ctor_match:
+        params_text = ctor_match.group(1).strip()
+        if params_text:
+            for p in (p.strip() for p in params_text.split(",")):
+                m = re.findall(r'(\w+)\s*$', p.split("=")[0].strip())
+                if m:
+                    constructor_params.append(m[-1])
+
+    main_section = re.search(r'\bint\s+main\s*\(.*?\)\s*\{(.*)\}', code, re.DOTALL)
+    if main_section:
+        obj_pattern = rf'\b{re.escape(class_name)}\s+(\w+)\s*\((.*?)\)\s*;'
+        for obj_name, params_str in re.findall(obj_pattern, main_section.group(1), re.DOTALL):
+            raw = [p.strip() for p in params_str.split(",")] if params_str.strip() else []
+            objects.append({"name": obj_name, "params": [p.strip().strip('"').strip("'") for p in raw]})
+
+    return {"class_name": class_name, "private_members": private_members,
+            "constructor_params": constructor_params, "objects": objects, "error": None}
+
+
+def make_source(size: int, malformed: bool = False) -> str:
+    """Build a translation unit of roughly ``size`` bytes."""
+    parts = [_HEADER]
+    total = len(_HEADER)
+    i = 0
+    while total < size:
+        if malformed:
+            line = f'    Student s{i}("Name {i}", {i % 90}, "Major" // never closed\n'
+        else:
+            line = f'    Student s{i}("Name {i}", {i % 90}, "Major");  // object {i}\n'
+        parts.append(line)
+        total += len(line)
+        i += 1
+    parts.append("    return 0;\n}\n")
+    return "".join(parts)
+
+
+# Inputs that once made a pass quadratic, as functions of a repeat count.
+ADVERSARIAL = {
+    # Closers with no opener of their kind, over a deep open stack (pair_brackets).
+    "mismatched_closers": lambda n: "(" * n + "]" * n,
+    # The same inside main, so every stage of the parser sees it.
+    "mismatched_in_main": lambda n: "class A { int x; };\nint main() {" + "(" * n + "]" * n + "}\n",
+}
+LINEARITY_SIZES = (4000, 8000, 16000, 32000)
+# Doubling a linear pass about doubles its time; allow headroom for timer noise.
+MAX_DOUBLING_RATIO = 3.0
+
+
+def check_linearity(sizes=LINEARITY_SIZES) -> list:
+    """Parse every adversarial input at ``sizes``; return the cases that grew faster than linearly."""
+    failures = []
+    print(f"\n{'adversarial':<22}{'repeat':>8}{'parse s':>12}{'ratio':>8}")
+    for name, build in ADVERSARIAL.items():
+        previous = None
+        for n in sizes:
+            code = build(n)
+            seconds = min(_time(CPPCodeParser().parse, code) for _ in range(3))
+            ratio = seconds / previous if previous else float("nan")
+            print(f"{name:<22}{n:>8}{seconds:>12.4f}{ratio:>8.2f}")
+            if previous and ratio > MAX_DOUBLING_RATIO:
+                failures.append(f"{name}: x{ratio:.1f} from {n // 2} to {n}")
+            previous = max(seconds, 1e-4)  # below the timer's resolution a ratio means nothing
+    return failures
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    scale = {"K": 1024, "M": 1024 * 1024}.get(text[-1:], 1)
+    return int(float(text.rstrip("KM")) * scale)
+
+
+def _time(fn, code: str) -> float:
+    start = time.perf_counter()
+    fn(code)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1K,10K,100K,1M,10M")
+    ap.add_argument("--legacy-max", default="256K",
+                    help="largest input handed to the legacy regex parser")
+    args = ap.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    legacy_max = parse_size(args.legacy_max)
+
+    print(f"{'input':<10}{'bytes':>12}{'tokenizer s':>14}{'legacy s':>12}{'MB/s':>9}")
+    for malformed in (False, True):
+        label = "malformed" if malformed else "valid"
+        for size in sizes:
+            code = make_source(size, malformed)
+            new = _time(CPPCodeParser().parse, code)
+            if len(code) <= legacy_max:
+                legacy = f"{_time(legacy_parse, code):12.4f}"
+            else:
+                legacy = f"{'skipped':>12}"
+            print(f"{label:<10}{len(code):>12}{new:>14.4f}{legacy}{len(code) / new / 1e6:>9.1f}")
+
+    failures = check_linearity()
+    for failure in failures:
+        print(f"NOT LINEAR {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
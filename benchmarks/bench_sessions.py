@@ -0,0 +1,98 @@
+"""Measure per-session memory of the parse state for N simulated sessions.
+
+Usage::
+
+    python -m benchmarks.bench_sessions [--sessions 100,1000,5000] [--distinct 1] [--objects 1]
+
+Each session stands in for one ``st.session_state`` and submits one of
+``--distinct`` generated programs, spread round-robin. Three layouts are
+compared:
+
+* ``dict``: every session parses on its own and keeps the parser's dict of
+  lists of dicts, as the app originally did.
+* ``shared``: sessions keep the one dict the parse cache hands out.
+* ``ref``: sessions keep only a :class:`~visualizer.cache.ResultRef`; the
+  compact result lives once in the refcounted store.
+
+Memory is the growth in traced Python allocations while the sessions are
+alive, divided by the session count. The code text each session's text area
+holds is the same in every layout and is left out.
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Callable, List
+
+# Sessions are measured against the in-memory caches alone, not the on-disk store.
+os.environ.setdefault("ARTIFACT_STORE_PATH", "")
+
+from visualizer.cache import LRUCache, ResultStore, normalize_source, parse_with_key
+from visualizer.parser import CPPCodeParser
+from visualizer.sandbox import PARSE_SANDBOX, parse_pool
+
+from benchmarks.generator import generate_source
+
+
+def _sessions_dict(sources: List[str], n: int) -> list:
+    return [{"parsed_data": CPPCodeParser().parse(sources[i % len(sources)])} for i in range(n)]
+
+
+def _sessions_shared(sources: List[str], n: int) -> list:
+    cache = LRUCache()
+    shared = {}
+    sessions = []
+    for i in range(n):
+        code = sources[i % len(sources)]
+        if code not in shared:
+            shared[code] = CPPCodeParser().parse(normalize_source(code))
+        parsed = cache.get(code) or shared[code]
+        sessions.append({"parse_key": str(i % len(sources)), "parsed_data": parsed})
+    return sessions
+
+
+def _sessions_ref(sources: List[str], n: int) -> list:
+    store = ResultStore()
+    cache = LRUCache()
+    return [{"parse_ref": store.acquire(*parse_with_key(sources[i % len(sources)], cache))} for i in range(n)]
+
+
+LAYOUTS = {"dict": _sessions_dict, "shared": _sessions_shared, "ref": _sessions_ref}
+
+
+def measure(build: Callable[[List[str], int], list], sources: List[str], n: int) -> int:
+    """Bytes per session held by ``n`` sessions built with ``build``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sessions = build(sources, n)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del sessions
+    return (after - before) // n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", default="100,1000,5000")
+    ap.add_argument("--distinct", type=int, default=1, help="distinct programs across all sessions")
+    ap.add_argument("--objects", type=int, default=1, help="objects declared in each program's main()")
+    args = ap.parse_args(argv)
+
+    sources = [generate_source(objects=args.objects, seed=seed) for seed in range(max(1, args.distinct))]
+    counts = [int(n) for n in args.sessions.split(",")]
+    if PARSE_SANDBOX:
+        parse_pool()  # start the parse workers before anything is traced
+    print(f"{'sessions':>9} " + " ".join(f"{name + ' B/session':>18}" for name in LAYOUTS))
+    for n in counts:
+        row = [measure(build, sources, n) for build in LAYOUTS.values()]
+        print(f"{n:>9} " + " ".join(f"{b:>18,}" for b in row))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
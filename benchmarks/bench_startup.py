@@ -0,0 +1,120 @@
+"""Cold-start import time of app.py, checked against a budget.
+
+Usage::
+
+    python -m benchmarks.bench_startup [--runs 3] [--budget-ms 50] [--output report.json]
+
+Each run starts a fresh interpreter under ``python -X importtime``, imports
+Streamlit (the server has it loaded before any script runs) and executes
+``app.py`` once with ``AppTest``. The app times its own imports with
+:func:`visualizer.timing.timed_imports`; the report gives that total, the
+wall time of the first run, and a per-module breakdown of what the first
+run imported, read from the interpreter's import timings.
+
+The check fails, with exit status 1, when the best run's import time is over
+``--budget-ms``, or when the first run loaded any of :data:`HEAVY_MODULES`,
+which only optional features may import, and only when they are used.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+DEFAULT_BUDGET_MS = 50.0
+HEAVY_MODULES = ("numpy", "PIL", "matplotlib", "pandas", "pyarrow", "cProfile", "mmap")
+# Written to stderr right before the app runs, so -X importtime lines after it are the app's.
+_MARKER = "-- app run --"
+
+_RUN = """
+import json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+from visualizer.timing import import_traces
+
+at = AppTest.from_file({app!r}, default_timeout=120)
+print({marker!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+at.run()
+first_run_s = time.perf_counter() - start
+traces = [t.to_dict() for t in import_traces()]
+print(json.dumps({{
+    "error": str(at.exception[0].value) if at.exception else None,
+    "import_s": sum(t["seconds"] for t in traces),
+    "first_run_s": first_run_s,
+    "traces": traces,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def app_imports(stderr: str) -> List[Tuple[str, float]]:
+    """``(module, cumulative seconds)`` of each outermost import ``-X importtime`` logged after the marker."""
+    lines = stderr.split(_MARKER, 1)[-1].splitlines()
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|", 2)
+        if cumulative.strip().isdigit():
+            entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative) / 1e6))
+    if not entries:
+        return []
+    top = min(depth for depth, _name, _seconds in entries)
+    return [(name, seconds) for depth, name, seconds in entries if depth == top]
+
+
+def run_once() -> dict:
+    """Start a fresh interpreter, run the app once and return what it measured."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _RUN.format(app=APP, heavy=HEAVY_MODULES, marker=_MARKER)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["modules"] = [{"module": name, "seconds": seconds} for name, seconds in app_imports(proc.stderr)]
+    return result
+
+
+def check(best: dict, budget_ms: float) -> List[str]:
+    """Return one message per way ``best`` broke the startup budget."""
+    problems = []
+    if best["error"]:
+        problems.append(f"app raised on its first run: {best['error']}")
+    if best["import_s"] * 1e3 > budget_ms:
+        problems.append(f"imports took {best['import_s'] * 1e3:.1f} ms, budget {budget_ms:.1f} ms")
+    if best["heavy"]:
+        problems.append(f"imported at startup: {', '.join(best['heavy'])}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters; the fastest is checked")
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ap.add_argument("--output", help="also write every run as JSON here")
+    args = ap.parse_args(argv)
+
+    runs = [run_once() for _ in range(max(1, args.runs))]
+    best = min(runs, key=lambda r: r["import_s"])
+
+    print(f"imports {best['import_s'] * 1e3:.1f} ms (budget {args.budget_ms:.1f} ms), "
+          f"first run {best['first_run_s'] * 1e3:.1f} ms, best of {len(runs)}")
+    for m in sorted(best["modules"], key=lambda m: m["seconds"], reverse=True)[:15]:
+        print(f"  {m['seconds'] * 1e3:8.2f} ms  import {m['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"budget_ms": args.budget_ms, "runs": runs}, f, indent=2)
+
+    problems = check(best, args.budget_ms)
+    for line in problems:
+        print(f"OVER BUDGET {line}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
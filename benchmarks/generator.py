@@ -0,0 +1,65 @@
+"""Synthetic C++ sources for benchmarks.
+
+Each axis the parser and renderer scale with can be turned up on its own:
+the number of classes, private members per class, constructor parameters,
+objects declared in ``main`` and total file size.
+"""
+import random
+from typing import List
+
+_TYPES = (("int", "{n}"), ("double", "{n}.5"), ("string", '"value {n}"'), ("bool", "true"))
+
+
+def generate_source(classes: int = 1, members: int = 3, params: int = 3, objects: int = 1,
+                    size: int = 0, seed: int = 0) -> str:
+    """Return a compilable-looking translation unit with at least one class.
+
+    Objects are spread round-robin over the classes. When ``size`` is larger
+    than the natural size of the source, free helper functions are added
+    before ``main`` until it is reached.
+    """
+    classes = max(1, classes)
+    rng = random.Random(seed)
+    lines: List[str] = ["#include <iostream>", "#include <string>", "using namespace std;", ""]
+    ctor_types = []
+    for c in range(classes):
+        types = [_TYPES[rng.randrange(len(_TYPES))] for _ in range(max(members, params))]
+        ctor_types.append(types[:params])
+        lines.append(f"class Class{c} {{")
+        lines.append("private:")
+        for m in range(members):
+            lines.append(f"    {types[m][0]} member{m};")
+        lines.append("")
+        lines.append("public:")
+        signature = ", ".join(f"{types[p][0]} p{p}" for p in range(params))
+        lines.append(f"    Class{c}({signature}) {{")
+        for p in range(min(params, members)):
+            lines.append(f"        member{p} = p{p};")
+        lines.append("    }")
+        lines.append("")
+        lines.append("    void display() {")
+        lines.append('        cout << "Class' + str(c) + '" << endl;')
+        lines.append("    }")
+        lines.append("};")
+        lines.append("")
+
+    body = []
+    for o in range(objects):
+        c = o % classes
+        args = ", ".join(literal.format(n=o + p) for p, (_typ, literal) in enumerate(ctor_types[c]))
+        body.append(f"    Class{c} object{o}({args});")
+    body.append("    return 0;")
+
+    tail = ["int main() {"] + body + ["}", ""]
+    text = "\n".join(lines + tail)
+    if len(text) < size:
+        padding = []
+        total = len(text)
+        h = 0
+        while total < size:
+            fn = f"int helper{h}(int x) {{\n    return x * {h} + {rng.randrange(1000)};\n}}\n"
+            padding.append(fn)
+            total += len(fn)
+            h += 1
+        text = "\n".join(lines) + "\n" + "".join(padding) + "\n" + "\n".join(tail)
+    return text
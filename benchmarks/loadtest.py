@@ -0,0 +1,218 @@
+"""Drive many simulated classroom sessions through the real app script.
+
+Usage::
+
+    python -m benchmarks.loadtest [--sessions 40] [--concurrency 8] [--steps 3]
+                                  [--client-player] [--output report.json]
+
+Every session is a Streamlit ``AppTest`` running ``app.py`` end to end, the
+way a student's browser would:
+
+1. open the page;
+2. load the Student sample;
+3. click Generate Animation;
+4. click Next ``--steps`` times;
+5. press Play and autoplay to the last step.
+
+Autoplay ticks are triggered directly instead of waiting out the real 1.2 s
+interval, so the run measures server work, not timers. With
+``--client-player`` sessions use the in-browser player and stop after
+Generate, since stepping then costs the server nothing.
+
+``--concurrency`` sessions run at once. ``AppTest`` swaps a process-wide
+runtime on every run, so concurrent sessions cannot share a process. Each
+one runs in a worker process instead, and a worker reuses its warm caches
+for the next session, as a long-lived server would. The report gives rerun
+latency percentiles per action, throughput, and the total RSS of all the
+processes sampled over the run.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _rss_bytes(pid="self") -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _tree_rss_bytes() -> int:
+    """RSS of this process plus its direct children (the session workers)."""
+    try:
+        total = _rss_bytes()
+    except (OSError, ValueError):
+        import resource
+        # No /proc: fall back to this process's peak, in KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    me = str(os.getpid())
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = f.read().rsplit(")", 1)[1].split()[1]
+            if ppid == me:
+                total += _rss_bytes(pid)
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class _MemorySampler:
+    """Background thread recording ``(seconds since start, RSS bytes of the process tree)``."""
+
+    def __init__(self, every: float):
+        self.samples: List[tuple] = []
+        self._every = every
+        self._stop = threading.Event()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.samples.append((round(time.perf_counter() - self._start, 3), _tree_rss_bytes()))
+            if self._stop.wait(self._every):
+                return
+
+    def stop(self) -> List[tuple]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class _Session:
+    """One simulated student; every ``AppTest`` rerun it triggers is timed."""
+
+    def __init__(self, timeout: float):
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+
+    def _timed(self, action: str, fn) -> None:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f"{action}: {self.at.exception[0].value}")
+        self.timings[action].append(elapsed)
+
+    def _click(self, action: str, label: str) -> None:
+        button = next(b for b in self.at.button if label in b.label)
+        self._timed(action, lambda: button.click().run())
+
+    def run(self, steps: int, client_player: bool) -> None:
+        self.at.session_state.client_player = client_player
+        self._timed("open", self.at.run)
+        self._click("load_sample", "Student Class Example")
+        self._click("generate", "Generate Animation")
+        if client_player:
+            return
+        for _ in range(steps):
+            self._click("next", "Next")
+        self._click("play", "Play")
+        for _ in range(20):
+            if not self.at.session_state.auto_play:
+                break
+            # Make the next fragment tick due now rather than waiting out the interval.
+            self.at.session_state.autoplay_due = 0.0
+            self._timed("autoplay_tick", self.at.run)
+
+
+def _one_session(steps: int, client_player: bool, timeout: float) -> dict:
+    """Worker-process entry point; returns the session's timings and its error, if any."""
+    session = _Session(timeout)
+    try:
+        session.run(steps, client_player)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"timings": dict(session.timings), "error": error}
+
+
+def _percentiles(values: List[float]) -> dict:
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+    return {"count": len(ordered), "p50_ms": pick(50) * 1e3, "p90_ms": pick(90) * 1e3, "p95_ms": pick(95) * 1e3,
+            "p99_ms": pick(99) * 1e3, "max_ms": ordered[-1] * 1e3}
+
+
+def run(sessions: int, concurrency: int, steps: int, client_player: bool, timeout: float = 60,
+        sample_every: float = 0.5) -> dict:
+    timings: Dict[str, List[float]] = defaultdict(list)
+    errors: List[str] = []
+    sampler = _MemorySampler(sample_every)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_one_session, steps, client_player, timeout) for _ in range(sessions)]
+        for future in as_completed(futures):
+            result = future.result()
+            for action, values in result["timings"].items():
+                timings[action].extend(values)
+            if result["error"]:
+                errors.append(result["error"])
+    elapsed = time.perf_counter() - start
+    memory = sampler.stop()
+
+    reruns = sum(len(v) for v in timings.values())
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "client_player": client_player,
+        "seconds": round(elapsed, 3),
+        "reruns": reruns,
+        "reruns_per_second": round(reruns / elapsed, 2),
+        "sessions_per_second": round((sessions - len(errors)) / elapsed, 3),
+        "errors": errors,
+        "latency": {action: _percentiles(values) for action, values in timings.items()},
+        "overall": _percentiles([t for values in timings.values() for t in values]) if reruns else {},
+        "rss_mb": [(t, round(rss / 2 ** 20, 1)) for t, rss in memory],
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--steps", type=int, default=3, help="Next clicks before autoplay")
+    ap.add_argument("--client-player", action="store_true", help="use the in-browser player")
+    ap.add_argument("--output", help="also write the full report as JSON here")
+    args = ap.parse_args(argv)
+
+    report = run(args.sessions, args.concurrency, args.steps, args.client_player)
+
+    print(f"{report['sessions']} sessions x {report['concurrency']} concurrent in {report['seconds']}s: "
+          f"{report['reruns_per_second']} reruns/s, {report['sessions_per_second']} sessions/s")
+    print(f"{'action':<15}{'count':>7}{'p50 ms':>9}{'p90 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for action, p in list(report["latency"].items()) + [("overall", report["overall"])]:
+        if p:
+            print(f"{action:<15}{p['count']:>7}{p['p50_ms']:>9.1f}{p['p90_ms']:>9.1f}{p['p95_ms']:>9.1f}"
+                  f"{p['p99_ms']:>9.1f}{p['max_ms']:>9.1f}")
+    rss = report["rss_mb"]
+    if rss:
+        print(f"RSS MB: start {rss[0][1]}, peak {max(m for _t, m in rss)}, end {rss[-1][1]} ({len(rss)} samples)")
+    for error in report["errors"][:10]:
+        print(f"ERROR {error}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    # AppTest replaces sys.modules["__main__"] with app.py while it runs, so workers must
+    # unpickle _one_session from the package module rather than from __main__.
+    from benchmarks.loadtest import main as _main
+    sys.exit(_main())
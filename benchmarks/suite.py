@@ -0,0 +1,231 @@
+"""Parse/render benchmark suite with regression thresholds.
+
+Usage::
+
+    python -m benchmarks.suite [--output results.json] [--baseline benchmarks/baseline.json]
+                               [--threshold 0.5] [--update-baseline] [--only NAME ...]
+
+Each scenario generates a source with :func:`benchmarks.generator.generate_source`
+and measures:
+
+* ``parse_s``: best-of-``--repeat`` wall time of ``CPPCodeParser.parse``;
+* ``render_s``: best-of-``--repeat`` wall time of ``create_animation_html``
+  for :data:`RENDER_STEPS` steps spread over the execution trace, and
+  ``render_total_s``, their sum;
+* ``patch_s``: mean wall time of ``create_stage_patch`` over every step,
+  which should not grow with the number of objects or members;
+* ``reparse_s``: best-of-``--repeat`` wall time of reparsing the source
+  after a one-line edit in ``main``, through
+  :class:`~visualizer.incremental.ReparseCache` from the sections of the
+  unedited source, which should stay well under ``parse_s`` for large
+  sources;
+* ``peak_bytes``: peak traced Python memory across one parse and the
+  rendered steps.
+
+Results are written as JSON. When a baseline exists, any metric that grew by
+more than ``--threshold`` (a fraction; 0.5 means 50%) is reported and the
+process exits with status 1; so does any scenario or compared metric the
+baseline has no value for, since it would otherwise go unchecked. Every scenario also times a fixed
+pure-Python calibration workload right before it runs, and timings are
+compared relative to it, which absorbs most of the drift between a fast and
+a throttled CPU; still, refresh the stored baseline with
+``--update-baseline`` on the machine that runs the check.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from visualizer.events import compile_trace
+from visualizer.incremental import ReparseCache
+from visualizer.parser import CPPCodeParser
+from visualizer.render import create_animation_html, create_stage_patch
+
+from benchmarks.generator import generate_source
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SCENARIOS: Dict[str, dict] = {
+    "sample": dict(classes=1, members=3, params=3, objects=1),
+    "classes_50": dict(classes=50, members=3, params=3, objects=50),
+    "members_500": dict(classes=1, members=500, params=3, objects=1),
+    "params_100": dict(classes=1, members=100, params=100, objects=1),
+    "objects_2000": dict(classes=1, members=3, params=3, objects=2000),
+    "size_1mb": dict(classes=1, members=3, params=3, objects=1, size=1024 * 1024),
+    "members_50_objects_100": dict(classes=1, members=50, params=50, objects=100),
+}
+
+# Frames rendered per scenario, evenly spaced from the first step to the last.
+RENDER_STEPS = 10
+
+# Metrics compared against the baseline; per-step timings are reported only.
+COMPARED = ("parse_s", "render_total_s", "patch_s", "reparse_s", "peak_bytes")
+
+
+def _calibration_workload() -> int:
+    total = 0
+    for i in range(200_000):
+        total += len(str(i))
+    return total
+
+
+def _best(fn, repeat: int, min_time: float = 0.05) -> float:
+    """Best wall time over at least ``repeat`` runs and at least ``min_time`` seconds."""
+    best = float("inf")
+    runs = 0
+    deadline = time.perf_counter() + min_time
+    while runs < repeat or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        runs += 1
+    return best
+
+
+def _best_reparse(code: str, edited: str, repeat: int, min_time: float = 0.05) -> float:
+    """Like :func:`_best` for parsing ``edited`` incrementally, each run starting from a fresh parse of ``code``."""
+    cache = ReparseCache()
+    best = float("inf")
+    runs = 0
+    deadline = time.perf_counter() + min_time
+    while runs < repeat or time.perf_counter() < deadline:
+        cache.parse(code, key="base")  # not timed
+        start = time.perf_counter()
+        cache.parse(edited, key="edited", base="base")
+        best = min(best, time.perf_counter() - start)
+        runs += 1
+    return best
+
+
+def run_scenario(spec: dict, repeat: int = 5) -> dict:
+    code = generate_source(**spec)
+    calibration_s = _best(_calibration_workload, repeat)
+    parsed = CPPCodeParser().parse(code)
+    if parsed.get("error"):
+        raise RuntimeError(f"generated source failed to parse: {parsed['error']}")
+
+    parse_s = _best(lambda: CPPCodeParser().parse(code), repeat)
+    trace = compile_trace(parsed)
+    steps = sorted({i * (len(trace) - 1) // max(RENDER_STEPS - 1, 1) for i in range(RENDER_STEPS)})
+    render_s = [_best(lambda: create_animation_html(step, parsed, trace), repeat) for step in steps]
+    patch_s = _best(lambda: [create_stage_patch(step, parsed, trace) for step in range(len(trace))], 1) / len(trace)
+
+    # A line typed just before main's return, the common case while editing.
+    head, ret, tail = code.rpartition("    return 0;")
+    edited = head + "    // edited\n" + ret + tail
+    if ReparseCache().parse(edited) != CPPCodeParser().parse(edited):
+        raise RuntimeError("incremental reparse disagrees with a full parse")
+    reparse_s = _best_reparse(code, edited, repeat)
+
+    tracemalloc.start()
+    try:
+        parsed = CPPCodeParser().parse(code)
+        trace = compile_trace(parsed)
+        for step in steps:
+            create_animation_html(step, parsed, trace)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "source_bytes": len(code),
+        "calibration_s": calibration_s,
+        "parse_s": parse_s,
+        "render_s": render_s,
+        "render_total_s": sum(render_s),
+        "steps": len(trace),
+        "patch_s": patch_s,
+        "reparse_s": reparse_s,
+        "peak_bytes": peak,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return one message per metric that regressed beyond ``threshold``."""
+    regressions = []
+    for name, metrics in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        # How much slower the CPU was than for the baseline; memory is not scaled.
+        speed = metrics["calibration_s"] / old.get("calibration_s", metrics["calibration_s"])
+        for metric in COMPARED:
+            before, after = old.get(metric), metrics[metric]
+            if before and metric.endswith("_s"):
+                before *= speed
+            if before and after > before * (1 + threshold):
+                regressions.append(f"{name}.{metric}: {before:.6g} -> {after:.6g} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def missing(results: dict, baseline: dict) -> List[str]:
+    """Return one message per measured scenario or compared metric the baseline lacks."""
+    messages = []
+    for name, metrics in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            messages.append(f"{name}: not in the baseline")
+            continue
+        messages.extend(f"{name}.{metric}: not in the baseline" for metric in COMPARED
+                        if metric in metrics and old.get(metric) is None)
+    return messages
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--output", help="write results JSON here (default: stdout)")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.5)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="run only these scenarios")
+    args = ap.parse_args(argv)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "scenarios": {},
+    }
+    for name in args.only or SCENARIOS:
+        results["scenarios"][name] = run_scenario(SCENARIOS[name], args.repeat)
+        m = results["scenarios"][name]
+        print(f"{name:<22} parse {m['parse_s'] * 1e3:9.3f} ms  render {m['render_total_s'] * 1e3:9.3f} ms  "
+              f"patch {m['patch_s'] * 1e6:7.2f} us x {m['steps']:>6}  reparse {m['reparse_s'] * 1e3:9.3f} ms  "
+              f"peak {m['peak_bytes'] / 1024:9.1f} KiB",
+              file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline to create one", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    unchecked = missing(results, baseline)
+    for line in unchecked:
+        print(f"NO BASELINE {line}; refresh it with --update-baseline", file=sys.stderr)
+    return 1 if regressions or unchecked else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""Shared test setup.
+
+Runs before any test module imports :mod:`visualizer`, so no test reads or
+writes the developer's on-disk artifact store.
+"""
+import os
+
+import pytest
+
+os.environ["ARTIFACT_STORE_PATH"] = ""
+
+
+@pytest.fixture
+def artifact_store_path(tmp_path, monkeypatch):
+    """Give the process-wide artifact store a fresh database under ``tmp_path`` for one test."""
+    from visualizer import store
+
+    path = str(tmp_path / "artifacts.sqlite3")
+    monkeypatch.setattr(store, "_path", path)
+    monkeypatch.setattr(store, "_store", None)
+    monkeypatch.setattr(store, "_store_failed", False)
+    yield path
+    if store._store is not None:
+        store._store.close()
@@ -0,0 +1,82 @@
+"""The HTTP service answers conditional requests, streams batches, and turns crashes into JSON 500s."""
+import http.client
+import json
+import threading
+
+import pytest
+
+from visualizer import api
+from visualizer.api import ApiServer, etag
+from visualizer.cache import source_key
+
+SOURCE = "class A { int x; public: A(int v) { x = v; } };\nint main() { A a(1); A b(2); }\n"
+
+
+@pytest.fixture
+def request_():
+    server = ApiServer(("127.0.0.1", 0), workers=2, job_workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+
+    def request(method, path, body=None, headers=None):
+        connection.request(method, path, None if body is None else json.dumps(body), headers or {})
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+
+    yield request
+    connection.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_etag_and_preconditions(request_):
+    status, headers, body = request_("POST", "/parse", {"source": SOURCE})
+    assert status == 200
+    key = json.loads(body)["key"]
+    assert json.loads(body)["result"]["class_name"] == "A"
+    # RFC 9110: a POST whose If-None-Match matches fails its precondition.
+    status, headers, _ = request_("POST", "/parse", {"source": SOURCE}, {"If-None-Match": headers["ETag"]})
+    assert status == 412 and headers["ETag"] == etag(key)
+
+    status, headers, body = request_("GET", f"/frames/{key}/1")
+    assert status == 200 and body.startswith(b"<")
+    assert request_("GET", f"/frames/{key}/1", headers={"If-None-Match": headers["ETag"]})[0] == 304
+    assert request_("GET", f"/frames/{key}/1", headers={"If-None-Match": '"stale"'})[0] == 200
+    missing = {"If-None-Match": etag(key, "frame:999")}
+    assert request_("GET", f"/frames/{key}/999", headers=missing)[0] == 404
+
+
+def test_matching_tag_without_a_cached_result_is_parsed(request_):
+    fresh = SOURCE + "// never parsed before\n"
+    status, _, body = request_("POST", "/parse", {"source": fresh}, {"If-None-Match": etag(source_key(fresh))})
+    assert status == 200 and json.loads(body)["result"]["class_name"] == "A"
+
+    broken = "int x;"
+    request_("POST", "/parse", {"source": broken})
+    status, _, body = request_("POST", "/parse", {"source": broken}, {"If-None-Match": etag(source_key(broken))})
+    assert status == 200 and json.loads(body)["result"]["error"]
+
+
+def test_batch_lines_and_errors(request_):
+    status, _, body = request_("POST", "/parse", {"sources": [SOURCE, "int x;", 5]})
+    assert status == 200
+    lines = {line["index"]: line for line in map(json.loads, body.splitlines())}
+    assert lines[0]["result"]["class_name"] == "A"
+    assert lines[1]["result"]["error"]
+    assert lines[2]["status"] == 400
+
+    tag = json.loads(request_("POST", "/render", {"frames": [{"source": SOURCE, "step": 1}]})[2])["etag"]
+    _, _, body = request_("POST", "/render", {"frames": [{"source": SOURCE, "step": 1, "etag": tag}]})
+    assert json.loads(body)["not_modified"] is True
+
+
+def test_unexpected_error_is_a_json_500(request_, monkeypatch):
+    def broken(source):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(api, "parse_with_key", broken)
+    status, headers, body = request_("POST", "/parse", {"source": SOURCE + "// new"})
+    assert status == 500
+    assert headers["Content-Type"] == "application/json"
+    assert json.loads(body) == {"error": "RuntimeError: boom"}
+    assert request_("GET", "/health")[0] == 200  # the server lives on
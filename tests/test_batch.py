@@ -0,0 +1,91 @@
+"""Batch mode: output names, per-file timeouts, and retrying the files a dead worker took down."""
+import json
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from visualizer import batch
+from visualizer.parser import CPPCodeParser
+
+GOOD = "class A { int x; public: A(int v) { x = v; } };\nint main() { A a(1); }\n"
+
+
+class _Parser(CPPCodeParser):
+    """Misbehaves on marked sources; worker processes are forked after it is patched in."""
+
+    def parse(self, code):
+        if "SLOW" in code:
+            time.sleep(30)
+        if "STUCK" in code:
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])  # out of the alarm's reach
+            time.sleep(30)
+        if "CRASH" in code:
+            os._exit(1)
+        return super().parse(code)
+
+
+@pytest.fixture
+def submissions(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "CPPCodeParser", _Parser)
+    root = tmp_path / "in"
+
+    def write(files):
+        for name, text in files.items():
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_text(text)
+        return str(root), str(tmp_path / "out")
+    return write
+
+
+def _results(out):
+    with open(os.path.join(out, "results.jsonl")) as f:
+        return {rec["file"]: rec for rec in map(json.loads, f)}
+
+
+def test_outputs_mirror_paths_with_their_extension(submissions):
+    root, out = submissions({"a.cpp": GOOD, "a.cc": GOOD, "sub/a.cpp": GOOD})
+    summary = batch.run_batch(root, out, ["*.cpp", "*.cc"], workers=2, frames=True, timeout=0)
+    assert (summary["files"], summary["ok"]) == (3, 3)
+    results = _results(out)
+    assert {rec["output"] for rec in results.values()} == {"a.cpp.html", "a.cc.html", os.path.join("sub", "a.cpp.html")}
+    steps = results["a.cpp"]["steps"]
+    assert sorted(os.listdir(os.path.join(out, "a.cpp"))) == [f"step_{i + 1:02d}.html" for i in range(steps)]
+    assert json.load(open(os.path.join(out, "summary.json")))["files"] == 3
+
+
+def test_slow_and_stuck_files_time_out(submissions, monkeypatch):
+    monkeypatch.setattr(batch, "_DEADLINE_SLACK", 0.5)
+    monkeypatch.setattr(batch, "_POLL_SECONDS", 0.1)
+    root, out = submissions({"good.cpp": GOOD, "slow.cpp": GOOD + "// SLOW", "stuck.cpp": GOOD + "// STUCK"})
+    summary = batch.run_batch(root, out, ["*.cpp"], workers=2, timeout=0.3)
+    results = _results(out)
+    assert results["slow.cpp"]["error"] == "timed out after 0.3s"  # interrupted by the alarm
+    assert results["stuck.cpp"]["error"] == "timed out after 0.3s"  # its worker was killed
+    assert results["good.cpp"]["ok"]
+    assert (summary["files"], summary["errors"]) == (3, 2)
+
+
+def test_crashing_file_is_retried_alone_and_blamed_alone(submissions):
+    files = {f"ok{i}.cpp": GOOD for i in range(4)}
+    files["crash.cpp"] = GOOD + "// CRASH"
+    root, out = submissions(files)
+    summary = batch.run_batch(root, out, ["*.cpp"], workers=2, timeout=0)
+    results = _results(out)
+    assert results["crash.cpp"] == dict(results["crash.cpp"], ok=False, error="worker process died")
+    assert all(results[f"ok{i}.cpp"]["ok"] for i in range(4))
+    assert (summary["files"], summary["errors"]) == (5, 1)
+
+
+def test_alarm_is_only_armed_on_the_main_thread(tmp_path):
+    path = tmp_path / "a.cpp"
+    path.write_text(GOOD)
+    records = []
+    worker = threading.Thread(target=lambda: records.append(
+        batch.process_file(str(path), str(tmp_path), str(tmp_path / "out"), timeout=5)))
+    worker.start()
+    worker.join()
+    assert records[0]["ok"], records[0]  # signal.signal would have raised ValueError here
+    assert signal.getsignal(signal.SIGALRM) is signal.SIG_DFL
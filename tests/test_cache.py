@@ -0,0 +1,58 @@
+"""Source keys ignore only line endings and trailing whitespace; LRUCache evicts by entries and by bytes.
+
+ResultStore keeps a result exactly as long as some ResultRef holds it.
+"""
+import gc
+
+from visualizer.cache import LRUCache, ResultStore, source_key
+
+SOURCE = 'class A { int x; };\nint main() { A a("one  two"); }\n'
+
+
+def test_keys_ignore_line_endings_and_trailing_whitespace():
+    assert source_key(SOURCE.replace("\n", "\r\n")) == source_key(SOURCE)
+    assert source_key(SOURCE.replace("\n", "\r")) == source_key(SOURCE)
+    assert source_key(SOURCE + "  \n\n\t") == source_key(SOURCE.rstrip())
+
+
+def test_keys_keep_everything_else():
+    assert source_key(SOURCE.replace("one  two", "one two")) != source_key(SOURCE)
+    assert source_key(SOURCE.replace(";\n", "; \n", 1)) != source_key(SOURCE)
+    assert source_key(SOURCE.replace("\n", "\f", 1)) != source_key(SOURCE)  # splitlines would split here
+    assert source_key(SOURCE.replace("\n", " ", 1)) != source_key(SOURCE)
+    assert source_key("  " + SOURCE) != source_key(SOURCE)
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_entries=2, max_bytes=1000, sizeof=len)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # b is now the oldest
+    cache.put("c", "3")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats().evictions == 1
+
+
+def test_lru_evicts_down_to_its_byte_budget():
+    cache = LRUCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "yyyy")
+    cache.put("c", "zzzz")
+    assert "a" not in cache and len(cache) == 2 and cache.stats().bytes == 8
+    cache.put("b", "y")  # replacing an entry counts only its new size
+    assert cache.stats().bytes == 5
+    cache.put("big", "w" * 11)  # larger than the whole budget: not kept, nothing evicted for it
+    assert "big" not in cache and len(cache) == 2
+
+
+def test_result_lives_until_its_last_ref_is_dropped():
+    store = ResultStore()
+    first = store.acquire("k", {"v": 1})
+    second = store.acquire("k", {"v": 2})  # an equal source: the stored result is shared
+    assert second.data is first.data and store.refs("k") == 2
+    del first
+    assert store.get("k") == {"v": 1} and store.refs("k") == 1
+    del second
+    gc.collect()
+    assert store.get("k") is None and len(store) == 0
+    assert store.acquire("k", {"v": 3}).data == {"v": 3}  # acquired afresh once freed
@@ -0,0 +1,55 @@
+"""GIF export: one frame per distinct picture, identical output however many workers rasterize it."""
+import numpy as np
+from PIL import Image
+
+from benchmarks.generator import generate_source
+from visualizer import export
+from visualizer.events import compile_trace
+from visualizer.parser import CPPCodeParser
+
+WIDTH = 320
+
+
+def _parsed():
+    return CPPCodeParser().parse(generate_source(classes=1, members=2, params=2, objects=2))
+
+
+def test_gif_frame_count(tmp_path):
+    parsed = _parsed()
+    steps = len(compile_trace(parsed))
+    assert steps == 2 * (4 + 2 + 2)
+    result = export.export_animation(parsed, str(tmp_path / "a.gif"), WIDTH)
+    # Every step looks different, so each is held; cross-fades add at most TRANSITION_FRAMES between steps.
+    assert steps <= result["frames"] <= steps + (steps - 1) * export.TRANSITION_FRAMES
+    with Image.open(tmp_path / "a.gif") as gif:
+        assert gif.n_frames == result["frames"]
+        assert gif.size[0] == WIDTH
+        durations = []
+        for index in range(gif.n_frames):
+            gif.seek(index)
+            durations.append(gif.info["duration"])
+    # Merging frames moves their time, it never drops it; GIF rounds each duration to centiseconds.
+    total = steps * export.HOLD_MS + (steps - 1) * export.TRANSITION_MS
+    assert abs(sum(durations) - total) <= 10 * result["frames"]
+    assert result["frames"] <= sum(1 for _ in export.animation_frames(export.render_steps(parsed, WIDTH)))
+
+
+def test_workers_write_the_same_bytes(tmp_path):
+    parsed = _parsed()
+    export.export_animation(parsed, str(tmp_path / "serial.gif"), WIDTH, workers=1)
+    export.export_animation(parsed, str(tmp_path / "parallel.gif"), WIDTH, workers=2)
+    assert (tmp_path / "serial.gif").read_bytes() == (tmp_path / "parallel.gif").read_bytes()
+
+
+def test_dedupe_merges_frames_within_the_tolerance():
+    base = np.zeros((100, 100, 3), np.uint8)
+    noisy = base + export._NOISE_LEVELS  # every pixel off by the noise allowance: not a change
+    speck = base.copy()
+    speck[0, :5] = 255  # 5 of 10000 pixels: exactly the default tolerance
+    changed = base.copy()
+    changed[0, :6] = 255
+    frames = [(base, 100), (noisy, 100), (speck, 100), (changed, 100), (changed, 50)]
+    merged = list(export.dedupe(frames))
+    assert [ms for _, ms in merged] == [300, 150]
+    assert merged[0][0] is base and merged[1][0] is changed
+    assert [ms for _, ms in export.dedupe(frames, tolerance=0)] == [200, 100, 150]
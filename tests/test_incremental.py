@@ -0,0 +1,113 @@
+"""Incremental reparsing must give exactly what a full parse gives."""
+import random
+
+import pytest
+
+from benchmarks.generator import generate_source
+from visualizer.incremental import IncrementalParser, ReparseCache
+from visualizer.parser import CPPCodeParser
+
+# Fragments an edit inserts: brackets, comment and string openers, whole
+# declarations, a second main, duplicate and out-of-class definitions.
+SNIPPETS = [
+    "}", "{", ";", "(", ")", "[", "]", "/*", "*/", "//", '"', "'", 'R"(', "\n", " ", "x",
+    "int main() {", "int main() { A a(1); }", "struct C { int q; };", "class A { int y; public: A(int v) {} };",
+    "A::A(int z) {}", "Student s(1, 2);", "enum class E { P, Q };", "#if 0\n", "class Z : public A { int w; };",
+]
+
+SOURCES = [
+    generate_source(classes=3, members=3, params=3, objects=5),
+    generate_source(classes=1, members=20, params=4, objects=30),
+    "class A { int x; };\nint main() { A a(1); }\nint main() { \nstruct C { int q; };\n",
+    "struct P { int a; };\nP::P(int a) {}\nclass Q { int b; public: Q(int b) {} };\nint main() { P p(1); Q q(2); }\n",
+]
+
+
+def _edit(rnd, text):
+    a = rnd.randrange(len(text) + 1)
+    b = min(len(text), a + rnd.choice([0, 0, 1, 3, 10, 40]))
+    insert = rnd.choice(SNIPPETS) if rnd.random() < 0.8 else ""
+    return text[:a] + insert + text[b:]
+
+
+@pytest.mark.parametrize("seed", range(len(SOURCES)))
+def test_random_edits_match_full_parse(seed):
+    rnd = random.Random(seed)
+    source = SOURCES[seed]
+    parser = IncrementalParser()
+    text = source
+    for trial in range(750):
+        text = _edit(rnd, text)
+        if rnd.random() < 0.03:
+            text = source
+        assert parser.parse(text) == CPPCodeParser().parse(text), (trial, text)
+
+
+def test_second_unterminated_main_does_not_hide_later_classes():
+    code = "class A { int x; };\nint main() { A a(1); }\nint main() { \nstruct C { int q; };\n"
+    result = IncrementalParser().parse(code)
+    assert [c["name"] for c in result["classes"]] == ["A", "C"]
+
+
+def test_removing_the_first_main_promotes_the_second():
+    parser = IncrementalParser()
+    first = "class A { int x; };\nint main() { A a(1); }\nint main() { A b(2); }\n"
+    parser.parse(first)
+    edited = first.replace("int main() { A a(1); }\n", "")
+    assert parser.parse(edited) == CPPCodeParser().parse(edited)
+    assert [o["name"] for o in parser.parse(edited)["objects"]] == ["b"]
+
+
+def test_edit_rescans_only_the_changed_section():
+    source = generate_source(classes=20, members=3, params=3, objects=5)
+    parser = IncrementalParser()
+    parser.parse(source)
+    at = source.index("class", len(source) // 2)
+    parser.parse(source[:at] + "struct Extra { int e; };\n" + source[at:])
+    assert 0 < parser.rescanned < len(source) // 4
+
+
+def test_reparse_cache_starts_from_base():
+    cache = ReparseCache(max_entries=2)
+    source = generate_source(classes=10, members=3, params=3, objects=5)
+    cache.parse(source, key="k1")
+    edited = source + "\nstruct Late { int z; };\n"
+    assert cache.parse(edited, key="k2", base="k1") == CPPCodeParser().parse(edited)
+
+
+def test_class_head_is_not_cut_at_a_closing_brace():
+    code = "{class Z:}{"
+    assert IncrementalParser().parse(code) == CPPCodeParser().parse(code)
+
+
+def test_repeated_out_of_class_constructor_does_not_hide_later_code():
+    code = "{A::A(}A::A(class Z{"
+    assert IncrementalParser().parse(code) == CPPCodeParser().parse(code)
+
+
+def test_split_is_linear_on_mismatched_closers():
+    from tests.test_parser import _best_time
+
+    def source(n):
+        return "class A { int x; };\n" + "(" * n + "]" * n
+    parse = lambda code: IncrementalParser().parse(code)
+    ratio = _best_time(parse, source(16000)) / max(_best_time(parse, source(4000)), 1e-4)
+    assert ratio < 8, ratio
+
+
+def test_edit_inside_main_rescans_only_its_statement():
+    source = generate_source(classes=2, members=3, params=3, objects=2000)
+    parser = IncrementalParser()
+    parser.parse(source)
+    line = "    Class1 object1001("
+    edited = source.replace(line, "    Class1 renamed(", 1)
+    assert parser.parse(edited) == CPPCodeParser().parse(edited)
+    assert 0 < parser.rescanned < 200
+    assert "renamed" in [o["name"] for o in parser.parse(edited)["objects"]]
+    # A statement added in the middle, and one removed.
+    at = edited.index("    Class0 object1000(")
+    added = edited[:at] + "    Class0 extra(1, 2, 3);\n" + edited[at:]
+    assert parser.parse(added) == CPPCodeParser().parse(added)
+    assert 0 < parser.rescanned < 200
+    assert parser.parse(edited) == CPPCodeParser().parse(edited)
+    assert parser.rescanned < 200
@@ -0,0 +1,49 @@
+"""The registry renders Prometheus text: HELP and TYPE lines, escaped labels, cumulative histogram buckets."""
+import pytest
+
+from visualizer.metrics import Registry
+
+
+def test_help_and_type_lines():
+    registry = Registry()
+    registry.counter("jobs_total", 'Jobs done, by "kind".\nSecond line \\ here.').inc(2)
+    registry.gauge("queue_depth", "Jobs waiting.").set(3)
+    assert registry.render() == (
+        '# HELP jobs_total Jobs done, by "kind".\\nSecond line \\\\ here.\n'
+        "# TYPE jobs_total counter\n"
+        "jobs_total 2\n"
+        "# HELP queue_depth Jobs waiting.\n"
+        "# TYPE queue_depth gauge\n"
+        "queue_depth 3\n"
+    )
+
+
+def test_label_values_are_escaped():
+    counter = Registry().counter("requests_total", "Requests.", ["path"])
+    counter.labels('a"b\\c\nd').inc()
+    assert 'requests_total{path="a\\"b\\\\c\\nd"} 1' in counter.render().splitlines()
+
+
+def test_counter_children_only_go_up():
+    counter = Registry().counter("errors_total", "Errors.", ["kind"])
+    child = counter.labels("io")
+    child.inc(1.5)
+    assert not hasattr(child, "dec") and not hasattr(child, "set")
+    with pytest.raises(ValueError):
+        child.inc(-1)
+    with pytest.raises(ValueError):
+        counter.labels("io").inc(-1)
+    assert child.get() == 1.5
+
+
+def test_histogram_buckets_sum_and_count():
+    histogram = Registry().histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels("/x").observe(value)
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="/x",le="0.1"} 2',  # a value on a bound counts in that bucket
+        'latency_seconds_bucket{route="/x",le="1"} 3',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'latency_seconds_sum{route="/x"} 3.65',
+        'latency_seconds_count{route="/x"} 4',
+    ]
@@ -0,0 +1,41 @@
+"""compact() results equal the parser's dicts as Mappings, pickle, and refuse mutation."""
+import pickle
+
+import pytest
+
+from benchmarks.generator import generate_source
+from visualizer.model import ParseResult, compact
+from visualizer.parser import CPPCodeParser
+
+
+def _plain(value):
+    """``value`` with every Mapping made a dict and every tuple a list, as JSON would read it back."""
+    if hasattr(value, "keys"):
+        return {key: _plain(value[key]) for key in value}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+@pytest.mark.parametrize("source", [
+    "class A { int x; public: A(int v) { x = v; } };\nint main() { A a(1); A b(2, 3); }\n",
+    generate_source(classes=3, members=4, params=3, objects=30),
+])
+def test_compact_round_trips_to_equal_mappings(source):
+    parsed = CPPCodeParser().parse(source)
+    result = compact(parsed)
+    assert isinstance(result, ParseResult)
+    assert _plain(result) == _plain(parsed) == result.to_dict()
+    assert dict(result.objects[0]) == dict(result.objects[0].to_dict(), params=result.objects[0].params)
+    assert compact(result) is result
+    assert pickle.loads(pickle.dumps(result)).to_dict() == result.to_dict()
+
+
+def test_errors_pass_through_and_results_are_read_only():
+    error = {"error": "no class found"}
+    assert compact(error) is error
+    result = compact(CPPCodeParser().parse("class A { int x; };\nint main() { A a(1); }\n"))
+    with pytest.raises(AttributeError):
+        result.class_name = "B"
+    with pytest.raises(KeyError):
+        result["missing"]
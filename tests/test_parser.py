@@ -0,0 +1,117 @@
+"""Behavior of the tokenizer, bracket pairing and the single-pass parser."""
+import time
+
+from visualizer.parser import CPPCodeParser, pair_brackets, tokenize
+
+SAMPLE = '''
+class Student {
+private:
+    string name;
+    int age;
+public:
+    Student(string n, int a) { name = n; age = a; }
+};
+
+int main() {
+    Student s("Ann", 20);
+    return 0;
+}
+'''
+
+
+def _pairs(code):
+    tokens = list(tokenize(code))
+    return [(tokens[i].text, partner) for i, partner in enumerate(pair_brackets(tokens)) if partner >= 0]
+
+
+def test_parse_sample():
+    result = CPPCodeParser().parse(SAMPLE)
+    assert result["error"] is None
+    assert result["class_name"] == "Student"
+    assert result["private_members"] == ["name", "age"]
+    assert result["constructor_params"] == ["n", "a"]
+    assert result["objects"] == [{"name": "s", "params": ["Ann", "20"], "class_name": "Student"}]
+
+
+MULTI_CLASS = '''
+class Account {
+    string owner; double balance;
+public:
+    Account(string o, double b);
+};
+Account::Account(string o, double b) { owner = o; balance = b; }
+struct Point { int x; int y; Point(int px, int py) { x = px; y = py; } };
+class Empty { int unused; };
+int main() {
+    Point origin(0, 0);
+    Account acct("Ann", 10.5);
+    Point p(1, 2), q(3, 4);
+    Empty e;
+    return 0;
+}
+'''
+
+
+def test_objects_of_several_classes_get_their_own_constructor():
+    result = CPPCodeParser().parse(MULTI_CLASS)
+    assert result["class_name"] == "Account" and result["constructor_params"] == ["o", "b"]
+    assert result["classes"] == [
+        {"name": "Account", "kind": "class", "private_members": ["owner", "balance"], "constructor_params": ["o", "b"]},
+        {"name": "Point", "kind": "struct", "private_members": ["x", "y"], "constructor_params": ["px", "py"]},
+        {"name": "Empty", "kind": "class", "private_members": ["unused"], "constructor_params": []},
+    ]
+    assert result["objects"] == [
+        {"name": "origin", "params": ["0", "0"], "class_name": "Point"},
+        {"name": "acct", "params": ["Ann", "10.5"], "class_name": "Account"},
+        {"name": "p", "params": ["1", "2"], "class_name": "Point"},
+        {"name": "q", "params": ["3", "4"], "class_name": "Point"},
+    ]
+    # The declaration scan behind project and incremental parsing builds the same symbols.
+    parser = CPPCodeParser()
+    tokens = list(tokenize(MULTI_CLASS))
+    classes, in_class, ctors, _main = parser._scan_declarations(tokens, pair_brackets(tokens))
+    assert in_class == {"Account", "Point"} and ctors == {"Account": ["o", "b"]}
+    assert classes == result["classes"]
+
+
+def test_no_class_is_an_error():
+    assert CPPCodeParser().parse("int main() { return 0; }")["error"]
+
+
+def test_comments_and_strings_hide_brackets():
+    assert _pairs('f("(", /* [ */ x)') == [("(", 5)]
+
+
+def test_closer_closes_brackets_left_open_inside_it():
+    # ")" closes "[" and "(" alike; "}" pairs with "{" after the stray ")".
+    assert _pairs("f(a[1), {b)}") == [("(", 5), ("[", 5), ("{", 10)]
+
+
+def test_unterminated_openers_map_to_the_end():
+    tokens = list(tokenize("((x"))
+    assert pair_brackets(tokens) == [3, 3, -1]
+
+
+def _best_time(fn, arg, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_pair_brackets_is_linear_on_mismatched_closers():
+    small = list(tokenize("(" * 4000 + "]" * 4000))
+    large = list(tokenize("(" * 16000 + "]" * 16000))
+    # Four times the input: about 4x when linear, 16x when quadratic.
+    ratio = _best_time(pair_brackets, large) / max(_best_time(pair_brackets, small), 1e-4)
+    assert ratio < 8, ratio
+
+
+def test_parse_is_linear_on_mismatched_closers():
+    def source(n):
+        return "class A { int x; };\nint main() {" + "(" * n + "]" * n + "}\n"
+    parse = lambda code: CPPCodeParser().parse(code)
+    ratio = _best_time(parse, source(16000)) / max(_best_time(parse, source(4000)), 1e-4)
+    assert ratio < 8, ratio
@@ -0,0 +1,74 @@
+"""The player page carries the trace spec, not one patch per step, and trace.js rebuilds the server's patches."""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from benchmarks.generator import generate_source
+from visualizer import render
+from visualizer.events import compile_trace
+from visualizer.parser import CPPCodeParser
+
+FRONTEND = os.path.join(os.path.dirname(render.__file__), "frontend")
+
+SAMPLE = '''
+class Student {
+    string name; int age; string major;
+public:
+    Student(string n, int a, string m) { name = n; age = a; major = m; }
+};
+struct Point { int x; int y; Point(int px, int py) { x = px; y = py; } };
+int main() {
+    Student s1("Ann <Lee>", 20, "CS & Math");
+    Point p(1, 2);
+    Student s2("O'Brien", 21);
+    return 0;
+}
+'''
+
+
+def _sizes(objects):
+    parsed = CPPCodeParser().parse(generate_source(classes=2, members=20, params=20, objects=objects))
+    spec = render.trace_spec(compile_trace(parsed))
+    return len(render.create_player_html(parsed).encode()), len(json.dumps(spec["objects"]).encode())
+
+
+def test_player_grows_with_the_objects_not_the_steps():
+    (small, small_objects), (large, large_objects) = _sizes(1000), _sizes(3000)
+    # 20 members and parameters make 44 steps per object: a patch each would add kilobytes per object,
+    # whereas the page should only grow by the objects' own names and arguments.
+    assert large - small <= 1.05 * (large_objects - small_objects)
+    assert small - small_objects < 64 * 1024
+
+
+def test_player_ships_the_spec_and_a_virtual_list_flag():
+    parsed = CPPCodeParser().parse(generate_source(objects=render.VIRTUAL_LIST_THRESHOLD + 1))
+    html = render.create_player_html(parsed)
+    assert "const VIRTUAL_LIST = true;" in html and "PATCHES" not in html
+    assert '"rows"' not in html  # the list is built from TRACE in the page
+
+
+def _run_trace_js(parsed):
+    trace = compile_trace(parsed)
+    script = "".join(open(os.path.join(FRONTEND, name), encoding="utf-8").read()
+                     for name in ("object_list.js", "trace.js"))
+    script += f"""
+        const trace = compileTrace({json.dumps(render.trace_spec(trace))});
+        const patches = [];
+        for (let step = 0; step < trace.total; step++) patches.push(stepPatch(trace, step));
+        process.stdout.write(JSON.stringify({{patches: patches, list: traceObjectList(trace)}}));
+    """
+    result = subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True)
+    return trace, json.loads(result.stdout)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+@pytest.mark.parametrize("source", [SAMPLE, generate_source(classes=3, members=2, params=4, objects=60)])
+def test_trace_js_builds_the_server_patches(source):
+    parsed = CPPCodeParser().parse(source)
+    trace, built = _run_trace_js(parsed)
+    assert built["patches"] == [render.create_stage_patch(step, parsed, trace) for step in range(len(trace))]
+    if len(trace.objects) > render.VIRTUAL_LIST_THRESHOLD:
+        assert built["list"] == render.create_stage_shell(parsed, trace)["object_list"]
@@ -0,0 +1,65 @@
+"""LivePreview publishes only the newest text's result, whatever order the parses finish in."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from visualizer.preview import LivePreview
+
+
+class _Parser:
+    """Stands in for parse_with_key; a text listed in ``hold`` blocks until it is released."""
+
+    def __init__(self, *hold):
+        self.started = {text: threading.Event() for text in hold}
+        self.release = {text: threading.Event() for text in hold}
+        self.calls = []
+
+    def __call__(self, code, base=None):
+        self.calls.append((code, base))
+        if code in self.started:
+            self.started[code].set()
+            assert self.release[code].wait(5)
+        return f"key-{code}", {"text": code}
+
+
+def test_newer_edit_supersedes_a_running_parse():
+    parse = _Parser("old")
+    pool = ThreadPoolExecutor(max_workers=2)
+    preview = LivePreview(parse, debounce=0, pool=pool)
+    preview.submit("old")
+    assert parse.started["old"].wait(5)
+    generation = preview.submit("new")
+    result = preview.wait(5)
+    assert (result.generation, result.parsed) == (generation, {"text": "new"})
+
+    parse.release["old"].set()
+    pool.shutdown(wait=True)  # the stale parse has finished now
+    assert preview.result is result
+    assert preview.base == "key-new"
+    assert not preview.pending
+
+
+def test_queued_parse_of_outdated_text_never_runs():
+    parse = _Parser("first")
+    pool = ThreadPoolExecutor(max_workers=1)
+    preview = LivePreview(parse, debounce=0, pool=pool)
+    preview.submit("first")
+    assert parse.started["first"].wait(5)
+    preview.submit("second")  # queued behind first
+    preview.submit("third")  # cancels second while it is still queued
+    parse.release["first"].set()
+    pool.shutdown(wait=True)
+    assert [code for code, _base in parse.calls] == ["first", "third"]
+    assert preview.result.parsed == {"text": "third"}
+    assert preview.result.generation == preview.generation
+
+
+def test_cancel_discards_the_running_parse():
+    parse = _Parser("text")
+    pool = ThreadPoolExecutor(max_workers=1)
+    preview = LivePreview(parse, debounce=0, pool=pool)
+    preview.submit("text")
+    assert parse.started["text"].wait(5)
+    preview.cancel()
+    parse.release["text"].set()
+    pool.shutdown(wait=True)
+    assert preview.result is None
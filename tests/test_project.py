@@ -0,0 +1,129 @@
+"""Project mode: reading archives, following includes, and linking constructors."""
+import io
+import zipfile
+
+import pytest
+
+from visualizer.cache import LRUCache
+from visualizer.parser import tokenize
+from visualizer.project import ProjectError, ProjectParser, live_includes, load_zip
+
+HEADER = "class Student { string name; int age; public: Student(string n, int a); };\n"
+SOURCES = {
+    "Student.h": "#pragma once\n" + HEADER,
+    "src/Student.cpp": '#include "Student.h"\nStudent::Student(string n, int a) { name = n; age = a; }\n',
+    "src/main.cpp": '#include "Student.h"\nint main() { Student s("Ann", 20); }\n',
+}
+
+
+def _parse(files):
+    parser = ProjectParser(files, cache=LRUCache(64, 1 << 20))
+    return parser, parser.parse_project()
+
+
+def _includes(code):
+    return live_includes([t for t in tokenize(code, directives=True) if t.kind == "pp"])
+
+
+def test_includes_resolve_through_parent_directories():
+    parser, result = _parse(SOURCES)
+    assert result["error"] is None
+    assert parser.main_file == "src/main.cpp"
+    assert parser.included == ["Student.h", "src/main.cpp"]
+    assert result["constructor_params"] == ["n", "a"]  # linked from src/Student.cpp
+    assert result["objects"][0]["params"] == ["Ann", "20"]
+
+
+def test_missing_include_is_reported():
+    files = {"main.cpp": '#include "nope.h"\n' + HEADER + 'int main() { Student s("A", 1); }\n'}
+    parser, result = _parse(files)
+    assert result["error"] is None
+    assert parser.missing_includes == [("main.cpp", "nope.h")]
+
+
+def test_include_cycle_terminates():
+    files = {"a.h": '#include "b.h"\nclass A { int x; };\n', "b.h": '#include "a.h"\nclass B { int y; };\n',
+             "main.cpp": '#include "a.h"\nint main() { B b(2); A a(1); }\n'}
+    parser, result = _parse(files)
+    assert parser.included == ["b.h", "a.h", "main.cpp"]
+    assert [c["name"] for c in result["classes"]] == ["B", "A"]
+
+
+def test_includes_in_comments_and_dead_groups_are_ignored():
+    code = '''/* #include "old.h" */
+// #include "older.h"
+#if 0
+#include "dead.h"
+#elif 1
+#include "live.h"
+#else
+#include "dead_too.h"
+#endif
+#ifdef DEBUG
+#include "debug.h"
+#endif
+#if 1
+#include "one.h"
+#else
+#include "not_one.h"
+#endif
+#   include "spaced.h"
+'''
+    assert _includes(code) == ("live.h", "debug.h", "one.h", "spaced.h")
+
+
+def test_dead_include_does_not_report_a_missing_file():
+    files = {"main.cpp": '#if 0\n#include "gone.h"\n#endif\n' + HEADER + 'int main() { Student s("A", 1); }\n'}
+    parser, _result = _parse(files)
+    assert parser.missing_includes == []
+
+
+def test_header_summaries_are_shared():
+    cache = LRUCache(64, 1 << 20)
+    ProjectParser(SOURCES, cache=cache).parse_project()
+    parser = ProjectParser(dict(SOURCES, **{"src/main.cpp": SOURCES["src/main.cpp"] + "// edited\n"}), cache=cache)
+    result = parser.parse_project()
+    assert parser.files_scanned == 1  # only the edited main.cpp
+    assert [o["name"] for o in result["objects"]] == ["s"]
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, text in entries.items():
+            zf.writestr(name, text)
+    return buf.getvalue()
+
+
+def test_load_zip_skips_paths_outside_the_project():
+    files = load_zip(_zip({"proj/main.cpp": "int main() {}", "../evil.h": "x", "__MACOSX/main.cpp": "x",
+                           "notes.txt": "x"}))
+    assert files == {"proj/main.cpp": "int main() {}"}
+
+
+def test_load_zip_rejects_garbage():
+    with pytest.raises(ProjectError):
+        load_zip(b"not a zip")
+
+
+def test_summaries_outlive_the_worker_that_made_them(monkeypatch):
+    from visualizer import project
+    from visualizer.cache import header_cache, source_key
+
+    calls = []
+
+    def recording(files, summaries):
+        parsed, made = parse_files(files, summaries)
+        calls.append((set(summaries), set(made)))
+        return parsed, made
+
+    parse_files = project.parse_files
+    monkeypatch.setattr(project, "parse_files", recording)
+    header = HEADER + "// shared by both submissions\n"
+    first = {"Student.h": header, "main.cpp": '#include "Student.h"\nint main() { Student a("A", 1); }\n'}
+    second = dict(first, **{"main.cpp": '#include "Student.h"\nint main() { Student b("B", 2); }\n'})
+    project.parse_project(first)
+    assert header_cache.get(source_key(header)) is not None  # kept by this process, not the worker
+    _key, result = project.parse_project(second)
+    assert [o["name"] for o in result["objects"]] == ["b"]
+    assert calls[1] == ({source_key(header)}, {source_key(second["main.cpp"])})
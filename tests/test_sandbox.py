@@ -0,0 +1,73 @@
+"""Parse jobs run in worker processes under CPU, wall-clock and memory limits."""
+import pytest
+
+from benchmarks.generator import generate_source
+from visualizer.model import compact
+from visualizer.parser import CPPCodeParser
+from visualizer.sandbox import PARSE_SANDBOX, ParseLimitExceeded, ParsePool, parse_files, stream_parse
+
+pytestmark = pytest.mark.skipif(not PARSE_SANDBOX, reason="no resource module, so no sandbox")
+
+
+@pytest.fixture
+def pool():
+    pool = ParsePool(workers=1)
+    yield pool
+    pool.close()
+
+
+def test_parse_matches_in_process(pool):
+    code = generate_source(classes=3, objects=10)
+    assert pool.parse(code) == compact(CPPCodeParser().parse(code))
+
+
+def test_wall_clock_deadline(pool):
+    code = generate_source(objects=1, size=4 * 1024 * 1024)
+    with pytest.raises(ParseLimitExceeded, match="longer than"):
+        pool.run("parse", (code, None, None), cpu_limit=0.1, timeout=0.3)
+    # The worker that overran was replaced, and the next job gets a fresh one.
+    assert pool.parse("class A { int x; };")["class_name"] == "A"
+
+
+def test_cpu_limit_inside_the_worker(pool):
+    code = generate_source(objects=1, size=16 * 1024 * 1024)
+    with pytest.raises(ParseLimitExceeded, match="longer than 1 s"):
+        pool.run("parse", (code, None, None), cpu_limit=1, timeout=30)
+
+
+def test_memory_limit():
+    pool = ParsePool(workers=1, memory_limit=192 * 1024 * 1024)
+    try:
+        code = "class A { int x; };\nint main() {" + "A a(1);" * 2_000_000 + "}"
+        with pytest.raises(ParseLimitExceeded, match="more than 192 MB"):
+            pool.run("parse", (code, None, None), cpu_limit=60, timeout=60)
+    finally:
+        pool.close()
+
+
+def test_stream_parse_reports_progress():
+    code = generate_source(classes=2, objects=50)
+    seen = []
+    parsed = stream_parse(code.encode(), lambda *progress: seen.append(progress), interval=0.0, preview=3)
+    assert parsed == compact(CPPCodeParser().parse(code))
+    scanned, total, classes, objects, first = seen[-1]
+    assert (total, classes, objects, len(first)) == (len(code.encode()), 2, 50, 3)
+
+
+def test_stream_parse_stops_a_slow_upload(monkeypatch):
+    import visualizer.sandbox as sandbox
+    monkeypatch.setattr(sandbox, "PARSE_CPU_LIMIT", 0.1)
+    monkeypatch.setattr(sandbox, "PARSE_MIN_RATE", 1e12)
+    monkeypatch.setattr(sandbox, "_DEADLINE_SLACK", 0.2)
+    with pytest.raises(ParseLimitExceeded):
+        stream_parse(generate_source(objects=1, size=8 * 1024 * 1024).encode())
+
+
+def test_parse_files():
+    files = {"a.h": "class A { int x; public: A(int v); };", "a.cpp": '#include "a.h"\nA::A(int v) {}',
+             "main.cpp": '#include "a.h"\nint main() { A a(1); }'}
+    parsed, summaries = parse_files(files)
+    assert len(summaries) == 3
+    assert parsed["class_name"] == "A"
+    assert parsed["constructor_params"] == ("v",)
+    assert [o["name"] for o in parsed["objects"]] == ["a"]
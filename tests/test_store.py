@@ -0,0 +1,91 @@
+"""ArtifactStore round-trips values, stays within its cap, and reads corrupt rows as misses."""
+import os
+
+from visualizer import store as store_module
+from visualizer.store import ArtifactStore
+
+
+def _store(tmp_path, max_bytes=1024 * 1024):
+    return ArtifactStore(str(tmp_path / "artifacts.sqlite3"), max_bytes)
+
+
+def _corrupt(store, key, part, blob):
+    store._connect().execute("UPDATE artifacts SET value = ? WHERE key = ? AND part = ?", (blob, key, part))
+
+
+def test_round_trip(tmp_path):
+    store = _store(tmp_path)
+    value = {"class_name": "A", "objects": [{"name": "a", "values": ["1"]}]}
+    store.put("k", "parse", value)
+    assert store.get("k", "parse") == value
+    assert store.get("k", "shell", "missing") == "missing"
+    assert store.stats().entries == 1
+    # Another handle on the same file, as another server process would have.
+    assert _store(tmp_path).get("k", "parse") == value
+
+
+def test_eviction_keeps_the_total_under_the_cap(tmp_path):
+    store = _store(tmp_path, max_bytes=20000)
+    for i in range(50):
+        store.put(f"k{i}", "frame:0", os.urandom(1000))  # incompressible
+    stats = store.stats()
+    assert stats.bytes <= 20000 and stats.entries < 50
+    assert store.get("k49", "frame:0") is not None
+
+
+def test_corrupt_rows_are_misses_and_deleted(tmp_path):
+    store = _store(tmp_path)
+    store.put("zlib", "parse", {"a": 1})
+    store.put("pickle", "parse", {"b": 2})
+    store.put("good", "parse", {"c": 3})
+    _corrupt(store, "zlib", "parse", b"not compressed")
+    _corrupt(store, "pickle", "parse", store_module.zlib.compress(b"not a pickle"))
+    assert store.get("zlib", "parse", "miss") == "miss"
+    assert store.get("pickle", "parse", "miss") == "miss"
+    assert store.stats().entries == 1
+    assert store.get("good", "parse") == {"c": 3}
+
+
+def test_hottest_skips_corrupt_rows(tmp_path):
+    store = _store(tmp_path)
+    store.put("bad", "parse", 1)
+    store.put("good", "parse", 2)
+    _corrupt(store, "bad", "parse", b"garbage")
+    assert list(store.hottest(10)) == [("good", "parse", 2)]
+    assert store.stats().entries == 1
+
+
+def test_touched_stays_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "_MAX_TOUCHED", 8)
+    store = _store(tmp_path)
+    for i in range(40):
+        store.put(f"k{i}", "parse", i)
+        assert store.get(f"k{i}", "parse") == i
+    assert len(store._touched) <= 8
+
+
+def test_store_is_opt_in(monkeypatch):
+    monkeypatch.delenv("ARTIFACT_STORE_PATH")
+    monkeypatch.setattr(store_module, "_path", "")
+    monkeypatch.setattr(store_module, "_store", None)
+    assert store_module.artifact_store() is None
+    store_module.enable_default_store()
+    assert store_module._path == store_module._DEFAULT_PATH
+
+
+def test_explicit_empty_path_wins_over_the_default(monkeypatch):
+    monkeypatch.setenv("ARTIFACT_STORE_PATH", "")
+    monkeypatch.setattr(store_module, "_path", "")
+    store_module.enable_default_store()
+    assert store_module._path == ""
+
+
+def test_parses_persist_through_the_process_wide_store(artifact_store_path):
+    from visualizer import cache
+
+    parsed = {"class_name": "A", "objects": [], "error": None}
+    cache.remember_parse("persisted-key", parsed)
+    cache._store_pool.submit(lambda: None).result()  # the write runs on the store's own thread
+    cache.parse_cache.clear()
+    assert cache.lookup_parse("persisted-key") == parsed
+    assert os.path.exists(artifact_store_path)
@@ -0,0 +1,33 @@
+"""StreamingParser agrees with the full parse and stays bounded on hostile input."""
+from benchmarks.generator import generate_source
+from tests.test_parser import _best_time
+from visualizer.parser import CPPCodeParser
+from visualizer.streaming import StreamingParser
+
+
+def _stream(code, **kwargs):
+    parser = StreamingParser(code.encode(), **kwargs)
+    return parser.result(list(parser.iter_objects()))
+
+
+def test_matches_full_parse():
+    code = generate_source(classes=4, members=5, params=3, objects=40)
+    assert _stream(code) == CPPCodeParser().parse(code)
+
+
+def test_brace_initialised_objects_and_blocks():
+    code = "class A { int x; public: A(int v) {} };\nint main() { if (1) { A a{1}; } A b{2}; }\n"
+    assert [o["name"] for o in _stream(code)["objects"]] == ["a", "b"]
+
+
+def test_oversized_declaration_is_an_error():
+    code = "class A { int x; };\nint main() { A a(" + "1 + " * 1000 + "1); }\n"
+    assert "longer than 1000 bytes" in _stream(code, max_statement=1000)["error"]
+    assert _stream(code)["error"] is None
+
+
+def test_linear_on_unbalanced_brackets():
+    for build in (lambda n: "{)" * n,
+                  lambda n: "class A{int x;};int main(){A a{" + "{}" * n + "};}"):
+        ratio = _best_time(_stream, build(16000)) / max(_best_time(_stream, build(4000)), 1e-4)
+        assert ratio < 8, ratio
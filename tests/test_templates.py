@@ -0,0 +1,64 @@
+"""Compiled templates render exactly what formatting their source would, and user text is escaped everywhere."""
+import pytest
+
+from visualizer import render
+from visualizer.events import compile_trace
+from visualizer.parser import CPPCodeParser
+from visualizer.templates import Template, escape
+
+SAMPLE = '''
+class Student {
+private:
+    string name;
+    int age;
+    string major;
+public:
+    Student(string n, int a, string m) { name = n; age = a; major = m; }
+};
+
+struct Point { int x; int y; Point(int px, int py) { x = px; y = py; } };
+
+int main() {
+    Student s1("Ann <Lee>", 20, "CS & Math");
+    Point p(1, 2);
+    Student s2("O'Brien", 21, "\\"Physics\\"");
+    return 0;
+}
+'''
+
+
+def _render_all(parsed):
+    trace = compile_trace(parsed)
+    frames = [render.create_animation_html(step, parsed, trace) for step in range(len(trace))]
+    return frames, render.create_stage_shell(parsed, trace), render.create_player_html(parsed, trace=trace)
+
+
+def test_compiled_output_matches_string_formatting(monkeypatch):
+    parsed = CPPCodeParser().parse(SAMPLE)
+    compiled = _render_all(parsed)
+    templates = [value for value in vars(render).values() if isinstance(value, Template)]
+    assert templates
+    for template in templates:
+        # What the renderer did before templates were compiled: format the markup on every call.
+        monkeypatch.setattr(template, "format", template.source.format)
+    assert _render_all(parsed) == compiled
+
+
+def test_escape_covers_attribute_quotes():
+    assert escape('<a href="x" title=\'y\'>&</a>') == "&lt;a href=&quot;x&quot; title=&#x27;y&#x27;&gt;&amp;&lt;/a&gt;"
+
+
+def test_user_text_cannot_leave_an_attribute_or_element():
+    hostile = '"><script>alert(1)</script>\' onload=\'x'
+    parsed = {"class_name": "A", "private_members": [hostile], "constructor_params": ["p"],
+              "objects": [{"name": hostile, "params": [hostile]}], "error": None}
+    for html in _render_all(parsed)[0]:
+        assert "<script>alert" not in html
+        assert "' onload='" not in html and '"><' + "script" not in html
+
+
+def test_fields_must_be_plain_names():
+    assert Template("{{literal}} {name}").render(name="x") == "{literal} x"
+    for source in ("{a.b}", "{a[0]}", "{0}", "{__import__('os')}"):
+        with pytest.raises(ValueError):
+            Template(source)
@@ -0,0 +1,5 @@
+"""Parsing and rendering core of the C++ Constructor Visualizer.
+
+Nothing in this package imports Streamlit, so it can be reused from
+command-line tools and benchmarks as well as from ``app.py``.
+"""
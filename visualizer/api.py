@@ -0,0 +1,363 @@
+"""Headless HTTP/JSON service for parsing and rendering, for LMS integrations.
+
+Usage::
+
+    python -m visualizer.api [--host 127.0.0.1] [--port 8765] [--workers 8]
+
+Built on :mod:`http.server` and the same process-wide caches as the app, so
+a source parsed or a frame rendered once is served from memory afterwards.
+Set ``ARTIFACT_STORE_PATH`` to share the app's on-disk store as well; the
+service has none by default.
+Endpoints:
+
+* ``POST /parse`` with ``{"source": "..."}`` returns ``{"key", "result"}``;
+  with ``{"sources": [...]}`` it streams one NDJSON line per source,
+  ``{"index", "key", "result"}``, in the order they finish.
+* ``POST /render`` with ``{"source" or "key", "step"}`` returns the frame's
+  HTML; with ``{"frames": [{"source" or "key", "step", "etag"}, ...]}`` it
+  streams ``{"index", "key", "step", "etag", "html"}`` lines, and a frame
+  whose ``etag`` still matches comes back as ``"not_modified": true``
+  without its HTML.
+* ``GET /frames/<key>/<step>`` and ``GET /player/<key>`` return the HTML of
+  one frame, or of the self-contained player, for a source parsed before.
+* ``GET /health``, and ``GET /metrics`` in Prometheus text format
+  (see :mod:`visualizer.metrics`).
+
+Connections are HTTP/1.1 keep-alive and are served by a fixed pool of
+``--workers`` threads; an idle connection is closed after
+:data:`API_KEEPALIVE_TIMEOUT` seconds so it cannot hold a worker. Every
+parse result and document carries an ``ETag`` made of the source key, the
+step and the code version. A tag only matches a result the service holds
+and can serve, without an error; then a ``GET`` whose ``If-None-Match``
+matches gets ``304 Not Modified`` and a ``POST`` ``412 Precondition
+Failed``, as RFC 9110 has it, without anything being rendered. An
+unexpected error is logged and answered with a JSON ``500``.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Optional, Tuple
+
+from visualizer.cache import (
+    code_version, lookup_parse, parse_with_key, player_cached, render_frame_cached, source_key, trace_cached
+)
+from visualizer.metrics import CONTENT_TYPE, REGISTRY
+
+logger = logging.getLogger("visualizer.api")
+
+API_WORKERS = int(os.environ.get("API_WORKERS", "8"))
+# Threads that work through the items of batch requests, shared by all connections.
+API_JOB_WORKERS = int(os.environ.get("API_JOB_WORKERS", "4"))
+API_KEEPALIVE_TIMEOUT = float(os.environ.get("API_KEEPALIVE_TIMEOUT", "15"))
+API_MAX_BODY = int(os.environ.get("API_MAX_BODY", str(8 * 1024 * 1024)))
+API_MAX_BATCH = int(os.environ.get("API_MAX_BATCH", "256"))
+
+_KEY_RE = re.compile(r"[0-9a-z-]{1,64}")
+_ENDPOINTS = frozenset(("parse", "render", "frames", "player", "health", "metrics"))
+
+REQUESTS = REGISTRY.counter("visualizer_api_requests_total", "API requests, by endpoint and status.",
+                            ["endpoint", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("visualizer_api_request_seconds",
+                                     "API request time until the response is written, by endpoint.", ["endpoint"])
+
+
+class ApiError(Exception):
+    """A request the service refuses; ``status`` and the message go back to the client."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def etag(key: str, part: str = "parse") -> str:
+    """The ``ETag`` of one artifact of a source; it changes whenever the code that makes it does."""
+    return f'"{key}.{part}.{code_version()}"'
+
+
+def _plain(parsed: Any) -> dict:
+    return parsed.to_dict() if hasattr(parsed, "to_dict") else dict(parsed)
+
+
+def _parsed(item: dict) -> Tuple[str, Any]:
+    """``(key, parse result)`` for a request item naming a ``source`` or the ``key`` of an earlier one."""
+    if isinstance(item.get("source"), str):
+        return parse_with_key(item["source"])
+    key = item.get("key")
+    if not isinstance(key, str) or not _KEY_RE.fullmatch(key):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Each item needs a "source" string or a "key".')
+    parsed = lookup_parse(key)
+    if parsed is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown key {key}; send the source instead.")
+    return key, parsed
+
+
+def _step(item: dict) -> int:
+    step = item.get("step", 0)
+    if not isinstance(step, int) or isinstance(step, bool) or step < 0:
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"step" must be a non-negative integer.')
+    return step
+
+
+def check_frame(key: str, parsed: Any, step: int) -> None:
+    """Raise :class:`ApiError` unless the source has a step ``step`` to render."""
+    if parsed.get("error"):
+        raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, parsed["error"])
+    steps = len(trace_cached(key, parsed))
+    if step >= steps:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Step {step} is out of range; this source has {steps} steps.")
+
+
+def render_frame(key: str, parsed: Any, step: int) -> str:
+    """The HTML of one step, or :class:`ApiError` when the source has no such step."""
+    check_frame(key, parsed, step)
+    return render_frame_cached(key, step, parsed)
+
+
+def _parse_line(item: Any) -> dict:
+    if not isinstance(item, str):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"sources" must be a list of strings.')
+    key, parsed = parse_with_key(item)
+    return {"key": key, "etag": etag(key), "result": _plain(parsed)}
+
+
+def _render_line(item: Any) -> dict:
+    if not isinstance(item, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '"frames" must be a list of objects.')
+    step = _step(item)
+    key, parsed = _parsed(item)
+    tag = etag(key, f"frame:{step}")
+    if item.get("etag") == tag:
+        return {"key": key, "step": step, "etag": tag, "not_modified": True}
+    return {"key": key, "step": step, "etag": tag, "html": render_frame(key, parsed, step)}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response has a length or is chunked
+    timeout = API_KEEPALIVE_TIMEOUT
+    server_version = "cpp-visualizer-api"
+
+    # ---------- routing ----------
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def _dispatch(self, route: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        self._status = 0
+        try:
+            route()
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            logger.exception("%s %s failed", self.command, self.path)
+            # The body may be unread, or the response half-written; either way the connection is done.
+            self.close_connection = True
+            if not self._status:
+                self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            endpoint = self.path.split("?", 1)[0].strip("/").split("/", 1)[0]
+            endpoint = endpoint if endpoint in _ENDPOINTS else "other"  # a bounded set of label values
+            REQUESTS.labels(endpoint, str(self._status)).inc()
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+    def send_response(self, code, message=None):
+        self._status = int(code)
+        super().send_response(code, message)
+
+    def _get(self) -> None:
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if parts == ["health"]:
+            self._send_json(HTTPStatus.OK, {"ok": True, "version": code_version()})
+        elif parts == ["metrics"]:
+            self._send(HTTPStatus.OK, REGISTRY.render().encode(), CONTENT_TYPE)
+        elif len(parts) == 3 and parts[0] == "frames" and parts[2].isdigit():
+            key, parsed = _parsed({"key": parts[1]})
+            step = int(parts[2])
+            tag = etag(key, f"frame:{step}")
+            check_frame(key, parsed, step)
+            if not self._not_modified(tag):
+                self._send(HTTPStatus.OK, render_frame(key, parsed, step).encode(), "text/html; charset=utf-8", tag)
+        elif len(parts) == 2 and parts[0] == "player":
+            key, parsed = _parsed({"key": parts[1]})
+            tag = etag(key, "player:0")
+            if parsed.get("error"):
+                raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, parsed["error"])
+            if not self._not_modified(tag):
+                self._send(HTTPStatus.OK, player_cached(key, 0, parsed).encode(), "text/html; charset=utf-8", tag)
+        else:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No such endpoint: GET {self.path}")
+
+    def _post(self) -> None:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path not in ("/parse", "/render"):
+            self._discard_body()
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No such endpoint: POST {self.path}")
+        body = self._read_json()
+        if path == "/parse":
+            if "sources" in body:
+                self._stream(body["sources"], _parse_line)
+                return
+            if not isinstance(body.get("source"), str):
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'Send {"source": "..."} or {"sources": [...]}.')
+            # A conditional request is answered from the cache, without parsing, when the result is there.
+            key = source_key(body["source"])
+            cached = lookup_parse(key)
+            if cached is None or cached.get("error") or not self._not_modified(etag(key)):
+                key, parsed = parse_with_key(body["source"])
+                self._send_json(HTTPStatus.OK, {"key": key, "result": _plain(parsed)}, etag(key))
+        elif "frames" in body:
+            self._stream(body["frames"], _render_line)
+        else:
+            step = _step(body)
+            key, parsed = _parsed(body)
+            tag = etag(key, f"frame:{step}")
+            check_frame(key, parsed, step)
+            if not self._not_modified(tag):
+                self._send(HTTPStatus.OK, render_frame(key, parsed, step).encode(), "text/html; charset=utf-8", tag)
+
+    # ---------- requests ----------
+    def _read_json(self) -> dict:
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            raise ApiError(HTTPStatus.LENGTH_REQUIRED, "A Content-Length header is required.")
+        if int(length) > API_MAX_BODY:
+            self.close_connection = True  # the body is left unread
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request bodies are limited to {API_MAX_BODY} bytes.")
+        try:
+            body = json.loads(self.rfile.read(int(length)))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"The body is not valid JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "The body must be a JSON object.")
+        return body
+
+    def _discard_body(self) -> None:
+        length = self.headers.get("Content-Length", "0")
+        if length.isdigit() and int(length) <= API_MAX_BODY:
+            self.rfile.read(int(length))
+        else:
+            self.close_connection = True
+
+    def _not_modified(self, tag: str) -> bool:
+        """Answer when the client already holds ``tag``; return whether it did.
+
+        Call it only once the resource ``tag`` names is known to exist. A
+        ``GET`` gets 304; any other method 412, since its precondition failed.
+        """
+        if tag not in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+            return False
+        if self.command != "GET":
+            self._send_json(HTTPStatus.PRECONDITION_FAILED, {"error": "The client already holds this result."}, tag)
+            return True
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header("ETag", tag)
+        self.end_headers()
+        return True
+
+    # ---------- responses ----------
+    def _send(self, status: HTTPStatus, payload: bytes, content_type: str, tag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if tag is not None:
+            self.send_header("ETag", tag)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: HTTPStatus, obj: Any, tag: Optional[str] = None) -> None:
+        self._send(status, json.dumps(obj).encode(), "application/json", tag)
+
+    def _stream(self, items: Any, line: Callable[[Any], dict]) -> None:
+        """Run ``line`` over ``items`` on the job pool and stream each result as it finishes."""
+        if not isinstance(items, list) or not items:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "A batch must be a non-empty list.")
+        if len(items) > API_MAX_BATCH:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Batches are limited to {API_MAX_BATCH} items.")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        futures = {self.server.jobs.submit(_guarded, line, item): index for index, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                record = dict(future.result(), index=futures[future])
+                self._chunk(json.dumps(record).encode() + b"\n")
+            self._chunk(b"")
+        except OSError:
+            # The client went away; drop what has not started and this connection.
+            for future in futures:
+                future.cancel()
+            self.close_connection = True
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+def _guarded(line: Callable[[Any], dict], item: Any) -> dict:
+    # One bad item fails its own line, never the rest of the batch.
+    try:
+        return line(item)
+    except ApiError as e:
+        return {"error": str(e), "status": int(e.status)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "status": int(HTTPStatus.INTERNAL_SERVER_ERROR)}
+
+
+class ApiServer(HTTPServer):
+    """An HTTP server that serves each connection on a fixed pool of worker threads."""
+
+    def __init__(self, address: Tuple[str, int], workers: int = API_WORKERS, job_workers: int = API_JOB_WORKERS):
+        super().__init__(address, ApiHandler)
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.jobs = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="api-job")
+
+    def process_request(self, request, client_address):
+        # Connections beyond the pool wait in its queue, already accepted.
+        self._workers.submit(self._serve, request, client_address)
+
+    def _serve(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._workers.shutdown(wait=False, cancel_futures=True)
+        self.jobs.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the parser and renderer over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=API_WORKERS, help="connections served at once")
+    args = ap.parse_args(argv)
+
+    server = ApiServer((args.host, args.port), args.workers)
+    print(f"Serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Headless batch mode: parse and render a directory of C++ files.
+
+Usage::
+
+    python -m visualizer.batch SUBMISSIONS_DIR -o OUT_DIR [--workers N] [--frames] [--timeout SECONDS]
+
+Every matching file is parsed and rendered in a worker process. Each file
+gets a static HTML bundle under ``OUT_DIR`` that mirrors its path below
+``SUBMISSIONS_DIR``, extension included, so ``a.cpp`` and ``a.cc`` do not
+overwrite each other: the self-contained client-side player ``a.cpp.html``,
+plus one page per step under ``a.cpp/`` with ``--frames``. One JSON line per
+file is appended to ``OUT_DIR/results.jsonl`` as soon as it finishes, and
+``OUT_DIR/summary.json`` holds the totals. A file that fails to read, parse
+or render, or takes longer than the timeout, is recorded as an error and
+never stops the batch. When a worker process dies, the files it took down
+with it are tried once more, one at a time in a fresh pool, before they are
+recorded as errors.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List
+
+from visualizer.events import compile_trace
+from visualizer.parser import CPPCodeParser
+from visualizer.render import create_animation_html, create_player_html
+
+# Wall-clock seconds one file may take; 0 disables the limit.
+BATCH_FILE_TIMEOUT = float(os.environ.get("BATCH_FILE_TIMEOUT", "60"))
+# A file still running this long after the timeout (stuck where the alarm cannot interrupt it)
+# has its worker killed. A file can wait up to one timeout behind others before it starts.
+_DEADLINE_FACTOR = 2.0
+_DEADLINE_SLACK = 5.0
+_POLL_SECONDS = 1.0
+
+
+class _FileTimeout(BaseException):
+    # BaseException, so neither the parser's nor process_file's ``except Exception`` swallows it.
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _FileTimeout()
+
+
+def find_sources(root: str, patterns: List[str]) -> Iterator[str]:
+    """Yield matching files below ``root`` lazily, in a stable order."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file() and any(fnmatch.fnmatch(entry.name, p) for p in patterns):
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def process_file(path: str, root: str, out_dir: str, frames: bool = False, timeout: float = 0.0) -> dict:
+    """Parse and render one file, giving up after ``timeout`` seconds when it is positive; never raises."""
+    start = time.perf_counter()
+    rel = os.path.relpath(path, root)
+    record = {"file": rel, "ok": False}
+    # Signals reach only the main thread, which is where a worker process runs its calls.
+    alarm = timeout > 0 and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            code = f.read()
+        record["bytes"] = len(code)
+        parsed = CPPCodeParser().parse(code)
+        if parsed.get("error"):
+            record["error"] = parsed["error"]
+        else:
+            base = os.path.join(out_dir, rel)
+            os.makedirs(os.path.dirname(base) or out_dir, exist_ok=True)
+            trace = compile_trace(parsed)
+            _write(base + ".html", create_player_html(parsed, trace=trace))
+            if frames:
+                os.makedirs(base, exist_ok=True)
+                digits = max(2, len(str(len(trace))))
+                for step in range(len(trace)):
+                    _write(os.path.join(base, f"step_{step + 1:0{digits}d}.html"),
+                           create_animation_html(step, parsed, trace))
+            record.update(
+                ok=True,
+                output=os.path.relpath(base + ".html", out_dir),
+                class_name=parsed["class_name"],
+                classes=len(parsed["classes"]),
+                private_members=len(parsed["private_members"]),
+                constructor_params=len(parsed["constructor_params"]),
+                objects=len(parsed["objects"]),
+                steps=len(trace),
+            )
+    except _FileTimeout:
+        record["error"] = _timed_out(timeout)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def _write(path: str, text: str) -> None:
+    # Write-then-rename so a crash never leaves a half-written bundle behind.
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _timed_out(timeout: float) -> str:
+    return f"timed out after {timeout:g}s"
+
+
+def _kill(pool: ProcessPoolExecutor) -> None:
+    # The executor cannot stop a single call; killing its workers is the only way to end a stuck one.
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(root: str, out_dir: str, patterns: List[str], workers: int = 0, frames: bool = False,
+              progress_every: int = 1000, timeout: float = BATCH_FILE_TIMEOUT) -> dict:
+    """Process every source below ``root``; return the summary that is also written to disk.
+
+    ``timeout`` is the wall-clock limit per file, in seconds; 0 disables it.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4  # bounded in-flight work keeps memory flat for huge batches
+    totals = {"files": 0, "ok": 0, "errors": 0, "bytes": 0}
+    start = time.perf_counter()
+    sources = find_sources(root, patterns)
+
+    with open(os.path.join(out_dir, "results.jsonl"), "w", encoding="utf-8") as results:
+        def record(rec: dict) -> None:
+            results.write(json.dumps(rec) + "\n")
+            totals["files"] += 1
+            totals["ok" if rec["ok"] else "errors"] += 1
+            totals["bytes"] += rec.get("bytes", 0)
+            if progress_every and totals["files"] % progress_every == 0:
+                rate = totals["files"] / (time.perf_counter() - start)
+                print(f"{totals['files']} files, {rate:.1f} files/s", file=sys.stderr)
+
+        pool = ProcessPoolExecutor(max_workers=workers)
+        in_flight = {}
+        started = {}  # future -> when it was first seen running
+        retry = deque()  # files lost with a dead worker, to go round once more
+        retried = set()
+        deadline = timeout * _DEADLINE_FACTOR + _DEADLINE_SLACK
+        try:
+            exhausted = False
+            while True:
+                while len(in_flight) < window:
+                    if retry:
+                        # One at a time and alone in the pool, so a file that dies again has only itself to blame.
+                        if in_flight:
+                            break
+                        path = retry.popleft()
+                    elif exhausted:
+                        break
+                    else:
+                        path = next(sources, None)
+                        if path is None:
+                            exhausted = True
+                            break
+                    in_flight[pool.submit(process_file, path, root, out_dir, frames, timeout)] = path
+                    if path in retried:
+                        break
+                if not in_flight:
+                    break
+                done, _pending = wait(in_flight, timeout=_POLL_SECONDS if timeout > 0 else None,
+                                      return_when=FIRST_COMPLETED)
+                lost = []
+                for future in done:
+                    path = in_flight.pop(future)
+                    started.pop(future, None)
+                    try:
+                        record(future.result())
+                    except BrokenProcessPool:
+                        lost.append(path)
+                    except _FileTimeout:  # the alarm went off just as the file finished
+                        record({"file": os.path.relpath(path, root), "ok": False, "error": _timed_out(timeout)})
+                now = time.monotonic()
+                stuck = [future for future in in_flight
+                         if timeout > 0 and future.running() and now - started.setdefault(future, now) > deadline]
+                if not lost and not stuck:
+                    continue
+                # A worker died (e.g. killed for memory) or is stuck; the pool goes, and every file in it.
+                _kill(pool)
+                for future in stuck:
+                    path = in_flight.pop(future)
+                    record({"file": os.path.relpath(path, root), "ok": False, "error": _timed_out(timeout)})
+                for future, path in in_flight.items():
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        record(future.result())
+                    else:
+                        lost.append(path)
+                in_flight.clear()
+                started.clear()
+                for path in lost:
+                    if path in retried:
+                        record({"file": os.path.relpath(path, root), "ok": False, "error": "worker process died"})
+                    else:
+                        # It may only have shared the pool with the file that took it down.
+                        retried.add(path)
+                        retry.append(path)
+                pool = ProcessPoolExecutor(max_workers=workers)
+        finally:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    summary = dict(totals, seconds=round(elapsed, 3),
+                   files_per_second=round(totals["files"] / elapsed, 2) if elapsed else 0.0)
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Parse and render a directory of C++ files.")
+    ap.add_argument("source_dir")
+    ap.add_argument("-o", "--out", required=True, help="output directory for bundles and summary")
+    ap.add_argument("--glob", action="append", dest="patterns",
+                    help="file name pattern, may repeat (default: *.cpp)")
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (default: CPU count)")
+    ap.add_argument("--frames", action="store_true", help="also write one HTML page per step")
+    ap.add_argument("--timeout", type=float, default=BATCH_FILE_TIMEOUT,
+                    help="seconds each file may take, 0 for no limit (default: %(default)g)")
+    args = ap.parse_args(argv)
+
+    summary = run_batch(args.source_dir, args.out, args.patterns or ["*.cpp"], args.workers, args.frames,
+                        timeout=args.timeout)
+    print(f"{summary['files']} files ({summary['ok']} ok, {summary['errors']} errors) "
+          f"in {summary['seconds']}s: {summary['files_per_second']} files/s")
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""Process-wide, content-addressed caches shared by every Streamlit session.
+
+Streamlit runs each browser session in its own script thread but inside one
+Python process, so a module-level cache is visible to all of them. Entries
+are keyed by a hash of the normalized source, which makes the hundreds of
+identical "Student" sample submissions in a class a single parse.
+
+Parse results and rendered documents are also written, in the background,
+to the on-disk :mod:`visualizer.store`, which outlives the process and is
+shared with the server's other processes. A miss in memory is looked up
+there before anything is parsed or rendered again, and
+:func:`warm_from_store` preloads the most used entries after a restart.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from visualizer.events import ExecutionTrace, compile_trace
+from visualizer.sandbox import ParseLimitExceeded, parse_source
+from visualizer.store import artifact_store
+from visualizer.render import create_animation_html, create_player_html, create_stage_patch, create_stage_shell
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("PARSE_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+FRAME_CACHE_MAX_ENTRIES = int(os.environ.get("FRAME_CACHE_MAX_ENTRIES", "4096"))
+FRAME_CACHE_MAX_BYTES = int(os.environ.get("FRAME_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+HEADER_CACHE_MAX_ENTRIES = int(os.environ.get("HEADER_CACHE_MAX_ENTRIES", "4096"))
+HEADER_CACHE_MAX_BYTES = int(os.environ.get("HEADER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Pre-render the stage and its first steps in the background as soon as a source is parsed.
+FRAME_CACHE_EAGER = os.environ.get("FRAME_CACHE_EAGER", "0") == "1"
+PRERENDER_STEPS = int(os.environ.get("FRAME_CACHE_PRERENDER_STEPS", "32"))
+# Entries of the on-disk store loaded into memory by warm_from_store().
+WARM_ENTRIES = int(os.environ.get("ARTIFACT_STORE_WARM_ENTRIES", "256"))
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+def estimate_size(obj: Any) -> int:
+    """Rough deep size in bytes of a parse result (dicts, lists, scalars and slotted models)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(v) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(estimate_size(getattr(obj, name)) for name in obj.__slots__)
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count and by estimated bytes."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _key, (_value, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._data), self._bytes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_source(code: str) -> str:
+    """Drop differences that cannot change the parse: line endings and whitespace at the end of the file.
+
+    Nothing else is touched: whitespace inside a line, or a character
+    ``str.splitlines`` would also split on, can be part of a literal.
+    """
+    return code.replace("\r\n", "\n").replace("\r", "\n").rstrip()
+
+
+def _digest(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def source_key(code: str) -> str:
+    """Content hash of the normalized source."""
+    return _digest(normalize_source(code))
+
+
+def buffer_key(buf) -> str:
+    """Content hash of a raw upload, read straight from the buffer without copying it.
+
+    Uploads are not normalized, so they get their own key space.
+    """
+    return "raw-" + hashlib.blake2b(buf, digest_size=16).hexdigest()
+
+
+class ResultRef:
+    """A session's handle on a shared parse result; it holds nothing but the key.
+
+    The result stays pinned in the store while any handle to it is alive and
+    is released when the last one is garbage-collected, e.g. with the
+    session that held it.
+    """
+
+    __slots__ = ("key", "_store")
+
+    def __init__(self, key: str, store: "ResultStore"):
+        self.key = key
+        self._store = store
+
+    def __del__(self):
+        self._store._release(self.key)
+
+    @property
+    def data(self) -> Any:
+        return self._store.get(self.key)
+
+
+class ResultStore:
+    """Reference-counted parse results, one shared object per source key."""
+
+    def __init__(self):
+        self._entries: Dict[str, List] = {}  # key -> [result, live handles, key]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, result: Any) -> ResultRef:
+        """Pin ``result`` under ``key`` and return a handle on it.
+
+        When ``key`` is already pinned, the handle refers to the stored
+        result and ``result`` is dropped, so equal sources never coexist.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [result, 0, key]
+            entry[1] += 1
+        # Every handle shares the stored key string rather than its own copy.
+        return ResultRef(entry[2], self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        return default if entry is None else entry[0]
+
+    def refs(self, key: str) -> int:
+        entry = self._entries.get(key)
+        return 0 if entry is None else entry[1]
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+parse_cache = LRUCache()
+result_store = ResultStore()
+frame_cache = LRUCache(FRAME_CACHE_MAX_ENTRIES, FRAME_CACHE_MAX_BYTES)
+# Per-file summaries of project sources (see visualizer.project), by content hash.
+header_cache = LRUCache(HEADER_CACHE_MAX_ENTRIES, HEADER_CACHE_MAX_BYTES)
+_prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prerender")
+# Writes to the on-disk store happen here, off the script threads.
+_store_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-store")
+_warmed = False
+_version: Optional[str] = None
+
+
+def code_version() -> str:
+    """Digest of the parser, renderer and frontend sources; stored artifacts of other versions are not used."""
+    global _version
+    if _version is None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.blake2b(digest_size=6)
+        for folder in (here, os.path.join(here, "frontend")):
+            for name in sorted(os.listdir(folder)):
+                if name.endswith((".py", ".js", ".html")):
+                    with open(os.path.join(folder, name), "rb") as f:
+                        h.update(name.encode() + b"\0" + f.read())
+        _version = h.hexdigest()
+    return _version
+
+
+def _stored(key: str, part: str) -> Any:
+    store = artifact_store()
+    return None if store is None else store.get(key, f"{part}@{code_version()}")
+
+
+def _persist(key: str, part: str, value: Any) -> None:
+    store = artifact_store()
+    if store is not None:
+        _store_pool.submit(store.put, key, f"{part}@{code_version()}", value)
+
+
+def lookup_parse(key: str) -> Any:
+    """The parse result stored under ``key`` in memory or on disk, or None."""
+    parsed = result_store.get(key)
+    if parsed is None:
+        parsed = parse_cache.get(key)
+    if parsed is None:
+        parsed = _stored(key, "parse")
+        if parsed is not None:
+            parse_cache.put(key, parsed)
+    return parsed
+
+
+def remember_parse(key: str, parsed: Any) -> None:
+    """Cache a parse result made outside :func:`parse_with_key`, such as a streamed upload."""
+    parse_cache.put(key, parsed)
+    _persist(key, "parse", parsed)
+
+
+def _warm(limit: int) -> None:
+    store = artifact_store()
+    if store is None:
+        return
+    version = code_version()
+    for key, versioned, value in store.hottest(limit):
+        part, _, made_by = versioned.rpartition("@")
+        if made_by != version:
+            continue
+        if part == "parse":
+            parse_cache.put(key, value)
+        elif part == "shell":
+            frame_cache.put((key, "shell"), value)
+        elif part.startswith("frame:"):
+            frame_cache.put((key, int(part[6:])), value)
+        elif part.startswith("player:"):
+            frame_cache.put((key, int(part[7:]), "player"), value)
+
+
+def warm_from_store(limit: int = WARM_ENTRIES) -> None:
+    """Preload the ``limit`` most used stored artifacts in the background; once per process."""
+    global _warmed
+    if not _warmed:
+        _warmed = True
+        _store_pool.submit(_warm, limit)
+
+
+def parse_with_key(code: str, cache: Optional[LRUCache] = None,
+                   base: Optional[str] = None) -> Tuple[str, dict]:
+    """Parse ``code`` once per distinct normalized source; return ``(source key, result)``.
+
+    The result is a compact :class:`~visualizer.model.ParseResult` (or an
+    error dict) shared between every caller that submitted the same source,
+    so it must be treated as read-only. Results pinned by a live session are
+    reused even after the LRU cache has evicted them. ``base``, the key of
+    the source ``code`` was edited from, lets the parser rescan only what
+    the edit changed.
+    """
+    cache = parse_cache if cache is None else cache
+    normalized = normalize_source(code)
+    key = _digest(normalized)
+    parsed = result_store.get(key)
+    if parsed is None:
+        parsed = cache.get(key)
+    if parsed is None:
+        parsed = _stored(key, "parse")
+        if parsed is not None:
+            cache.put(key, parsed)
+    if parsed is None:
+        try:
+            parsed = parse_source(normalized, key, base)
+        except ParseLimitExceeded as e:
+            # Not cached: whether a parse fits its limits also depends on the load at the time.
+            return key, {"error": str(e)}
+        cache.put(key, parsed)
+        _persist(key, "parse", parsed)
+    return key, parsed
+
+
+def parse_cached(code: str, cache: Optional[LRUCache] = None) -> dict:
+    """Like :func:`parse_with_key`, for callers that only need the result."""
+    return parse_with_key(code, cache)[1]
+
+
+def trace_cached(key: str, parsed_data: dict) -> ExecutionTrace:
+    """``compile_trace`` memoized on the source key, so each source is compiled once."""
+    trace = frame_cache.get((key, "trace"))
+    if trace is None:
+        trace = compile_trace(parsed_data)
+        frame_cache.put((key, "trace"), trace)
+    return trace
+
+
+def render_frame_cached(key: str, step: int, parsed_data: dict) -> str:
+    """``create_animation_html`` memoized on ``(source key, step)``."""
+    html = frame_cache.get((key, step))
+    if html is None:
+        html = _stored(key, f"frame:{step}")
+        if html is None:
+            html = create_animation_html(step, parsed_data, trace_cached(key, parsed_data))
+            _persist(key, f"frame:{step}", html)
+        frame_cache.put((key, step), html)
+    return html
+
+
+def player_cached(key: str, step: int, parsed_data: dict) -> str:
+    """``create_player_html`` memoized on ``(source key, start step)``."""
+    html = frame_cache.get((key, step, "player"))
+    if html is None:
+        html = _stored(key, f"player:{step}")
+        if html is None:
+            html = create_player_html(parsed_data, step, trace_cached(key, parsed_data))
+            _persist(key, f"player:{step}", html)
+        frame_cache.put((key, step, "player"), html)
+    return html
+
+
+def stage_shell_cached(key: str, parsed_data: dict) -> dict:
+    """``create_stage_shell`` memoized on the source key."""
+    shell = frame_cache.get((key, "shell"))
+    if shell is None:
+        shell = _stored(key, "shell")
+        if shell is None:
+            shell = create_stage_shell(parsed_data, trace_cached(key, parsed_data))
+            _persist(key, "shell", shell)
+        frame_cache.put((key, "shell"), shell)
+    return shell
+
+
+def stage_patch_cached(key: str, step: int, parsed_data: dict) -> Optional[dict]:
+    """``create_stage_patch`` memoized on ``(source key, step)``."""
+    patch = frame_cache.get((key, step, "patch"))
+    if patch is None:
+        patch = create_stage_patch(step, parsed_data, trace_cached(key, parsed_data))
+        frame_cache.put((key, step, "patch"), patch)
+    return patch
+
+
+def _prerender(key: str, parsed_data: dict) -> None:
+    stage_shell_cached(key, parsed_data)
+    # Patches cost the same at every step, so only the start is worth having ready.
+    for step in range(min(len(trace_cached(key, parsed_data)), PRERENDER_STEPS)):
+        stage_patch_cached(key, step, parsed_data)
+
+
+def prerender_frames(key: str, parsed_data: dict) -> None:
+    """Queue the stage of ``parsed_data`` and its first steps for rendering on a background thread."""
+    _prerender_pool.submit(_prerender, key, parsed_data)
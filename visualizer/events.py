@@ -0,0 +1,215 @@
+"""Execution trace of the constructor calls ``main`` makes.
+
+:func:`compile_trace` turns a parse result into the events one run of
+``main`` goes through. For every object it declares, in order:
+
+* ``call``: ``main`` calls the constructor;
+* ``transfer``: control enters the constructor;
+* ``bind``: one per constructor parameter, which receives its argument;
+* ``init``: one per private member, which is assigned;
+* ``return``: the constructor completes and control returns to ``main``;
+* ``display``: ``main`` calls the object's ``display()``.
+
+Every event is one animation step. Each object goes through the sequence
+of its own class, against that class's members and constructor. All objects
+of a class share one sequence, so the trace keeps it once per class plus the
+step each object starts at, and :meth:`ExecutionTrace.state` describes any
+step in constant time when every class has the same sequence length, and in
+logarithmic time otherwise. Objects before the current one are fully
+constructed and those after it are untouched, so the state of one object is
+all a frame needs, and drawing a step means patching the frame before it
+with what that one event changed.
+"""
+from bisect import bisect_right
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+EVENT_KINDS = ("call", "transfer", "bind", "init", "return", "display")
+
+# What the animation shows when the parse result leaves a part out.
+DEFAULT_CLASS_NAME = "Student"
+DEFAULT_MEMBERS = ("name", "age", "major")
+DEFAULT_PARAMS = ("n", "a", "m")
+DEFAULT_OBJECTS = (("student1", ("Ali Raza", "20", "Computer Science")),)
+
+_CONTROL_MAIN = "⚡ CONTROL IN main() FUNCTION"
+_CONTROL_CTOR = "🔧 CONTROL INSIDE CONSTRUCTOR"
+
+
+class ClassSpec(NamedTuple):
+    """A class as the animation shows it."""
+    name: str
+    members: Tuple[str, ...]
+    params: Tuple[str, ...]
+    kind: str = "class"  # or "struct"
+
+
+class Event(NamedTuple):
+    kind: str  # one of EVENT_KINDS
+    obj: int  # index of the object in main()
+    index: int = -1  # the parameter (bind) or member (init) it concerns
+
+
+class StepState(NamedTuple):
+    """What one step shows, independent of how it is drawn."""
+    step: int
+    event: Event
+    cls: int  # index in ExecutionTrace.classes of event.obj's class
+    text: str  # step badge text, built from the names as given
+    show_ctor: bool
+    active: bool  # event.obj is highlighted while it is being constructed
+    status: str  # status of event.obj: "", "creating" or "created"
+    bound: int  # constructor parameters of event.obj bound so far
+    initialized: int  # members of event.obj initialized so far
+    show_pill: bool  # the parameter being bound flows to the constructor
+    control: str  # control-flow banner text
+
+
+def _sequence(spec: ClassSpec) -> Tuple[Tuple[str, int], ...]:
+    return (
+        ("call", -1), ("transfer", -1),
+        *(("bind", j) for j in range(len(spec.params))),
+        *(("init", k) for k in range(len(spec.members))),
+        ("return", -1), ("display", -1),
+    )
+
+
+class ExecutionTrace:
+    """The compiled events of one parse result, with its names as given.
+
+    ``classes`` holds the first class defined, then the other classes
+    objects are declared of in order of first use; ``class_of[i]`` indexes
+    the class of ``objects[i]``.
+    """
+
+    __slots__ = ("classes", "objects", "class_of", "_sequences", "_stride", "_starts", "_total")
+
+    def __init__(self, classes, objects, class_of=None):
+        self.classes: Tuple[ClassSpec, ...] = tuple(ClassSpec(name, tuple(members), tuple(params), *kind)
+                                                    for name, members, params, *kind in classes)
+        self.objects: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple((name, tuple(args)) for name, args in objects)
+        self.class_of: Tuple[int, ...] = tuple(class_of) if class_of is not None else (0,) * len(self.objects)
+        self._sequences = tuple(_sequence(spec) for spec in self.classes)
+        lengths = {len(self._sequences[c]) for c in set(self.class_of)}
+        self._starts: Optional[List[int]] = None
+        if len(lengths) <= 1:
+            # Every object takes as many steps: the step splits with divmod.
+            self._stride = lengths.pop() if lengths else len(self._sequences[0])
+            self._total = len(self.objects) * self._stride
+        else:
+            self._stride = 0
+            self._starts = starts = []
+            total = 0
+            for c in self.class_of:
+                starts.append(total)
+                total += len(self._sequences[c])
+            self._total = total
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __iter__(self) -> Iterator[Event]:
+        for obj, c in enumerate(self.class_of):
+            for kind, index in self._sequences[c]:
+                yield Event(kind, obj, index)
+
+    def spec(self, obj: int) -> ClassSpec:
+        """The class ``objects[obj]`` is constructed against."""
+        return self.classes[self.class_of[obj]]
+
+    def clamp(self, step: int) -> int:
+        return max(0, min(self._total - 1, int(step)))
+
+    def event(self, step: int) -> Event:
+        step = self.clamp(step)
+        if self._starts is None:
+            obj, offset = divmod(step, self._stride)
+        else:
+            obj = bisect_right(self._starts, step) - 1
+            offset = step - self._starts[obj]
+        kind, index = self._sequences[self.class_of[obj]][offset]
+        return Event(kind, obj, index)
+
+    def argument(self, obj: int, j: int) -> str:
+        """The argument ``objects[obj]`` passes for parameter (or member) ``j``."""
+        args = self.objects[obj][1]
+        return args[j] if j < len(args) else "..."
+
+    def state(self, step: int) -> StepState:
+        step = self.clamp(step)
+        event = self.event(step)
+        kind, obj, index = event
+        name = self.objects[obj][0]
+        cls = self.class_of[obj]
+        spec = self.classes[cls]
+        bound = initialized = 0
+        status = "creating"
+        control = _CONTROL_CTOR
+        if kind == "call":
+            text, status, control = f"📌 main() calls the constructor for {name}", "", _CONTROL_MAIN
+        elif kind == "transfer":
+            text = "⚡ Control transfers to constructor"
+        elif kind == "bind":
+            bound = index + 1
+            text = f"📦 Passing parameter: {spec.params[index]} = {self.argument(obj, index)}"
+        elif kind == "init":
+            bound, initialized = len(spec.params), index + 1
+            text = f"🔧 Initializing: {spec.members[index]}"
+        else:
+            bound, initialized, status, control = len(spec.params), len(spec.members), "created", _CONTROL_MAIN
+            if kind == "return":
+                text = "✅ Constructor completes, control returns to main()"
+            elif step == self._total - 1:
+                text = f"🎉 {name}.display() called, every object created!"
+            else:
+                text = f"📢 {name}.display() called"
+        return StepState(
+            step=step,
+            event=event,
+            cls=cls,
+            text=text,
+            show_ctor=kind in ("bind", "init"),
+            active=kind not in ("return", "display"),
+            status=status,
+            bound=bound,
+            initialized=initialized,
+            show_pill=kind == "bind",
+            control=control,
+        )
+
+
+def compile_trace(parsed_data) -> ExecutionTrace:
+    """Compile a successful parse result into its :class:`ExecutionTrace`.
+
+    Each object is matched to its class through the symbol table in
+    ``parsed_data["classes"]``; objects of an unknown class, and results
+    without a symbol table, use the first class.
+    """
+    symbols = {c["name"]: c for c in parsed_data.get("classes") or ()}
+    class_name = parsed_data.get("class_name", DEFAULT_CLASS_NAME)
+    primary = ClassSpec(
+        class_name,
+        parsed_data.get("private_members", DEFAULT_MEMBERS),
+        parsed_data.get("constructor_params", DEFAULT_PARAMS),
+        symbols[class_name]["kind"] if class_name in symbols else "class",
+    )
+    classes = [primary]
+    index = {primary.name: 0}
+    objects = []
+    class_of = []
+    for o in parsed_data.get("objects") or DEFAULT_OBJECTS:
+        if isinstance(o, tuple):
+            name, args, class_name = o[0], o[1], primary.name
+        else:
+            name, args, class_name = o["name"], o["params"], o.get("class_name") or primary.name
+        c = index.get(class_name)
+        if c is None:
+            symbol = symbols.get(class_name)
+            if symbol is None:
+                c = 0
+            else:
+                c = index[class_name] = len(classes)
+                classes.append(ClassSpec(class_name, symbol["private_members"], symbol["constructor_params"],
+                                         symbol["kind"]))
+        objects.append((name, args))
+        class_of.append(c)
+    return ExecutionTrace(classes, objects, class_of)
@@ -0,0 +1,478 @@
+"""Offline GIF/MP4 export of the constructor animation.
+
+Usage::
+
+    python -m visualizer.export SOURCE [SOURCE ...] -o OUT_DIR [--format gif|mp4]
+                                [--width 960] [--workers N]
+
+Each step of the execution trace is rasterized with Pillow from the same
+:meth:`~visualizer.events.ExecutionTrace.state` the HTML renderer draws. Step changes are cross-faded
+with vectorized NumPy blends. Consecutive frames that are identical or
+nearly identical are merged into one longer frame before encoding, and GIFs
+are delta-encoded, storing only the changed region of each frame. Frames
+flow from the rasterizer to the encoder one at a time, so a long trace
+costs time but not memory. ``SOURCE`` may be a file or a directory of ``*.cpp`` files. Files are
+exported in parallel worker processes. MP4 output needs ``ffmpeg`` on
+``PATH``.
+"""
+import argparse
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Deque, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from visualizer.batch import find_sources
+from visualizer.events import ExecutionTrace, compile_trace
+from visualizer.parser import CPPCodeParser
+from visualizer.timing import phase
+
+# Milliseconds each step is held, the same 1.2 s the players use.
+HOLD_MS = 1200
+TRANSITION_MS = 300
+TRANSITION_FRAMES = 4
+# Two frames count as the same when at most this fraction of their pixels
+# differ by more than a few levels, e.g. antialiasing or rounding noise.
+DEDUPE_TOLERANCE = 0.0005
+_NOISE_LEVELS = 8
+
+Frame = Tuple[np.ndarray, int]  # RGB pixels and display time in milliseconds
+
+_GRADIENT = ((0x66, 0x7E, 0xEA), (0x76, 0x4B, 0xA2))
+_GOLD = (0xFF, 0xD7, 0x00)
+_GREEN = (0x4C, 0xAF, 0x50)
+_RED = (0xFF, 0x6B, 0x6B)
+_LIGHT_GREEN = (0x6B, 0xFF, 0x6B)
+_DARK = (0x1E, 0x1E, 0x1E)
+_PANEL = (0x2D, 0x2D, 0x2D)
+_CARD = (0x36, 0x36, 0x36)
+_GREY = (0xBB, 0xBB, 0xBB)
+_WHITE = (0xFF, 0xFF, 0xFF)
+_BLACK = (0, 0, 0)
+
+
+@lru_cache(maxsize=None)
+def _font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def _plain(text: str) -> str:
+    """Drop the emoji the HTML uses, which common raster fonts cannot draw."""
+    return "".join(ch for ch in text if ord(ch) < 0x2000 or ch in "✓○").strip()
+
+
+def _fit(text: str, font, width: float) -> str:
+    if font.getlength(text) <= width:
+        return text
+    while text and font.getlength(text + "…") > width:
+        text = text[:-1]
+    return text + "…"
+
+
+@lru_cache(maxsize=4)
+def _background(width: int, height: int) -> np.ndarray:
+    """The wrapper's 135° purple gradient, computed once per size."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    t = ((x / max(width - 1, 1) + y / max(height - 1, 1)) / 2)[..., None]
+    start, end = (np.array(c, dtype=np.float32) for c in _GRADIENT)
+    return (start * (1 - t) + end * t).astype(np.uint8)
+
+
+def rasterize_step(step: int, trace: ExecutionTrace, width: int = 960) -> np.ndarray:
+    """Draw one step as an RGB array of ``width`` x ``width * 9 / 16`` pixels."""
+    width -= width % 2  # even sizes for yuv420p video
+    height = width * 9 // 16
+    height -= height % 2
+    u = width / 960  # layout is designed at 960 px wide
+
+    state = trace.state(step)
+    step, obj = state.step, state.event.obj
+    # The class box shows the class of the object being constructed.
+    spec = trace.classes[state.cls]
+    class_name, private_members, constructor_params, objects = spec.name, spec.members, spec.params, trace.objects
+
+    image = Image.fromarray(_background(width, height))
+    draw = ImageDraw.Draw(image)
+    body, bold, small = _font(round(15 * u)), _font(round(17 * u), True), _font(round(13 * u))
+    pad = round(16 * u)
+    radius = round(12 * u)
+
+    # step badge
+    badge_h = round(44 * u)
+    draw.rounded_rectangle((pad, pad, width - pad, pad + badge_h), radius=badge_h // 2, fill=_GOLD, outline=_WHITE,
+                           width=max(1, round(2 * u)))
+    title = _fit(f"Step {step + 1}/{len(trace)}: {_plain(state.text)}", bold, width - 4 * pad)
+    draw.text((width / 2, pad + badge_h / 2), title, font=bold, fill=_BLACK, anchor="mm")
+
+    top = pad * 2 + badge_h
+    bottom = height - pad - (round(40 * u) if state.control else 0)
+    mid = width // 2
+    line = round(22 * u)
+
+    # class box
+    draw.rounded_rectangle((pad, top, mid - pad // 2, bottom), radius=radius, fill=_DARK, outline=_GREEN,
+                           width=max(1, round(3 * u)))
+    x, y = pad * 2, top + pad
+    inner = mid - pad // 2 - x - pad
+    draw.text((x, y), _fit(f"{class_name} {spec.kind.capitalize()}", bold, inner), font=bold, fill=_GREEN)
+    y += line + pad // 2
+    draw.text((x, y), "Data Members:" if spec.kind == "struct" else "Private Members:", font=bold, fill=_RED)
+    y += line
+    ctor_lines = list(zip(private_members, constructor_params)) if state.show_ctor else []
+    room = (bottom - y - pad - 3 * line - (len(ctor_lines) + 1) * line) // line
+    for member in private_members[:max(room, 1)]:
+        draw.text((x + pad // 2, y), _fit(f"• {member}", body, inner), font=body, fill=_RED)
+        y += line
+    y += pad // 2
+    draw.text((x, y), "Public Methods:", font=bold, fill=_LIGHT_GREEN)
+    y += line
+    signature = f"+ {class_name}({', '.join(constructor_params)})"
+    draw.text((x + pad // 2, y), _fit(signature, body, inner), font=body, fill=_LIGHT_GREEN)
+    y += line
+    draw.text((x + pad // 2, y), "+ display()", font=body, fill=_LIGHT_GREEN)
+    y += line + pad // 2
+    if ctor_lines:
+        box_bottom = min(bottom - pad, y + (len(ctor_lines) + 1) * line + pad)
+        draw.rounded_rectangle((x, y, mid - pad // 2 - pad, box_bottom), radius=radius // 2, fill=_PANEL)
+        draw.rectangle((x, y, x + max(2, round(5 * u)), box_bottom), fill=_GOLD)
+        y += pad // 2
+        draw.text((x + pad, y), "Constructor Execution:", font=bold, fill=_GOLD)
+        y += line
+        for member, param in ctor_lines:
+            if y + line > box_bottom:
+                break
+            draw.text((x + pad, y), _fit(f"{member} = {param};", body, inner - pad), font=body, fill=_WHITE)
+            y += line
+
+    # objects box
+    left = mid + pad // 2
+    draw.rounded_rectangle((left, top, width - pad, bottom), radius=radius, fill=_PANEL, outline=_GOLD,
+                           width=max(1, round(3 * u)))
+    x, y = left + pad, top + pad
+    inner = width - pad - x - pad
+    pills_h = round(40 * u) if state.show_pill else 0
+    space = bottom - pad - pills_h - (y + line + pad // 2)
+    # Cards get as many member rows as let two of them fit, then as many cards
+    # as fit are drawn, keeping the object being constructed, the one before
+    # it and the member being initialized in view.
+    per_card = space if len(objects) == 1 else (space - pad // 2) // 2
+    most = max(len(c.members) for c in trace.classes)
+    rows = min(most, max(1, (per_card - pad - pad // 4) // line - 1))
+    card_h = line * (rows + 1) + pad + pad // 4
+    fit = max(1, min(len(objects), (space + pad // 2) // (card_h + pad // 2)))
+    first = max(0, min(obj - (fit > 1), len(objects) - fit))
+    heading = "Objects" if fit == len(objects) else f"Objects {first + 1}-{first + fit} of {len(objects)}"
+    draw.text((x, y), heading, font=bold, fill=_GOLD)
+    y += line + pad // 2
+    for i in range(first, first + fit):
+        name, params = objects[i]
+        members = trace.spec(i).members
+        active = i == obj and state.active
+        status = "created" if i < obj else state.status if i == obj else ""
+        initialized = len(members) if i < obj else state.initialized if i == obj else 0
+        text_color = _BLACK if active else _GOLD
+        value_color = _BLACK if active else _WHITE
+        draw.rounded_rectangle((x, y, x + inner, y + card_h), radius=radius, fill=_GOLD if active else _CARD,
+                               outline=_GOLD if active else (0x66, 0x66, 0x66), width=max(1, round(2 * u)))
+        cy = y + pad // 2
+        draw.text((x + pad // 2, cy), _fit(name, bold, inner / 2), font=bold, fill=text_color)
+        if status:
+            label, fill, ink = ("CREATING", _GOLD, _BLACK) if status == "creating" else ("✓ CREATED", _GREEN, _WHITE)
+            label_w = small.getlength(label) + pad
+            draw.rounded_rectangle((x + inner - pad // 2 - label_w, cy, x + inner - pad // 2, cy + line),
+                                   radius=line // 2, fill=fill, outline=_BLACK if fill == _GOLD else None)
+            draw.text((x + inner - pad // 2 - label_w / 2, cy + line / 2), label, font=small, fill=ink, anchor="mm")
+        cy += line + pad // 4
+        columns = (x + pad // 2, x + inner * 0.38, x + inner * 0.70)
+        shown = max(0, min(initialized - rows // 2, len(members) - rows)) if i == obj else 0
+        for j in range(shown, min(shown + rows, len(members))):
+            done = j < initialized
+            draw.text((columns[0], cy), _fit(members[j], body, inner * 0.34), font=body, fill=text_color)
+            draw.text((columns[1], cy), _fit(params[j] if j < len(params) else "...", body, inner * 0.30),
+                      font=body, fill=value_color)
+            draw.text((columns[2], cy), "✓ Initialized" if done else "○ Pending", font=small,
+                      fill=_GREEN if done else (_BLACK if active else _GREY))
+            cy += line
+        y += card_h + pad // 2
+
+    # parameter flow: the one being bound
+    if state.show_pill:
+        j = state.bound - 1
+        pill = _fit(f"{constructor_params[j]}: {trace.argument(obj, j)}", body, inner - pad * 1.5)
+        w = body.getlength(pill) + pad * 1.5
+        px, py = x, bottom - pad - round(32 * u)
+        draw.rounded_rectangle((px, py, px + w, py + round(30 * u)), radius=round(15 * u), fill=_RED,
+                               outline=_WHITE, width=max(1, round(2 * u)))
+        draw.text((px + w / 2, py + round(15 * u)), pill, font=body, fill=_WHITE, anchor="mm")
+
+    # control flow
+    if state.control:
+        cy = height - pad - round(32 * u)
+        draw.rounded_rectangle((pad, cy, width - pad, height - pad), radius=round(16 * u), fill=_PANEL, outline=_GOLD,
+                               width=max(1, round(3 * u)))
+        draw.text((width / 2, cy + round(16 * u)), _plain(state.control), font=bold, fill=_GOLD, anchor="mm")
+
+    return np.asarray(image)
+
+
+# The trace a rasterizing worker process draws from, set once when it starts.
+_worker_trace: Optional[ExecutionTrace] = None
+_worker_width = 960
+
+
+def _init_worker(trace: ExecutionTrace, width: int) -> None:
+    global _worker_trace, _worker_width
+    _worker_trace, _worker_width = trace, width
+
+
+def _rasterize_in_worker(step: int) -> np.ndarray:
+    return rasterize_step(step, _worker_trace, _worker_width)
+
+
+def rasterize_steps(trace: ExecutionTrace, width: int = 960, workers: int = 1) -> Iterator[np.ndarray]:
+    """Yield every step in order, rasterized in ``workers`` processes when more than one.
+
+    At most ``2 * workers`` steps are in flight or waiting to be taken, so
+    memory does not grow with the length of the trace.
+    """
+    steps = len(trace)
+    if workers <= 1:
+        for step in range(steps):
+            yield rasterize_step(step, trace, width)
+        return
+    # Each worker gets the trace once, not with every step.
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(trace, width))
+    try:
+        pending: Deque = deque()
+        for step in range(steps):
+            pending.append(pool.submit(_rasterize_in_worker, step))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def render_steps(parsed_data: dict, width: int = 960, workers: int = 1) -> Iterator[np.ndarray]:
+    """Like :func:`rasterize_steps`, from a parse result."""
+    return rasterize_steps(compile_trace(parsed_data), width, workers)
+
+
+def crossfade(a: np.ndarray, b: np.ndarray, count: int) -> np.ndarray:
+    """``count`` in-between frames from ``a`` to ``b``, blended in one vectorized pass."""
+    t = np.linspace(0.0, 1.0, count + 2, dtype=np.float32)[1:-1, None, None, None]
+    return (a[None].astype(np.float32) * (1 - t) + b[None].astype(np.float32) * t + 0.5).astype(np.uint8)
+
+
+def dedupe(frames: Iterable[Frame], tolerance: float = DEDUPE_TOLERANCE) -> Iterator[Frame]:
+    """Merge each frame that barely differs from the one before it into that frame's display time.
+
+    A frame is yielded once the next one is known to differ from it, so
+    only one is held back.
+    """
+    held: Optional[Frame] = None
+    for pixels, ms in frames:
+        if held is not None:
+            previous, previous_ms = held
+            changed = np.abs(previous.astype(np.int16) - pixels).max(axis=2) > _NOISE_LEVELS
+            if changed.mean() <= tolerance:
+                held = (previous, previous_ms + ms)
+                continue
+            yield held
+        held = (pixels, ms)
+    if held is not None:
+        yield held
+
+
+def _compose(steps: Iterable[np.ndarray], hold_ms: int, transition_ms: int,
+             transition_frames: int) -> Iterator[Frame]:
+    fade_ms = max(1, transition_ms // max(transition_frames, 1))
+    previous = None
+    for pixels in steps:
+        if previous is not None:
+            yield previous, hold_ms
+            if transition_frames > 0:
+                for blend in crossfade(previous, pixels, transition_frames):
+                    yield blend, fade_ms
+        previous = pixels
+    if previous is not None:
+        yield previous, hold_ms
+
+
+def animation_frames(steps: Iterable[np.ndarray], hold_ms: int = HOLD_MS, transition_ms: int = TRANSITION_MS,
+                     transition_frames: int = TRANSITION_FRAMES,
+                     tolerance: float = DEDUPE_TOLERANCE) -> Iterator[Frame]:
+    """Hold each step, cross-fade into the next, and drop redundant frames, one frame at a time."""
+    return dedupe(_compose(steps, hold_ms, transition_ms, transition_frames), tolerance)
+
+
+def gif_palette(trace: ExecutionTrace, width: int = 960) -> Image.Image:
+    """One palette for every frame, from thumbnails of the first, middle and last steps.
+
+    Those show every colour the stage uses; cross-fades lie between them.
+    """
+    steps = sorted({0, len(trace) // 2, len(trace) - 1})
+    strip = np.concatenate([rasterize_step(step, trace, width)[::4, ::4] for step in steps])
+    return Image.fromarray(strip).quantize(colors=255, method=Image.Quantize.MEDIANCUT)
+
+
+def _write_gif_frame(f, image: Image.Image, offset: Tuple[int, int], ms: int) -> None:
+    from PIL import GifImagePlugin
+
+    # disposal=1 keeps the previous frame, so each frame need only cover what changed.
+    f.write(b"".join(GifImagePlugin.getdata(image, offset, duration=ms, disposal=1)))
+
+
+def save_gif(frames: Iterable[Frame], path: str, palette: Image.Image) -> int:
+    """Encode ``frames`` as they arrive; return how many GIF frames were written.
+
+    Each frame is stored as the box that changed since the one before it.
+    """
+    from PIL import GifImagePlugin
+
+    count = 0
+    with open(path, "wb") as f:
+        previous = None  # palette indices of the last frame
+        held = None  # [image, offset, ms] of the frame not yet written, whose time may still grow
+        for pixels, ms in frames:
+            image = Image.fromarray(pixels).quantize(palette=palette, dither=Image.Dither.NONE)
+            indices = np.asarray(image)
+            if previous is None:
+                header, _ = GifImagePlugin.getheader(image, info={"loop": 0})
+                f.write(b"".join(header))
+                held = [image, (0, 0), ms]
+            else:
+                changed = indices != previous
+                if not changed.any():
+                    held[2] += ms
+                    continue
+                rows = np.flatnonzero(changed.any(axis=1))
+                cols = np.flatnonzero(changed.any(axis=0))
+                _write_gif_frame(f, *held)
+                count += 1
+                held = [image.crop((cols[0], rows[0], cols[-1] + 1, rows[-1] + 1)), (int(cols[0]), int(rows[0])), ms]
+            previous = indices
+        if held is None:
+            raise ValueError("no frames to export")
+        _write_gif_frame(f, *held)
+        f.write(b";")  # trailer
+    return count + 1
+
+
+def save_mp4(frames: Iterable[Frame], path: str, fps: int = 25) -> int:
+    """Pipe ``frames`` to ffmpeg as they arrive; return how many were encoded."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("MP4 export needs ffmpeg on PATH; export a GIF instead")
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("no frames to export")
+    height, width = first[0].shape[:2]
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+           "-r", str(fps), "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p", path]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    count = 0
+    try:
+        for pixels, ms in itertools.chain([first], frames):
+            data = np.ascontiguousarray(pixels).tobytes()
+            for _ in range(max(1, round(ms * fps / 1000))):
+                proc.stdin.write(data)
+            count += 1
+    finally:
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {proc.returncode}")
+    return count
+
+
+def export_animation(parsed_data: dict, path: str, width: int = 960, workers: int = 1) -> dict:
+    """Write the animation for ``parsed_data`` to ``path``; the extension picks GIF or MP4.
+
+    Steps are rasterized, composed, deduplicated and encoded as one stream,
+    so memory stays flat however long the trace is.
+    """
+    if not parsed_data or parsed_data.get("error"):
+        raise ValueError(parsed_data.get("error") if parsed_data else "nothing to export")
+    trace = compile_trace(parsed_data)
+    with phase("export_stream", len(trace)) as p:
+        frames = animation_frames(rasterize_steps(trace, width, workers))
+        if path.lower().endswith(".mp4"):
+            count = save_mp4(frames, path)
+        else:
+            count = save_gif(frames, path, gif_palette(trace, width))
+        p.output_size = count
+    return {"frames": count, "bytes": os.path.getsize(path)}
+
+
+def export_file(path: str, out_path: str, width: int = 960) -> dict:
+    """Parse and export one source file; never raises."""
+    start = time.perf_counter()
+    record = {"file": path, "ok": False}
+    # Write-then-rename so a failed export never leaves a truncated file behind.
+    tmp = out_path + ".tmp" + os.path.splitext(out_path)[1]
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            parsed = CPPCodeParser().parse(f.read())
+        if parsed.get("error"):
+            record["error"] = parsed["error"]
+        else:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            record.update(export_animation(parsed, tmp, width))
+            os.replace(tmp, out_path)
+            record.update(ok=True, output=out_path)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export constructor animations to GIF or MP4.")
+    ap.add_argument("sources", nargs="+", help="C++ files, or directories searched for *.cpp")
+    ap.add_argument("-o", "--out", required=True, help="output directory")
+    ap.add_argument("--format", choices=("gif", "mp4"), default="gif")
+    ap.add_argument("--width", type=int, default=960)
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (default: CPU count)")
+    args = ap.parse_args(argv)
+
+    jobs = []
+    for source in args.sources:
+        if os.path.isdir(source):
+            for path in find_sources(source, ["*.cpp"]):
+                rel = os.path.splitext(os.path.relpath(path, source))[0]
+                jobs.append((path, os.path.join(args.out, rel + "." + args.format)))
+        else:
+            name = os.path.splitext(os.path.basename(source))[0]
+            jobs.append((source, os.path.join(args.out, name + "." + args.format)))
+
+    start = time.perf_counter()
+    workers = args.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_file, path, out_path, args.width) for path, out_path in jobs]
+        records = [future.result() for future in futures]
+    failed = [r for r in records if not r["ok"]]
+    for record in failed:
+        print(f"{record['file']}: {record['error']}", file=sys.stderr)
+    total_bytes = sum(r.get("bytes", 0) for r in records)
+    print(f"{len(records) - len(failed)}/{len(records)} exported, {total_bytes / 1024:.0f} KiB "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
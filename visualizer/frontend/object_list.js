@@ -0,0 +1,98 @@
+// Virtualized object list. Draws the cards of OBJECT_LIST that are scrolled
+// into view, the way the server renders them at the step in OBJECT_STEP
+// (see replay.js; CARDS holds the styles). Every card is as tall as the one
+// with the most members, so rows keep a fixed height whatever their class. The search box filters by name,
+// and "#N" scrolls to the N-th object declared in main(). The query and
+// scroll position survive re-mounting, so they carry over from step to step.
+let objectQuery = "";
+let objectScroll = 0;
+let redrawObjectList = () => {};
+
+function escapeHtml(s) {
+  return String(s).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;")
+    .replace(/'/g, "&#x27;");
+}
+// Highlight, badge and initialized member count of object i at OBJECT_STEP: the
+// objects before the one it is about are constructed, those after it untouched.
+function cardLook(i) {
+  const at = OBJECT_STEP;
+  if (!at || i > at.obj) return { active: false, badge: "", initialized: 0 };
+  if (i < at.obj) return { active: false, badge: CARDS.badges.created, initialized: Infinity };
+  return { active: at.active, badge: CARDS.badges[at.status], initialized: at.initialized };
+}
+
+function objectCard(row, index, top) {
+  // Row 0 is the second object; the server draws the first.
+  const look = cardLook(index + 1);
+  const style = look.active ? CARDS.active : CARDS.idle;
+  let html = '<div class="obj-card" style="top:' + top + 'px;background:' + style.bg + ';border:2px solid '
+    + style.border + ';"><div class="obj-title" style="color:' + style.text + ';"><span>' + escapeHtml(row[0])
+    + ' <span class="obj-index">#' + (index + 2) + '</span></span>' + look.badge + '</div>'
+    + '<table class="member-table"><thead><tr><th>Member</th><th>Value</th><th>Status</th></tr></thead><tbody>';
+  const members = OBJECT_LIST.class_of ? OBJECT_LIST.classes[OBJECT_LIST.class_of[index]] : OBJECT_LIST.members;
+  members.forEach((member, j) => {
+    const done = j < look.initialized;
+    html += '<tr><td style="color:' + style.text + ';">' + escapeHtml(member) + '</td>'
+      + '<td style="color:' + style.value + ';">' + escapeHtml(j + 1 < row.length ? row[j + 1] : "...") + '</td>'
+      + '<td><span class="' + (done ? 'init-check">✓ Initialized' : 'init-pending">○ Pending') + '</span></td></tr>';
+  });
+  return html + '</tbody></table></div>';
+}
+function mountObjectList(root) {
+  const box = root.querySelector(".obj-virtual");
+  if (!box || !OBJECT_LIST) return;
+  const search = box.querySelector(".obj-search");
+  const count = box.querySelector(".obj-count");
+  const viewport = box.querySelector(".obj-viewport");
+  const spacer = box.querySelector(".obj-spacer");
+  const rows = OBJECT_LIST.rows;
+  const tallest = OBJECT_LIST.tallest || 0;
+  spacer.innerHTML = objectCard(rows[tallest], tallest, 0);
+  const rowHeight = spacer.firstChild.offsetHeight + 15;
+  let matches = null;
+  let pending = false;
+
+  function draw() {
+    pending = false;
+    const total = matches ? matches.length : rows.length;
+    const first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - 1);
+    const end = Math.min(total, Math.ceil((viewport.scrollTop + viewport.clientHeight) / rowHeight) + 1);
+    let html = "";
+    for (let k = first; k < end; k++) {
+      const index = matches ? matches[k] : k;
+      html += objectCard(rows[index], index, k * rowHeight);
+    }
+    spacer.style.height = total * rowHeight + "px";
+    spacer.innerHTML = html;
+  }
+  function filter() {
+    objectQuery = search.value;
+    const query = objectQuery.trim().toLowerCase();
+    const jump = /^#(\d+)$/.exec(query);
+    matches = null;
+    if (jump) {
+      viewport.scrollTop = Math.max(0, parseInt(jump[1], 10) - 2) * rowHeight;
+    } else if (query) {
+      matches = [];
+      rows.forEach((row, i) => { if (row[0].toLowerCase().includes(query)) matches.push(i); });
+      viewport.scrollTop = 0;
+    }
+    count.textContent = matches
+      ? matches.length + " of " + rows.length + " objects match"
+      : rows.length + " more objects";
+    draw();
+  }
+  viewport.onscroll = () => {
+    objectScroll = viewport.scrollTop;
+    if (!pending) {
+      pending = true;
+      requestAnimationFrame(draw);
+    }
+  };
+  search.oninput = filter;
+  redrawObjectList = draw;
+  search.value = objectQuery;
+  filter();
+  viewport.scrollTop = objectScroll;
+  draw();
+}
@@ -0,0 +1,81 @@
+// Draws the steps of an execution trace on a stage shell. A patch describes
+// one step: the event, the object it belongs to, that object's class (the
+// definition shown) and that object's state.
+// Objects before it are constructed and objects after it are untouched, so
+// going from the step on screen to the next one only repaints the cards
+// between the two objects, and within one object only the member rows that
+// changed. Shared by the stage component and the client-side player, whose
+// pages declare OBJECT_LIST, CARDS (styles and badges, sent with the shell)
+// and OBJECT_STEP (the patch on screen).
+let stageCards = [];  // server-drawn cards by object index
+let stageClasses = [];  // class definitions by class index
+
+function applyShell(root, shell) {
+  root.innerHTML = shell.html;
+  OBJECT_LIST = shell.object_list;
+  CARDS = shell.cards;
+  OBJECT_STEP = null;
+  stageCards = [];
+  root.querySelectorAll(".obj-card[data-obj]").forEach((card) => {
+    stageCards[parseInt(card.dataset.obj, 10)] = card;
+  });
+  stageClasses = [];
+  root.querySelectorAll(".class-def[data-class]").forEach((def) => {
+    stageClasses[parseInt(def.dataset.class, 10)] = def;
+  });
+  mountObjectList(root);
+}
+
+// Repaint card i; only rows from..to when its style did not change.
+function paintCard(i, from, to) {
+  const card = stageCards[i];
+  if (!card) return;
+  const look = cardLook(i);
+  const style = look.active ? CARDS.active : CARDS.idle;
+  const title = card.querySelector(".obj-title");
+  const restyle = card.dataset.active !== String(look.active);
+  card.dataset.active = look.active;
+  card.style.background = style.bg;
+  card.style.border = "2px solid " + style.border;
+  title.style.color = style.text;
+  while (title.children.length > 1) title.lastElementChild.remove();
+  title.insertAdjacentHTML("beforeend", look.badge);
+  const rows = card.querySelector("tbody").rows;
+  const first = restyle ? 0 : Math.max(0, from);
+  const end = restyle ? rows.length : Math.min(rows.length, to);
+  for (let j = first; j < end; j++) {
+    const cells = rows[j].children;
+    const status = cells[2].firstElementChild;
+    const done = j < look.initialized;
+    cells[0].style.color = style.text;
+    cells[1].style.color = style.value;
+    status.className = done ? "init-check" : "init-pending";
+    status.textContent = done ? "✓ Initialized" : "○ Pending";
+  }
+}
+
+function applyPatch(root, patch) {
+  root.querySelector(".step-badge").innerHTML = "Step " + (patch.step + 1) + "/" + patch.total + ": " + patch.text;
+  const before = OBJECT_STEP || { obj: 0, initialized: 0, cls: -1 };
+  if (before.cls !== patch.cls) {
+    stageClasses.forEach((def, k) => { def.hidden = k !== patch.cls; });
+  }
+  stageClasses[patch.cls].querySelector(".stage-ctor").hidden = !patch.ctor;
+  const params = root.querySelector("#stage-params");
+  params.hidden = !patch.pill;
+  params.querySelector(".param-row").innerHTML = patch.pill;
+  const control = root.querySelector("#stage-control");
+  control.hidden = !patch.control;
+  control.querySelector(".control-flow").innerHTML = patch.control;
+
+  OBJECT_STEP = patch;
+  if (before.obj === patch.obj) {
+    paintCard(patch.obj, Math.min(before.initialized, patch.initialized),
+      Math.max(before.initialized, patch.initialized));
+  } else {
+    const lo = Math.min(before.obj, patch.obj);
+    const hi = Math.min(Math.max(before.obj, patch.obj), stageCards.length - 1);
+    for (let i = lo; i <= hi; i++) paintCard(i, 0, Infinity);
+  }
+  if (OBJECT_LIST && (patch.obj > 0 || before.obj > 0)) redrawObjectList();
+}
@@ -0,0 +1,37 @@
+// Constructor stage component. The document loads once; the server sends the
+// shell markup once per parse and then only a small patch per step, so the
+// iframe is never rebuilt and running CSS animations keep going; replay.js
+// applies them. It talks the Streamlit component protocol directly and
+// needs no build step.
+const root = document.getElementById("root");
+let source = null;  // parse key of the shell on screen
+
+function send(type, data) {
+  window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), "*");
+}
+function reply(value) {
+  send("streamlit:setComponentValue", { value: value, dataType: "json" });
+}
+function setHeight() {
+  send("streamlit:setFrameHeight", { height: document.documentElement.scrollHeight });
+}
+
+window.addEventListener("message", (event) => {
+  const message = event.data;
+  if (!message || message.type !== "streamlit:render") return;
+  const args = message.args;
+  if (args.shell) {
+    applyShell(root, args.shell);
+    source = args.source;
+  }
+  if (source !== args.source) {
+    // Reloaded, or remounted by Streamlit: ask for the shell again.
+    reply({ need_shell: args.source, request: Date.now() + Math.random() });
+    return;
+  }
+  if (args.patch) applyPatch(root, args.patch);
+  setHeight();
+});
+
+new ResizeObserver(setHeight).observe(document.body);
+send("streamlit:componentReady", { apiVersion: 1 });
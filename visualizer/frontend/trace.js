@@ -0,0 +1,106 @@
+// Execution trace of a parse result, compiled in the browser from the spec the
+// server sends (see trace_spec in render.py): every class, and every object's
+// name, arguments and class. stepPatch(trace, step) returns the same patch
+// create_stage_patch does on the server (events.py describes the steps), so a
+// page that replays every step carries the trace instead of one patch per step.
+const CONTROL_MAIN = "⚡ CONTROL IN main() FUNCTION";
+const CONTROL_CTOR = "🔧 CONTROL INSIDE CONSTRUCTOR";
+
+function compileTrace(spec) {
+  const classOf = spec.class_of || spec.objects.map(() => 0);
+  const starts = [];
+  let total = 0;
+  classOf.forEach((c) => {
+    starts.push(total);
+    // call, transfer, one bind per parameter, one init per member, return, display
+    total += 4 + spec.classes[c][1].length + spec.classes[c][2].length;
+  });
+  return { classes: spec.classes, objects: spec.objects, classOf: classOf, starts: starts, total: total };
+}
+
+// Index of the object whose constructor sequence holds step.
+function objectAt(trace, step) {
+  let lo = 0;
+  let hi = trace.starts.length - 1;
+  while (lo < hi) {
+    const mid = (lo + hi + 1) >> 1;
+    if (trace.starts[mid] <= step) lo = mid;
+    else hi = mid - 1;
+  }
+  return lo;
+}
+
+function stepPatch(trace, step) {
+  step = Math.max(0, Math.min(trace.total - 1, step));
+  const obj = objectAt(trace, step);
+  const cls = trace.classOf[obj];
+  const members = trace.classes[cls][1];
+  const params = trace.classes[cls][2];
+  const row = trace.objects[obj];
+  const name = row[0];
+  const argument = (j) => (j + 1 < row.length ? row[j + 1] : "...");
+  let offset = step - trace.starts[obj];
+  let kind, text;
+  let status = "creating";
+  let control = CONTROL_CTOR;
+  let initialized = 0;
+  let pill = "";
+  if (offset === 0) {
+    kind = "call";
+    text = "📌 main() calls the constructor for " + name;
+    status = "";
+    control = CONTROL_MAIN;
+  } else if (offset === 1) {
+    kind = "transfer";
+    text = "⚡ Control transfers to constructor";
+  } else if ((offset -= 2) < params.length) {
+    kind = "bind";
+    text = "📦 Passing parameter: " + params[offset] + " = " + argument(offset);
+    pill = '<div class="parameter-pill">' + escapeHtml(params[offset]) + ": " + escapeHtml(argument(offset))
+      + "</div>";
+  } else if ((offset -= params.length) < members.length) {
+    kind = "init";
+    text = "🔧 Initializing: " + members[offset];
+    initialized = offset + 1;
+  } else {
+    kind = offset === members.length ? "return" : "display";
+    initialized = members.length;
+    status = "created";
+    control = CONTROL_MAIN;
+    if (kind === "return") text = "✅ Constructor completes, control returns to main()";
+    else if (step === trace.total - 1) text = "🎉 " + name + ".display() called, every object created!";
+    else text = "📢 " + name + ".display() called";
+  }
+  return {
+    step: step,
+    total: trace.total,
+    text: escapeHtml(text),
+    event: kind,
+    obj: obj,
+    cls: cls,
+    active: kind !== "return" && kind !== "display",
+    status: status,
+    initialized: initialized,
+    ctor: kind === "bind" || kind === "init",
+    pill: pill,
+    control: control,
+  };
+}
+
+// The OBJECT_LIST the server sends with a virtualized shell, built from the trace instead.
+function traceObjectList(trace) {
+  const rest = trace.classOf.slice(1);
+  const counts = trace.classes.map((c) => c[1].length);
+  const list = {
+    members: trace.classes[rest[0]][1],
+    rows: trace.objects.slice(1).map((row, k) => row.slice(0, 1 + counts[rest[k]])),
+  };
+  if (new Set(rest).size > 1) {
+    list.classes = trace.classes.map((c) => c[1]);
+    list.class_of = rest;
+    let tallest = 0;
+    rest.forEach((c, k) => { if (counts[c] > counts[rest[tallest]]) tallest = k; });
+    list.tallest = tallest;
+  }
+  return list;
+}
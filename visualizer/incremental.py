@@ -0,0 +1,426 @@
+"""Incremental reparsing of an edited source.
+
+:class:`IncrementalParser` splits the source into top-level sections, each
+ending at a ``;`` or ``}`` that leaves no bracket and no class head open,
+and keeps the recognizer's results for each: the classes it defines, its
+out-of-class constructors, and for ``main`` the objects it declares. On
+the next :meth:`~IncrementalParser.parse` the sections whose text is
+unchanged at the start and at the end of the source are kept as they are;
+only the sections in between, the ones the edit touched, are tokenized
+and scanned again. The body of the first ``main`` is cut the same way one
+level down, after every ``;`` that leaves no bracket open inside it, and
+an edit that stays inside the body retokenizes only the statements it
+touched. A statement's objects are found again when its text changed or
+when the set of class names did.
+
+A rescanned window must end where a kept section begins, at such a ``;``
+or ``}``, or a comment or string the edit opened could run into the kept
+text. When it does not, the next section joins the window, so an edit
+that unbalances the file costs up to a full parse. The recognizer takes
+only the first ``main`` and the first ``X::X(...)`` of each class, so
+each section also records which of those came before it (a
+:class:`_Context`), and a kept section whose context the edit changed is
+scanned again too. The result is always the one
+:meth:`CPPCodeParser.parse` gives for the same source.
+
+:class:`ReparseCache` keeps the parsers of recently parsed sources, so a
+parse told which source it was edited from (its ``base``) starts from that
+source's sections.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from visualizer.parser import _CLOSERS, _OPENERS, CPPCodeParser, Token, pair_brackets, tokenize
+from visualizer.timing import phase
+
+INCREMENTAL_MAX_SOURCES = int(os.environ.get("INCREMENTAL_MAX_SOURCES", "16"))
+
+
+class _Section:
+    """One top-level declaration, with the text before it back to the previous one."""
+
+    __slots__ = ("text", "closed", "classes", "in_class", "ctors", "head", "main", "after_main", "ctor_refs",
+                 "ctors_before")
+
+    def __init__(self, text: str, closed: bool):
+        self.text = text
+        self.closed = closed  # ends with ; or } and no bracket open, so the text after it lexes on its own
+        self.classes: List[dict] = []
+        self.in_class = frozenset()
+        self.ctors: Dict[str, List[str]] = {}
+        self.head = ""  # when this is main, the text up to its body
+        self.main: Optional[List[_Statement]] = None  # the statements of main's body, the last one with its }
+        # The context it was scanned in; see _Context.
+        self.after_main = False
+        self.ctor_refs = frozenset()
+        self.ctors_before = frozenset()
+
+
+class _Statement:
+    """One statement of ``main``'s body, with the text before it back to the previous one."""
+
+    __slots__ = ("text", "code", "tokens", "partner", "start", "stop", "objects", "names")
+
+    def __init__(self, text: str, code: str, tokens: List[Token], partner: List[int], start: int, stop: int):
+        self.text = text
+        # tokens[start:stop] are its own, with offsets into code; a statement shares them with its neighbours.
+        self.code = code
+        self.tokens = tokens
+        self.partner = partner
+        self.start = start
+        self.stop = stop
+        self.objects: Optional[List[dict]] = None
+        self.names = None  # the class names self.objects were found with
+
+
+class IncrementalParser(CPPCodeParser):
+    """A :class:`CPPCodeParser` that rescans only the sections an edit changed.
+
+    After each parse, ``rescanned`` is the number of characters that were
+    tokenized again.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._sections: List[_Section] = []
+        self.rescanned = 0
+
+    def parse(self, code: str):
+        try:
+            self.class_name = ""
+            self.private_members = []
+            self.constructor_params = []
+            self.objects = []
+            self.classes = []
+            self.symbols = {}
+            self.error = None
+
+            with phase("incremental_scan", len(code)) as p:
+                self._sections = self._update(code)
+                p.output_size = self.rescanned
+
+            with phase("constructor_matching") as p:
+                in_class = set()
+                ctors: Dict[str, List[str]] = {}
+                main = None
+                for section in self._sections:
+                    for symbol in section.classes:
+                        if symbol["name"] not in self.symbols:
+                            # The section keeps its own; each result gets a copy.
+                            symbol = dict(symbol, private_members=list(symbol["private_members"]),
+                                          constructor_params=list(symbol["constructor_params"]))
+                            self.classes.append(symbol)
+                            self.symbols[symbol["name"]] = symbol
+                            if symbol["name"] in section.in_class:
+                                in_class.add(symbol["name"])  # a later definition's constructor does not count
+                    for name, params in section.ctors.items():
+                        ctors.setdefault(name, params)
+                    if main is None and section.main is not None:
+                        main = section
+                if not self.classes:
+                    return {"error": "No class found. Please include a C++ class definition."}
+                for symbol in self.classes:
+                    if symbol["name"] not in in_class and symbol["name"] in ctors:
+                        symbol["constructor_params"] = list(ctors[symbol["name"]])
+                self._set_primary()
+                p.output_size = len(self.classes)
+
+            if main is not None:
+                names = frozenset(self.symbols)
+                stale = [statement for statement in main.main if statement.objects is None or statement.names != names]
+                if stale:
+                    with phase("object_extraction", sum(len(statement.text) for statement in stale)) as p:
+                        for statement in stale:
+                            self.objects = []
+                            self._scan_main(statement.code, statement.tokens, statement.partner, statement.start,
+                                            statement.stop)
+                            statement.objects, statement.names = self.objects, names
+                        p.output_size = len(stale)
+                self.objects = [obj for statement in main.main for obj in statement.objects]
+
+            return {
+                "class_name": self.class_name,
+                "private_members": self.private_members,
+                "constructor_params": self.constructor_params,
+                "objects": self.objects,
+                "classes": self.classes,
+                "error": None
+            }
+
+        except MemoryError:
+            self._sections = []
+            raise
+        except Exception as e:
+            self._sections = []
+            return {"error": str(e)}
+
+    # ---------- sections ----------
+    def _update(self, code: str) -> List[_Section]:
+        """The sections of ``code``, reusing the unchanged ones of the previous source."""
+        old = self._sections
+        i = pos = 0
+        while i < len(old) and old[i].closed and code.startswith(old[i].text, pos):
+            pos += len(old[i].text)
+            i += 1
+        j, end = len(old), len(code)
+        while j > i and end - len(old[j - 1].text) >= pos and code.endswith(old[j - 1].text, pos, end):
+            end -= len(old[j - 1].text)
+            j -= 1
+        before = _Context()
+        for section in old[:i]:
+            before.follow(section)
+        edited = None
+        if j == i + 1 and old[i].main is not None and not before.changes(old[i]):
+            edited = self._edit_main(old[i], code[pos:end], before)
+        if edited is not None:
+            fresh = [edited]
+            context = before
+            context.follow(edited)
+        else:
+            while True:
+                context = before.copy()
+                fresh = self._split(code[pos:end], context)
+                if j == len(old) or not fresh or fresh[-1].closed:
+                    break
+                # The window does not end cleanly where the kept text starts; take in the next section.
+                end += len(old[j].text)
+                j += 1
+            self.rescanned = end - pos
+        kept = old[j:]
+        for k, section in enumerate(kept):
+            if context.changes(section):
+                # The edit added or removed a main, or an X::X(...), that this section's scan depends on.
+                section = kept[k] = self._scan_section(section.text, 0, len(section.text),
+                                                       list(tokenize(section.text)), section.closed, context)
+                self.rescanned += len(section.text)
+            context.follow(section)
+        return old[:i] + fresh + kept
+
+    def _split(self, window: str, context: "_Context") -> List[_Section]:
+        """Cut ``window`` into scanned sections after every ``;`` or ``}`` that leaves no bracket open.
+
+        Brackets are matched the way :func:`pair_brackets` matches them, so
+        no bracket pair, and hence no class body or ``main``, spans a cut,
+        and with ``context`` following each section along, each one scans
+        exactly as it would inside the whole file.
+        """
+        tokens: List[Token] = list(tokenize(window))
+        sections = []
+        start = first = 0  # text offset and token index where the current section starts
+        stack: List[str] = []
+        open_count = dict.fromkeys(_OPENERS, 0)  # as in pair_brackets, so a stray closer costs O(1)
+        head = False  # after class or struct: the scan looks for its { or ; past any }
+        for i, tok in enumerate(tokens):
+            if tok.kind != "op":
+                if tok.text in ("class", "struct"):
+                    head = True
+                continue
+            text = tok.text
+            if text in _OPENERS:
+                stack.append(text)
+                open_count[text] += 1
+                head = head and text != "{"
+                continue
+            if text in _CLOSERS:
+                opener = _CLOSERS[text]
+                if not open_count[opener]:
+                    continue  # a stray closer pairs with nothing
+                while True:
+                    popped = stack.pop()
+                    open_count[popped] -= 1
+                    if popped == opener:
+                        break
+                if stack or text != "}" or head:
+                    continue
+            elif text != ";":
+                continue
+            else:
+                head = False
+                if stack:
+                    continue
+            sections.append(self._scan_section(window, start, tok.end, tokens[first:i + 1], True, context))
+            context.follow(sections[-1])
+            start, first = tok.end, i + 1
+        if start < len(window):
+            sections.append(self._scan_section(window, start, len(window), tokens[first:], False, context))
+            context.follow(sections[-1])
+        return sections
+
+    def _scan_section(self, window: str, start: int, stop: int, tokens: List[Token], closed: bool,
+                      context: "_Context") -> _Section:
+        # Token offsets stay relative to the window, which main's statements keep for slicing arguments.
+        section = _Section(window[start:stop], closed)
+        partner = pair_brackets(tokens)
+        classes, in_class, section.ctors, main_body = self._scan_declarations(tokens, partner, context.after_main,
+                                                                              context.ctors)
+        section.classes = classes
+        section.in_class = frozenset(in_class)
+        if main_body is not None:
+            body_start, body_stop = main_body
+            text_start = tokens[body_start - 1].end
+            section.head = window[start:text_start]
+            section.main = statements = []
+            first = body_start
+            reach = -1  # the furthest closer of a bracket opened in the current statement
+            for k in range(body_start, body_stop):
+                reach = max(reach, partner[k])
+                if reach < k and tokens[k].text == ";" and tokens[k].kind == "op":
+                    statements.append(_Statement(window[text_start:tokens[k].end], window, tokens, partner, first,
+                                                 k + 1))
+                    text_start, first = tokens[k].end, k + 1
+            statements.append(_Statement(window[text_start:stop], window, tokens, partner, first, body_stop))
+        section.after_main = context.after_main
+        section.ctor_refs = _ctor_refs(tokens)
+        section.ctors_before = section.ctor_refs & context.ctors
+        return section
+
+    # ---------- main's statements ----------
+    def _edit_main(self, section: _Section, window: str, context: "_Context") -> Optional[_Section]:
+        """``section``, the first ``main``, as edited into ``window``, or None when the edit left its body.
+
+        The statements unchanged at the start and at the end of the body are
+        kept; the text in between must cut into statements on its own, or
+        the kept ones after it join it, as many again each time.
+        """
+        statements = section.main
+        if not window.startswith(section.head):
+            return None
+        pos, p = len(section.head), 0
+        while p < len(statements) - 1 and window.startswith(statements[p].text, pos):
+            pos += len(statements[p].text)
+            p += 1
+        end, q = len(window), len(statements)
+        while q > p and end - len(statements[q - 1].text) >= pos and window.endswith(statements[q - 1].text, pos, end):
+            end -= len(statements[q - 1].text)
+            q -= 1
+        if q == len(statements):
+            return None  # the edit reached main's closing brace
+        grow = 1
+        while True:
+            fresh = self._split_statements(window[pos:end])
+            if fresh is not None:
+                break
+            if q == len(statements) - 1:
+                return None
+            for _ in range(min(grow, len(statements) - 1 - q)):
+                end += len(statements[q].text)
+                q += 1
+            grow *= 2
+        self.rescanned = end - pos
+        edited = _Section(window, section.closed)
+        edited.classes, edited.in_class, edited.ctors = section.classes, section.in_class, section.ctors
+        edited.head = section.head
+        edited.main = statements[:p] + fresh + statements[q:]
+        edited.after_main = section.after_main
+        # The fresh statements share one token list. Refs the edit removed stay: a superset only costs a rescan.
+        edited.ctor_refs = section.ctor_refs | _ctor_refs(fresh[0].tokens) if fresh else section.ctor_refs
+        edited.ctors_before = edited.ctor_refs & context.ctors
+        return edited
+
+    @staticmethod
+    def _split_statements(text: str) -> Optional[List[_Statement]]:
+        """Cut ``text`` from inside ``main``'s body into statements, or None when it does not stand on its own.
+
+        It must end with a ``;`` that leaves no bracket open, so the kept
+        text after it lexes and pairs as before, and must not close a
+        bracket it did not open, such as ``main``'s own ``{``.
+        """
+        if not text or text.isspace():
+            return [_Statement(text, text, [], [], 0, 0)] if text else []
+        tokens: List[Token] = list(tokenize(text))
+        if not tokens or tokens[-1].text != ";" or tokens[-1].kind != "op" or tokens[-1].end != len(text):
+            return None
+        cuts = []
+        stack: List[str] = []
+        open_count = dict.fromkeys(_OPENERS, 0)
+        for k, tok in enumerate(tokens):
+            if tok.kind != "op":
+                continue
+            if tok.text in _OPENERS:
+                stack.append(tok.text)
+                open_count[tok.text] += 1
+            elif tok.text in _CLOSERS:
+                opener = _CLOSERS[tok.text]
+                if not open_count[opener]:
+                    return None
+                while True:
+                    popped = stack.pop()
+                    open_count[popped] -= 1
+                    if popped == opener:
+                        break
+            elif tok.text == ";" and not stack:
+                cuts.append(k + 1)
+        if not cuts or cuts[-1] != len(tokens):
+            return None
+        partner = pair_brackets(tokens)
+        statements = []
+        first = start = 0
+        for cut in cuts:
+            end = tokens[cut - 1].end
+            statements.append(_Statement(text[start:end], text, tokens, partner, first, cut))
+            start, first = end, cut
+        return statements
+
+
+def _ctor_refs(tokens: List[Token]) -> frozenset:
+    """Every X::X( in ``tokens``, whether or not the scan reaches it; a superset only costs a rescan."""
+    return frozenset(tokens[k].text for k in range(len(tokens) - 3)
+                     if tokens[k + 1].text == "::" and tokens[k + 3].text == "("
+                     and tokens[k].kind == "ident" and tokens[k + 2].text == tokens[k].text)
+
+
+class _Context:
+    """What the scan of a section depends on in the sections before it.
+
+    :meth:`CPPCodeParser._scan_translation_unit` takes only the first
+    ``main`` and the first ``X::X(...)`` of each class, and jumps over the
+    body of each; a later one is scanned like any other code.
+    """
+
+    __slots__ = ("after_main", "ctors")
+
+    def __init__(self, after_main: bool = False, ctors=None):
+        self.after_main = after_main
+        self.ctors = set() if ctors is None else ctors  # classes with an out-of-class constructor so far
+
+    def copy(self) -> "_Context":
+        return _Context(self.after_main, set(self.ctors))
+
+    def follow(self, section: _Section) -> None:
+        self.after_main = self.after_main or section.main is not None
+        self.ctors.update(section.ctors)
+
+    def changes(self, section: _Section) -> bool:
+        """Whether ``section``, scanned in another context, would scan differently in this one."""
+        return section.after_main != self.after_main or \
+            any((name in self.ctors) != (name in section.ctors_before) for name in section.ctor_refs)
+
+
+class ReparseCache:
+    """Parsers of recently parsed sources by source key; see :meth:`parse`."""
+
+    def __init__(self, max_entries: int = INCREMENTAL_MAX_SOURCES):
+        self.max_entries = max_entries
+        self._parsers: "OrderedDict[str, IncrementalParser]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, code: str, key: Optional[str] = None, base: Optional[str] = None) -> dict:
+        """Parse ``code``, starting from the sections of source ``base`` when they are still here.
+
+        The parser is then kept under ``key``, for the next edit. A parser
+        is used by one parse at a time; one that raises is dropped.
+        """
+        with self._lock:
+            parser = self._parsers.pop(base, None) if base is not None else None
+        if parser is None:
+            parser = IncrementalParser()
+        result = parser.parse(code)
+        if key is not None:
+            with self._lock:
+                self._parsers[key] = parser
+                self._parsers.move_to_end(key)
+                while len(self._parsers) > self.max_entries:
+                    self._parsers.popitem(last=False)
+        return result
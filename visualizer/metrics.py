@@ -0,0 +1,393 @@
+"""In-process metrics: counters, gauges and histograms in Prometheus text format.
+
+Metrics live in a :class:`Registry` that outlives script reruns (Streamlit
+re-executes ``app.py`` on every rerun, but imported modules stay loaded),
+so ``REGISTRY.counter(name, ...)`` returns the metric registered on an
+earlier run rather than a new one. Updates take one lock per metric; a
+histogram observation is a :func:`bisect.bisect_left` over its bucket bounds, so
+instrumenting a hot path costs a few hundred nanoseconds.
+
+:func:`start_exporters` publishes :data:`REGISTRY` once per process:
+
+* ``METRICS_PORT``: serve ``GET /metrics`` on ``METRICS_HOST`` (default
+  127.0.0.1) and that port, for a Prometheus scraper;
+* ``METRICS_FILE``: rewrite that file every ``METRICS_DUMP_INTERVAL``
+  seconds, for node_exporter's textfile collector. Each dump replaces the
+  file in one rename, so a reader never sees a partial one.
+
+The headless API (:mod:`visualizer.api`) also serves ``GET /metrics``.
+"""
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger("visualizer.metrics")
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", "15"))
+
+# Seconds, from a cached frame lookup to a full parse of a large upload.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, from a step patch to the player of a thousand-object program.
+SIZE_BUCKETS = tuple(float(4 ** k * 256) for k in range(9))  # 256 B .. 16 MB
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    # HELP text escapes backslashes and newlines; only label values escape quotes too.
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """One metric family; each distinct set of label values is a child of it."""
+
+    type_name = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()  # exported as 0 before the first update
+
+    def labels(self, *values: str, **by_name: str):
+        """The child for one combination of label values, created on first use."""
+        if by_name:
+            values = tuple(str(by_name[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Metrics without labels update their only child directly.
+        return self.labels()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape_help(self.help)}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _Count:
+    """The value of one counter child; it only goes up."""
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counters only go up")
+        with self.lock:
+            self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+
+class _Value(_Count):
+    """The value of one gauge child."""
+
+    __slots__ = ("function",)
+
+    def __init__(self):
+        super().__init__()
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self.lock:
+            self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` at every scrape instead."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    """A monotonically increasing count; the name should end in ``_total``."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Count()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in sorted(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, or is computed at scrape time with :meth:`set_function`."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default().set_function(function)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)  # le: a value on a bound counts in that bucket
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in sorted(self._children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class RecentGauge(Gauge):
+    """The number of keys marked within the last ``window`` seconds, e.g. sessions that are autoplaying.
+
+    Sessions end without telling the server, so an increment that is never
+    matched by a decrement would leak; a key that stops being marked simply
+    ages out instead.
+    """
+
+    def __init__(self, name: str, help: str, window: float):
+        super().__init__(name, help)
+        self.window = window
+        self._seen: Dict[object, float] = {}
+        self._default().set_function(self._count)
+
+    def mark(self, key) -> None:
+        with self._lock:
+            self._seen[key] = time.monotonic()
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def _count(self) -> float:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            for key in [k for k, seen in self._seen.items() if seen < cutoff]:
+                del self._seen[key]
+            return len(self._seen)
+
+
+class Registry:
+    """Named metric families, registered once per process and rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def recent_gauge(self, name: str, help: str, window: float) -> RecentGauge:
+        return self._register(RecentGauge, name, help, window)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "".join(metric.render() + "\n" for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+# ---------- exporters ----------
+def serve_metrics(port: int, host: str = METRICS_HOST, registry: Registry = REGISTRY):
+    """Serve ``GET /metrics`` from a daemon thread; return the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would drown the server log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def dump_metrics(path: str, registry: Registry = REGISTRY) -> None:
+    """Write the registry to ``path``, replacing it in one rename."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def _dump_forever(path: str, interval: float) -> None:
+    while True:
+        try:
+            dump_metrics(path)
+        except OSError as e:
+            logger.warning("could not write metrics to %s: %s", path, e)
+        time.sleep(interval)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters() -> None:
+    """Start the exporters the environment asks for; once per process, later calls do nothing."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if METRICS_PORT:
+        try:
+            serve_metrics(METRICS_PORT)
+        except OSError as e:
+            # Another server process on this host already serves the port.
+            logger.warning("metrics endpoint not started on port %d: %s", METRICS_PORT, e)
+    if METRICS_FILE:
+        threading.Thread(target=_dump_forever, args=(METRICS_FILE, METRICS_DUMP_INTERVAL),
+                         name="metrics-dump", daemon=True).start()
+
+
+def timer(histogram) -> "_Timer":
+    """``with timer(h): ...`` observes the block's duration in seconds into ``h`` (or a child of it)."""
+    return _Timer(histogram)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
@@ -0,0 +1,138 @@
+"""Compact, immutable parse results.
+
+:func:`compact` turns the dict :class:`~visualizer.parser.CPPCodeParser`
+returns into ``__slots__`` objects over tuples, with identifiers interned, so
+thousands of sessions looking at similar code share one small structure
+instead of each holding dicts of lists of dicts. All of them are read-only
+mappings with the same keys as the dicts they replace, so renderers that
+call ``parsed_data.get("objects")`` or ``obj["name"]`` work with either.
+"""
+import sys
+from collections.abc import Mapping
+from typing import Iterator, Tuple
+
+_intern = sys.intern
+
+
+class _Record(Mapping):
+    """Immutable mapping over ``__slots__``; subclasses set ``_KEYS``."""
+
+    __slots__ = ()
+    _KEYS: Tuple[str, ...] = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key: str):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+
+class ClassSymbol(_Record):
+    """One class or struct definition: ``{"name", "kind", "private_members", "constructor_params"}``."""
+
+    __slots__ = ("name", "kind", "private_members", "constructor_params")
+    _KEYS = __slots__
+
+    def __init__(self, name: str, kind: str, private_members, constructor_params):
+        set_ = object.__setattr__
+        set_(self, "name", _intern(name))
+        set_(self, "kind", _intern(kind))
+        set_(self, "private_members", tuple(_intern(m) for m in private_members))
+        set_(self, "constructor_params", tuple(_intern(p) for p in constructor_params))
+
+    def __reduce__(self):
+        return type(self), (self.name, self.kind, self.private_members, self.constructor_params)
+
+    def __repr__(self) -> str:
+        return (f"ClassSymbol({self.name!r}, {self.kind!r}, {self.private_members!r}, "
+                f"{self.constructor_params!r})")
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "private_members": list(self.private_members),
+                "constructor_params": list(self.constructor_params)}
+
+
+class ParsedObject(_Record):
+    """One object declared in ``main``: ``{"name": ..., "params": (...), "class_name": ...}``."""
+
+    __slots__ = ("name", "params", "class_name")
+    _KEYS = __slots__
+
+    def __init__(self, name: str, params: Tuple[str, ...], class_name: str = ""):
+        object.__setattr__(self, "name", _intern(name))
+        object.__setattr__(self, "params", tuple(params))
+        object.__setattr__(self, "class_name", _intern(class_name))
+
+    def __reduce__(self):
+        return type(self), (self.name, self.params, self.class_name)
+
+    def __repr__(self) -> str:
+        return f"ParsedObject({self.name!r}, {self.params!r}, {self.class_name!r})"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "params": list(self.params), "class_name": self.class_name}
+
+
+class ParseResult(_Record):
+    """A successful parse; failed parses stay plain ``{"error": ...}`` dicts.
+
+    ``class_name``, ``private_members`` and ``constructor_params`` describe
+    the first class defined; ``classes`` is the symbol table of every class
+    and struct, and each object names its own.
+    """
+
+    __slots__ = ("class_name", "private_members", "constructor_params", "objects", "classes", "error")
+    _KEYS = __slots__
+
+    def __init__(self, class_name: str, private_members, constructor_params, objects, classes=None):
+        set_ = object.__setattr__
+        set_(self, "class_name", _intern(class_name))
+        set_(self, "private_members", tuple(_intern(m) for m in private_members))
+        set_(self, "constructor_params", tuple(_intern(p) for p in constructor_params))
+        set_(self, "objects", tuple(
+            o if isinstance(o, ParsedObject) else ParsedObject(o["name"], o["params"], o.get("class_name") or class_name)
+            for o in objects))
+        if classes is None:
+            classes = ((class_name, "class", self.private_members, self.constructor_params),)
+        set_(self, "classes", tuple(
+            c if isinstance(c, ClassSymbol) else
+            ClassSymbol(*c) if isinstance(c, tuple) else
+            ClassSymbol(c["name"], c.get("kind", "class"), c["private_members"], c["constructor_params"])
+            for c in classes))
+        set_(self, "error", None)
+
+    def __reduce__(self):
+        return type(self), (self.class_name, self.private_members, self.constructor_params, self.objects,
+                            self.classes)
+
+    def __repr__(self) -> str:
+        return (f"ParseResult(class_name={self.class_name!r}, private_members={self.private_members!r}, "
+                f"constructor_params={self.constructor_params!r}, objects=<{len(self.objects)}>, "
+                f"classes=<{len(self.classes)}>)")
+
+    def to_dict(self) -> dict:
+        """The JSON-ready dict ``CPPCodeParser.parse`` would have returned."""
+        return {
+            "class_name": self.class_name,
+            "private_members": list(self.private_members),
+            "constructor_params": list(self.constructor_params),
+            "objects": [o.to_dict() for o in self.objects],
+            "classes": [c.to_dict() for c in self.classes],
+            "error": None,
+        }
+
+
+def compact(parsed: dict):
+    """Return ``parsed`` as a :class:`ParseResult`; error results are returned unchanged."""
+    if isinstance(parsed, ParseResult) or not parsed or parsed.get("error"):
+        return parsed
+    return ParseResult(parsed["class_name"], parsed["private_members"], parsed["constructor_params"],
+                       parsed["objects"], parsed.get("classes"))
@@ -0,0 +1,451 @@
+"""Single-pass C++ lexer and recognizer for the constructor visualizer.
+
+The source is tokenized exactly once. Comments, preprocessor lines and the
+contents of string literals never reach the recognizer, and every bracket is
+paired up front so that skipping a block is an O(1) jump. Parse time is
+therefore linear in the size of the input, whatever the input looks like.
+"""
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from visualizer.timing import phase
+
+
+class Token(NamedTuple):
+    kind: str  # "ident", "number", "string", "char" or "op"; "pp" on request, see tokenize
+    text: str
+    start: int
+    end: int
+
+
+# Every alternative either consumes input or cannot match, and none of them
+# backtracks across more than its own token, so one scan is linear overall.
+_TOKEN_PATTERN = r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<pp>\#(?:\\\r?\n|[^\n])*)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?)
+  | (?P<char>'(?:[^'\\\n]|\\.)*'?)
+  | (?P<ident>[^\W\d]\w*)
+  | (?P<number>\.?\d(?:[eEpP][+-]|[\w.]|'(?=\w))*)
+  | (?P<op>::|->|[^\s\w])
+"""
+_TOKEN_RE = re.compile(_TOKEN_PATTERN, re.VERBOSE | re.DOTALL)
+# The same grammar over raw UTF-8 bytes, for scanning mmaps and upload buffers
+# without decoding them; identifiers are ASCII-only in this form.
+_TOKEN_RE_BYTES = re.compile(_TOKEN_PATTERN.encode(), re.VERBOSE | re.DOTALL)
+
+_SKIPPED = frozenset(("ws", "comment", "pp"))
+_RAW_PREFIXES = frozenset(("R", "LR", "uR", "UR", "u8R"))
+_RAW_DELIM_RE = re.compile(r'"([^()\\\s"]{0,16})\(')
+_RAW_DELIM_RE_BYTES = re.compile(_RAW_DELIM_RE.pattern.encode())
+
+_OPENERS = {"(": ")", "[": "]", "{": "}"}
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+_ACCESS = frozenset(("public", "private", "protected"))
+_DECL_SPECIFIERS = frozenset(("explicit", "inline", "constexpr", "virtual"))
+_NON_MEMBER_STARTS = frozenset(("using", "typedef", "friend", "template", "enum",
+                                "class", "struct", "union", "static_assert"))
+
+
+def tokenize(code: str, directives: bool = False) -> Iterator[Token]:
+    """Yield the significant tokens of ``code`` in a single left-to-right pass.
+
+    With ``directives``, each preprocessor directive is yielded too, whole,
+    as a ``"pp"`` token; the recognizer itself must not be handed those.
+    """
+    skipped = _SKIPPED - {"pp"} if directives else _SKIPPED
+    pos = 0
+    n = len(code)
+    while pos < n:
+        for m in _TOKEN_RE.finditer(code, pos):
+            kind = m.lastgroup
+            if kind in skipped:
+                continue
+            start, end = m.span()
+            if kind == "ident" and code.startswith('"', end) and m.group() in _RAW_PREFIXES:
+                delim = _RAW_DELIM_RE.match(code, end)
+                if delim:
+                    # R"tag( ... )tag" -- an unterminated raw string runs to EOF.
+                    close = code.find(")" + delim.group(1) + '"', delim.end())
+                    pos = n if close < 0 else close + len(delim.group(1)) + 2
+                    yield Token("string", code[start:pos], start, pos)
+                    break
+            yield Token(kind, m.group(), start, end)
+        else:
+            return
+
+
+def tokenize_buffer(buf) -> Iterator[Token]:
+    """Like :func:`tokenize`, over a bytes-like buffer such as an ``mmap``.
+
+    Token offsets are byte offsets into ``buf``; only the text of each token
+    is decoded, so the buffer itself is never copied.
+    """
+    pos = 0
+    n = len(buf)
+    while pos < n:
+        for m in _TOKEN_RE_BYTES.finditer(buf, pos):
+            kind = m.lastgroup
+            if kind in _SKIPPED:
+                continue
+            start, end = m.span()
+            text = m.group().decode("utf-8", "replace")
+            if kind == "ident" and buf[end:end + 1] == b'"' and text in _RAW_PREFIXES:
+                delim = _RAW_DELIM_RE_BYTES.match(buf, end)
+                if delim:
+                    close = re.compile(re.escape(b")" + delim.group(1) + b'"')).search(buf, delim.end())
+                    pos = n if close is None else close.end()
+                    yield Token("string", bytes(buf[start:pos]).decode("utf-8", "replace"), start, pos)
+                    break
+            yield Token(kind, text, start, end)
+        else:
+            return
+
+
+def pair_brackets(tokens: List[Token]) -> List[int]:
+    """Map the index of every opening bracket to the index of its closer.
+
+    Unterminated openers map to ``len(tokens)``; non-bracket tokens map to -1.
+    """
+    n = len(tokens)
+    partner = [-1] * n
+    stack: List[int] = []
+    open_count = dict.fromkeys(_OPENERS, 0)  # so "is one open below?" never scans the stack
+    for i, tok in enumerate(tokens):
+        if tok.kind != "op":
+            continue
+        text = tok.text
+        if text in _OPENERS:
+            stack.append(i)
+            open_count[text] += 1
+        elif text in _CLOSERS:
+            opener = _CLOSERS[text]
+            if not open_count[opener]:
+                continue  # a stray closer pairs with nothing
+            # Close everything left open inside the matching bracket.
+            while True:
+                j = stack.pop()
+                open_count[tokens[j].text] -= 1
+                partner[j] = i
+                if tokens[j].text == opener:
+                    break
+    for i in stack:
+        partner[i] = n
+    return partner
+
+
+def split_top_level(tokens: List[Token], start: int, stop: int,
+                    partner: List[int]) -> List[Tuple[int, int]]:
+    """Split ``tokens[start:stop]`` on commas outside brackets and ``<...>``."""
+    parts = []
+    part_start = start
+    angle = 0
+    i = start
+    while i < stop:
+        text = tokens[i].text
+        if text in _OPENERS and tokens[i].kind == "op":
+            i = partner[i] + 1
+            continue
+        if text == "<":
+            angle += 1
+        elif text == ">" and angle:
+            angle -= 1
+        elif text == "," and not angle:
+            parts.append((part_start, i))
+            part_start = i + 1
+        i += 1
+    if part_start < stop or parts:
+        parts.append((part_start, stop))
+    return parts
+
+
+class CPPCodeParser:
+    """Recognize every class and struct, and the objects ``main`` declares of them.
+
+    ``classes`` is the symbol table, in definition order, and ``symbols``
+    indexes it by name, so ``main`` is scanned once whatever the number of
+    classes. ``class_name``, ``private_members`` and ``constructor_params``
+    are those of the first class.
+    """
+
+    def __init__(self):
+        self.class_name = ""
+        self.private_members = []
+        self.constructor_params = []
+        self.objects = []
+        self.classes = []
+        self.symbols = {}
+        self.error = None
+
+    def parse(self, code: str):
+        try:
+            # Reset
+            self.class_name = ""
+            self.private_members = []
+            self.constructor_params = []
+            self.objects = []
+            self.classes = []
+            self.symbols = {}
+            self.error = None
+
+            with phase("tokenize", len(code)) as p:
+                tokens = list(tokenize(code))
+                p.output_size = len(tokens)
+            with phase("pair_brackets", len(tokens)):
+                partner = pair_brackets(tokens)
+            with phase("class_detection", len(tokens)):
+                definitions, main_body, out_of_class_ctors = self._scan_translation_unit(tokens, partner)
+
+            if not definitions:
+                return {"error": "No class found. Please include a C++ class definition."}
+
+            with phase("class_body_scan", sum(b - a for _kind, _name, (a, b) in definitions)) as p:
+                ctors = [self._add_class(tokens, partner, *definition) for definition in definitions]
+                p.output_size = sum(len(c["private_members"]) for c in self.classes)
+            with phase("constructor_matching") as p:
+                for symbol, ctor_parens in zip(self.classes, ctors):
+                    if ctor_parens is None:
+                        ctor_parens = out_of_class_ctors.get(symbol["name"])
+                    if ctor_parens is not None:
+                        symbol["constructor_params"] = self._param_names(tokens, partner, *ctor_parens)
+                self._set_primary()
+                p.output_size = len(self.classes)
+
+            if main_body is not None:
+                with phase("object_extraction", main_body[1] - main_body[0]) as p:
+                    self._scan_main(code, tokens, partner, *main_body)
+                    p.output_size = len(self.objects)
+
+            return {
+                "class_name": self.class_name,
+                "private_members": self.private_members,
+                "constructor_params": self.constructor_params,
+                "objects": self.objects,
+                "classes": self.classes,
+                "error": None
+            }
+
+        except MemoryError:
+            raise  # a resource limit, not a problem with the code; see visualizer.sandbox
+        except Exception as e:
+            return {"error": str(e)}
+
+    # ---------- recognizer ----------
+    def _scan_translation_unit(self, tokens, partner, main_seen=False, ctors_seen=()):
+        """Find every class and struct definition, ``int main() {...}`` and ``X::X(...)``.
+
+        Definitions are ``(kind, name, body span)``; a name defined twice keeps its first.
+        Only the first ``main`` and the first ``X::X(...)`` of each class count;
+        ``main_seen`` and ``ctors_seen`` say which came before ``tokens``, for
+        a caller that scans a file a piece at a time.
+        """
+        definitions = []
+        defined = set()
+        main_body = None
+        out_of_class_ctors: Dict[str, Tuple[int, int]] = {}
+        n = len(tokens)
+        i = 0
+        while i < n:
+            tok = tokens[i]
+            if tok.kind != "ident":
+                i += 1
+                continue
+            text = tok.text
+            if text in ("class", "struct") and i + 1 < n and tokens[i + 1].kind == "ident" \
+                    and not (i and tokens[i - 1].text == "enum"):
+                body = self._class_definition(tokens, partner, i + 1)
+                if body is not None:
+                    name = tokens[i + 1].text
+                    if name not in defined:
+                        defined.add(name)
+                        definitions.append((text, name, body))
+                    i = body[1] + 1
+                    continue
+            elif text == "main" and main_body is None and not main_seen and i and tokens[i - 1].text == "int" \
+                    and i + 1 < n and tokens[i + 1].text == "(":
+                after = partner[i + 1] + 1
+                if after < n and tokens[after].text == "{":
+                    main_body = (after + 1, partner[after])
+                    i = partner[after] + 1
+                    continue
+            elif i + 3 < n and tokens[i + 1].text == "::" and tokens[i + 2].text == text \
+                    and tokens[i + 3].text == "(" and text not in out_of_class_ctors and text not in ctors_seen:
+                close = partner[i + 3]
+                out_of_class_ctors[text] = (i + 4, close)
+                i = close + 1
+                continue
+            i += 1
+        return definitions, main_body, out_of_class_ctors
+
+    def _scan_declarations(self, tokens, partner, main_seen=False, ctors_seen=()):
+        """Summarize one token list without entering anything in the symbol table.
+
+        Returns ``(classes, in_class_ctors, ctors, main_body)``: one symbol
+        dict per definition, with the parameters of the constructor its body
+        declares; the names of the classes that declare one; the parameters
+        of each out-of-class constructor by class; and ``main``'s body span.
+        ``main_seen`` and ``ctors_seen`` are as for :meth:`_scan_translation_unit`.
+        """
+        definitions, main_body, out_of_class_ctors = self._scan_translation_unit(tokens, partner, main_seen,
+                                                                                 ctors_seen)
+        classes = []
+        in_class = set()
+        for kind, name, body in definitions:
+            symbol, ctor_parens = self._class_symbol(tokens, partner, kind, name, body)
+            if ctor_parens is not None:
+                symbol["constructor_params"] = self._param_names(tokens, partner, *ctor_parens)
+                in_class.add(name)
+            classes.append(symbol)
+        ctors = {name: self._param_names(tokens, partner, *span) for name, span in out_of_class_ctors.items()}
+        return classes, in_class, ctors, main_body
+
+    @staticmethod
+    def _class_definition(tokens, partner, name_idx) -> Optional[Tuple[int, int]]:
+        """Return the body span of ``class Name ... { ... }``, or None for a declaration."""
+        n = len(tokens)
+        j = name_idx + 1
+        if j < n and tokens[j].text == "final":
+            j += 1
+        if j >= n or tokens[j].text not in ("{", ":"):
+            return None
+        while j < n and tokens[j].text not in ("{", ";"):
+            j += 1
+        if j >= n or tokens[j].text != "{":
+            return None
+        return j + 1, partner[j]
+
+    def _class_symbol(self, tokens, partner, kind, name, body) -> Tuple[dict, Optional[Tuple[int, int]]]:
+        """Return one definition's symbol, without parameters yet, and its constructor's parameter span."""
+        members: List[str] = []
+        ctor_parens = self._scan_class_body(tokens, partner, *body, name, kind, members)
+        return {"name": name, "kind": kind, "private_members": members, "constructor_params": []}, ctor_parens
+
+    def _add_class(self, tokens, partner, kind, name, body) -> Optional[Tuple[int, int]]:
+        """Enter one definition in the symbol table; return its constructor's parameter span."""
+        symbol, ctor_parens = self._class_symbol(tokens, partner, kind, name, body)
+        self.classes.append(symbol)
+        self.symbols[name] = symbol
+        return ctor_parens
+
+    def _set_primary(self) -> None:
+        if self.classes:
+            first = self.classes[0]
+            self.class_name = first["name"]
+            self.private_members = first["private_members"]
+            self.constructor_params = first["constructor_params"]
+
+    def _scan_class_body(self, tokens, partner, start, stop, class_name, kind, members) -> Optional[Tuple[int, int]]:
+        """Collect data members into ``members``; return the parameter span of the constructor.
+
+        A class contributes its private members. A struct, where most teaching
+        code leaves everything public, contributes its public ones as well.
+        """
+        access = "private" if kind == "class" else "public"
+        shown = ("private",) if kind == "class" else ("private", "public")
+        ctor_decl = None
+        ctor_def = None
+        i = start
+        while i < stop:
+            tok = tokens[i]
+            if tok.text in _ACCESS and i + 1 < stop and tokens[i + 1].text == ":":
+                access = tok.text
+                i += 2
+                continue
+            if tok.text == ";":
+                i += 1
+                continue
+
+            # Find the end of this member declaration.
+            j = i
+            paren = None
+            has_body = False
+            while j < stop:
+                text = tokens[j].text
+                if text == ";":
+                    break
+                if text == "(" and paren is None:
+                    paren = j
+                if text in _OPENERS:
+                    if text == "{" and paren is not None:
+                        has_body = True
+                        j = partner[j]
+                        break
+                    j = partner[j]
+                j += 1
+
+            k = i
+            while k < j and tokens[k].text in _DECL_SPECIFIERS:
+                k += 1
+            if paren is not None:
+                if paren == k + 1 and tokens[k].text == class_name:
+                    span = (paren + 1, partner[paren])
+                    if has_body and ctor_def is None:
+                        ctor_def = span
+                    elif ctor_decl is None:
+                        ctor_decl = span
+            elif access in shown and tokens[i].text not in _NON_MEMBER_STARTS:
+                members.extend(self._declarator_names(tokens, partner, i, j))
+            i = j + 1
+        return ctor_def or ctor_decl
+
+    @staticmethod
+    def _declarator_names(tokens, partner, start, stop) -> List[str]:
+        names = []
+        for n, (a, b) in enumerate(split_top_level(tokens, start, stop, partner)):
+            name = None
+            for k in range(a, b):
+                text = tokens[k].text
+                if text in ("=", "{", "[", ":"):
+                    break
+                if tokens[k].kind == "ident":
+                    name = text
+            # The first declarator must carry a type in front of the name.
+            if name and (n or b - a >= 2):
+                names.append(name)
+        return names
+
+    @staticmethod
+    def _param_names(tokens, partner, start, stop) -> List[str]:
+        # naive param capture: take last identifier in each comma-separated param
+        params = []
+        for a, b in split_top_level(tokens, start, stop, partner):
+            name = None
+            for k in range(a, b):
+                if tokens[k].text == "=":  # remove default values
+                    break
+                if tokens[k].kind == "ident":
+                    name = tokens[k].text
+            if name and not (name == "void" and b - a == 1):
+                params.append(name)
+        return params
+
+    def _scan_main(self, code, tokens, partner, start, stop):
+        """Record ``ClassName obj(args);`` / ``ClassName obj{args};`` declarations.
+
+        Each identifier is looked up in :attr:`symbols`, so one pass finds the
+        objects of every class.
+        """
+        symbols = self.symbols
+        i = start
+        while i < stop:
+            tok = tokens[i]
+            if tok.kind != "ident" or tok.text not in symbols:
+                i += 1
+                continue
+            class_name = tok.text
+            j = i + 1
+            # One statement may declare several objects: Cls a(...), b(...);
+            while j + 1 < stop and tokens[j].kind == "ident" and tokens[j + 1].text in ("(", "{"):
+                close = partner[j + 1]
+                if close + 1 >= stop or tokens[close + 1].text not in (";", ","):
+                    break
+                raw = [code[tokens[a].start:tokens[b - 1].end] if b > a else ""
+                       for a, b in split_top_level(tokens, j + 2, close, partner)]
+                # Strip quotes for display
+                cleaned = [p.strip().strip('"').strip("'") for p in raw]
+                self.objects.append({"name": tokens[j].text, "params": cleaned, "class_name": class_name})
+                j = close + 2
+                if tokens[close + 1].text == ";":
+                    break  # the statement ends here; what follows is not declared of this class
+            i = j
@@ -0,0 +1,116 @@
+"""Debounced background parsing for a live preview of the code being edited.
+
+Each editor gets a :class:`LivePreview`. Every :meth:`~LivePreview.submit`
+starts a new generation: a parse is queued on the shared thread pool only
+once no newer text has arrived for the debounce delay, a queued parse of
+older text is cancelled, and one that is already running is left to finish
+but its result is discarded. :attr:`~LivePreview.result` therefore only ever
+moves forward, and callers never wait on a parse of outdated text. Each
+parse names the text parsed before it as its ``base``, so only the part of
+the source an edit touched is scanned again.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from visualizer.cache import parse_with_key
+
+PREVIEW_DEBOUNCE = float(os.environ.get("PREVIEW_DEBOUNCE", "0.3"))
+PREVIEW_WORKERS = int(os.environ.get("PREVIEW_WORKERS", "4"))
+
+_preview_pool = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="preview")
+
+
+class PreviewResult(NamedTuple):
+    generation: int
+    key: Optional[str]  # source key, or None when the parser raised
+    parsed: Any
+    seconds: float
+
+
+class LivePreview:
+    """Parses the newest text of one editor in the background."""
+
+    def __init__(self, parse: Callable[..., Tuple[str, Any]] = parse_with_key, debounce: float = PREVIEW_DEBOUNCE,
+                 pool: Optional[ThreadPoolExecutor] = None):
+        self._parse = parse
+        self.debounce = debounce
+        self._pool = pool or _preview_pool
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._timer: Optional[threading.Timer] = None
+        self._future: Optional[Future] = None
+        self.result: Optional[PreviewResult] = None
+        self.base: Optional[str] = None  # key of the newest text parsed; the next edit is reparsed from it
+        self._base_generation = 0
+
+    def submit(self, code: str) -> int:
+        """Schedule ``code`` for parsing, superseding anything submitted before; return its generation."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._future is not None:
+                self._future.cancel()  # only succeeds while it is still queued
+            if self.debounce <= 0:
+                self._future = self._pool.submit(self._run, generation, code)
+                return generation
+            self._timer = threading.Timer(self.debounce, self._start, (generation, code))
+            self._timer.daemon = True
+            self._timer.start()
+        return generation
+
+    def _start(self, generation: int, code: str) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._timer = None
+                self._future = self._pool.submit(self._run, generation, code)
+
+    def _run(self, generation: int, code: str) -> None:
+        if generation != self._generation:
+            return
+        start = time.perf_counter()
+        try:
+            key, parsed = self._parse(code, base=self.base)
+        except Exception as e:
+            key, parsed = None, {"error": f"{type(e).__name__}: {e}"}
+        result = PreviewResult(generation, key, parsed, time.perf_counter() - start)
+        with self._lock:
+            if key is not None and generation > self._base_generation:
+                # A parse of older text finishing late must not move base back to it.
+                self.base, self._base_generation = key, generation
+            if generation == self._generation:
+                self.result = result
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def pending(self) -> bool:
+        """Whether the newest submitted text is still waiting out the debounce or being parsed."""
+        with self._lock:
+            return self._timer is not None or (self._future is not None and not self._future.done())
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[PreviewResult]:
+        """Block until the newest text is parsed, or ``timeout`` seconds pass; for scripts and tests."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.01)
+        return None if self.pending else self.result
+
+    def cancel(self) -> None:
+        """Drop whatever is scheduled or queued; a running parse finishes but is discarded."""
+        with self._lock:
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+            self.result = None
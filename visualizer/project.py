@@ -0,0 +1,407 @@
+"""Project mode: parse a set of files joined by ``#include "..."``.
+
+Assignments are usually split into ``Student.h``, ``Student.cpp`` and
+``main.cpp``. :class:`ProjectParser` takes every source file of a project,
+read from a zip archive (:func:`load_zip`) or a folder (:func:`load_folder`),
+and starts from the file that defines ``main``. It follows each local
+``#include "..."`` the way the preprocessor would, and builds one symbol
+table from the classes it reaches. A constructor defined out of class in
+another source file (``Student::Student(...)`` in ``Student.cpp``) is
+matched the way the linker would match it.
+
+Each file is summarized once per distinct content. The summary holds its
+classes, its out-of-class constructors and its includes, and is kept in
+:data:`~visualizer.cache.header_cache` keyed by content hash. A header
+shared by every translation unit, or by every submission in a class, is
+therefore tokenized and scanned once; only the body of ``main`` is scanned
+on every parse. Parses run in sandbox workers, which are replaced now and
+then, so :func:`parse_project` hands each one the summaries the server
+process holds and keeps the ones it makes.
+
+Usage::
+
+    python -m visualizer.project PATH  # a folder or a .zip
+"""
+import hashlib
+import os
+import posixpath
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from visualizer.cache import LRUCache, header_cache, lookup_parse, remember_parse, source_key
+from visualizer.parser import CPPCodeParser, Token, pair_brackets, tokenize
+from visualizer.sandbox import ParseLimitExceeded, parse_files
+from visualizer.timing import phase
+
+PROJECT_MAX_FILES = int(os.environ.get("PROJECT_MAX_FILES", "500"))
+PROJECT_MAX_BYTES = int(os.environ.get("PROJECT_MAX_BYTES", str(16 * 1024 * 1024)))
+UNIT_SUFFIXES = (".cpp", ".cc", ".cxx", ".c++", ".c")
+SOURCE_SUFFIXES = UNIT_SUFFIXES + (".h", ".hpp", ".hh", ".hxx", ".h++", ".inl", ".ipp", ".tpp")
+
+_DIRECTIVE_RE = re.compile(r"#\s*(\w*)\s*(.*)", re.DOTALL)
+_INCLUDE_RE = re.compile(r'"([^"\n]+)"')
+_CONSTANTS = {"0": False, "false": False, "1": True, "true": True}
+
+
+class ProjectError(ValueError):
+    """A project archive or folder that cannot be read; the message is meant for the user."""
+
+
+class FileSummary(NamedTuple):
+    classes: Tuple[dict, ...]  # symbol dicts, constructor_params from in-class constructors only
+    in_class_ctors: FrozenSet[str]  # classes whose constructor appears in their definition
+    ctors: Dict[str, List[str]]  # out-of-class constructor parameters by class
+    includes: Tuple[str, ...]  # quoted include targets, as written
+    has_main: bool
+
+
+def _clean_path(name: str) -> Optional[str]:
+    """Relative POSIX form of an archive member or file name; None for anything outside the project."""
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../"):
+        return None
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.split("/")):
+        return None
+    return path
+
+
+class _Budget:
+    # Counts files and bytes as a project is read, so a zip bomb fails before it is inflated.
+    __slots__ = ("files", "bytes")
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = PROJECT_MAX_BYTES
+
+    def admit(self) -> int:
+        """Count one more file; return how many bytes it may still have."""
+        self.files += 1
+        if self.files > PROJECT_MAX_FILES:
+            raise ProjectError(f"The project has more than {PROJECT_MAX_FILES} source files.")
+        return self.bytes
+
+    def spend(self, size: int) -> None:
+        if size > self.bytes:
+            raise ProjectError(f"The project's sources are larger than {PROJECT_MAX_BYTES // (1024 * 1024)} MB.")
+        self.bytes -= size
+
+
+def load_zip(data) -> Dict[str, str]:
+    """Read the C++ sources of a zip archive (bytes-like, or a path) into ``{path: text}``."""
+    import io
+    import zipfile
+
+    budget = _Budget()
+    files = {}
+    try:
+        with zipfile.ZipFile(data if isinstance(data, str) else io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                path = _clean_path(info.filename)
+                if info.is_dir() or path is None or not path.lower().endswith(SOURCE_SUFFIXES):
+                    continue
+                allowed = budget.admit()
+                with zf.open(info) as f:
+                    raw = f.read(allowed + 1)  # the size in the directory may lie
+                budget.spend(len(raw))
+                files[path] = raw.decode("utf-8", "replace")
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+        raise ProjectError(f"Not a readable zip archive: {e}") from None
+    return files
+
+
+def load_folder(root: str) -> Dict[str, str]:
+    """Read the C++ sources below ``root`` into ``{path relative to root: text}``."""
+    budget = _Budget()
+    files = {}
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+        for name in sorted(names):
+            if not name.lower().endswith(SOURCE_SUFFIXES):
+                continue
+            full = os.path.join(directory, name)
+            path = _clean_path(os.path.relpath(full, root))
+            if path is None:
+                continue
+            allowed = budget.admit()
+            with open(full, "rb") as f:
+                raw = f.read(allowed + 1)
+            budget.spend(len(raw))
+            files[path] = raw.decode("utf-8", "replace")
+    return files
+
+
+def live_includes(directives: List[Token]) -> Tuple[str, ...]:
+    """The quoted targets of the ``#include`` directives a compiler would see.
+
+    ``directives`` are ``"pp"`` tokens, so includes inside comments never
+    get here. Groups under ``#if 0`` (or ``false``), and the ``#else`` of
+    ``#if 1``, are skipped; a condition that is not a constant may go
+    either way, so all of its branches count.
+    """
+    includes = []
+    # One (enclosing group live, this branch live, some earlier branch certainly taken) per open #if.
+    levels: List[Tuple[bool, bool, bool]] = []
+    live = True
+    for tok in directives:
+        m = _DIRECTIVE_RE.match(tok.text)
+        name, rest = m.group(1), m.group(2).split("//", 1)[0].strip()
+        if name in ("if", "ifdef", "ifndef"):
+            value = _CONSTANTS.get(rest) if name == "if" else None
+            levels.append((live, live and value is not False, value is True))
+        elif name == "elif" and levels:
+            outer, _branch, taken = levels[-1]
+            value = _CONSTANTS.get(rest)
+            levels[-1] = (outer, outer and not taken and value is not False, taken or value is True)
+        elif name == "else" and levels:
+            outer, _branch, taken = levels[-1]
+            levels[-1] = (outer, outer and not taken, True)
+        elif name == "endif" and levels:
+            levels.pop()
+        elif name == "include" and live:
+            target = _INCLUDE_RE.match(rest)
+            if target:
+                includes.append(target.group(1))
+        live = levels[-1][1] if levels else True
+    return tuple(includes)
+
+
+def project_key(files: Dict[str, str]) -> str:
+    """Content hash of a whole project: every path and the hash of its normalized text."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in sorted(files):
+        h.update(f"{path}\0{source_key(files[path])}\0".encode("utf-8"))
+    return "proj-" + h.hexdigest()
+
+
+class ProjectParser(CPPCodeParser):
+    """Parse a project given as ``{relative path: text}``; call :meth:`parse_project`.
+
+    After a parse, ``main_file`` is the translation unit whose ``main`` was
+    scanned (None when there is none), ``included`` the files it reached in
+    preprocessor order, ``missing_includes`` the ``(file, target)`` pairs
+    that named no project file, ``files_scanned`` how many files missed
+    the summary cache, and ``new_summaries`` the summaries made for them by
+    content key. Classes are in preprocessor order, except that the
+    class of the first object ``main`` declares comes first.
+    """
+
+    def __init__(self, files: Dict[str, str], cache: Optional[LRUCache] = None):
+        super().__init__()
+        self.files = files
+        self._cache = header_cache if cache is None else cache
+        self.main_file: Optional[str] = None
+        self.included: List[str] = []
+        self.missing_includes: List[Tuple[str, str]] = []
+        self.files_scanned = 0
+        self.new_summaries: Dict[str, FileSummary] = {}
+        self._summaries: Dict[str, FileSummary] = {}
+        # (tokens, partner, main body) of the files with a main summarized by this parser, for object extraction.
+        self._mains: Dict[str, tuple] = {}
+
+    def resolve_include(self, including: str, target: str) -> Optional[str]:
+        """The project file ``#include "target"`` in ``including`` names, or None.
+
+        Like ``-I`` for every enclosing directory: the including file's own
+        directory first, then each parent up to the project root.
+        """
+        base = posixpath.dirname(including)
+        while True:
+            path = posixpath.normpath(posixpath.join(base, target))
+            if path in self.files:
+                return path
+            if not base:
+                return None
+            base = posixpath.dirname(base)
+
+    def summary(self, path: str) -> FileSummary:
+        """The summary of one project file, from the cache when its content was seen before."""
+        summary = self._summaries.get(path)
+        if summary is None:
+            code = self.files[path]
+            key = source_key(code)
+            summary = self._cache.get(key)
+            if summary is None:
+                summary = self._summarize(path, code)
+                self._cache.put(key, summary)
+                self.new_summaries[key] = summary
+                self.files_scanned += 1
+            self._summaries[path] = summary
+        return summary
+
+    def _summarize(self, path: str, code: str) -> FileSummary:
+        tokens, directives = [], []
+        for tok in tokenize(code, directives=True):
+            (directives if tok.kind == "pp" else tokens).append(tok)
+        partner = pair_brackets(tokens)
+        classes, in_class, ctors, main_body = self._scan_declarations(tokens, partner)
+        if main_body is not None:
+            self._mains[path] = (tokens, partner, main_body)
+        return FileSummary(tuple(classes), frozenset(in_class), ctors, live_includes(directives),
+                           main_body is not None)
+
+    def _include_order(self, roots: List[str]) -> List[str]:
+        """Files reached from ``roots``, each once, every file after the files it includes."""
+        order: List[str] = []
+        seen = set()
+        for root in roots:
+            if root in seen:
+                continue
+            seen.add(root)
+            # Depth-first without recursion; a file is emitted once all of its includes are.
+            stack = [(root, iter(self.summary(root).includes))]
+            while stack:
+                path, targets = stack[-1]
+                for target in targets:
+                    resolved = self.resolve_include(path, target)
+                    if resolved is None:
+                        self.missing_includes.append((path, target))
+                    elif resolved not in seen:
+                        seen.add(resolved)
+                        stack.append((resolved, iter(self.summary(resolved).includes)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(path)
+        return order
+
+    def parse_project(self) -> dict:
+        """Parse the project into the same dict :meth:`CPPCodeParser.parse` returns."""
+        try:
+            self.class_name = ""
+            self.private_members = []
+            self.constructor_params = []
+            self.objects = []
+            self.classes = []
+            self.symbols = {}
+            self.error = None
+            self.main_file = None
+            self.missing_includes = []
+            self.files_scanned = 0
+            self.new_summaries = {}
+
+            with phase("include_resolution", len(self.files)) as p:
+                units = sorted(path for path in self.files if path.lower().endswith(UNIT_SUFFIXES))
+                mains = [path for path in units if self.summary(path).has_main]
+                if mains:
+                    # Several exercises in one archive: prefer a main.cpp, then the first by path.
+                    self.main_file = min(mains, key=lambda path: (posixpath.basename(path) != "main.cpp", path))
+                roots = [self.main_file] if self.main_file else units or sorted(self.files)
+                self.included = self._include_order(roots)
+                p.output_size = self.files_scanned
+
+            with phase("constructor_matching") as p:
+                in_class = set()
+                for path in self.included:
+                    summary = self.summary(path)
+                    for symbol in summary.classes:
+                        if symbol["name"] in self.symbols:
+                            continue
+                        # Summaries are shared through the cache; the result gets its own copy.
+                        symbol = dict(symbol, private_members=list(symbol["private_members"]),
+                                      constructor_params=list(symbol["constructor_params"]))
+                        self.classes.append(symbol)
+                        self.symbols[symbol["name"]] = symbol
+                    in_class |= summary.in_class_ctors
+                if not self.classes:
+                    return {"error": "No class found. Please include a C++ class definition."}
+                # Out-of-class constructors: the included files first, then every other unit.
+                linked: Dict[str, List[str]] = {}
+                reached = set(self.included)
+                for path in self.included + [unit for unit in units if unit not in reached]:
+                    for name, params in self.summary(path).ctors.items():
+                        linked.setdefault(name, params)
+                for symbol in self.classes:
+                    if symbol["name"] not in in_class and symbol["name"] in linked:
+                        symbol["constructor_params"] = list(linked[symbol["name"]])
+                self._set_primary()
+                p.output_size = len(self.classes)
+
+            if self.main_file is not None:
+                code = self.files[self.main_file]
+                with phase("object_extraction", len(code)) as p:
+                    scanned = self._mains.get(self.main_file)
+                    if scanned is None:  # its summary came from the cache
+                        tokens = list(tokenize(code))
+                        partner = pair_brackets(tokens)
+                        _definitions, main_body, _ctors = self._scan_translation_unit(tokens, partner)
+                    else:
+                        tokens, partner, main_body = scanned
+                    self._mains.clear()
+                    self._scan_main(code, tokens, partner, *main_body)
+                    p.output_size = len(self.objects)
+                if self.objects:
+                    # Headers put base classes and helpers first; the lead class is the one main uses first.
+                    lead = self.symbols[self.objects[0]["class_name"]]
+                    self.classes.remove(lead)
+                    self.classes.insert(0, lead)
+                    self._set_primary()
+
+            return {
+                "class_name": self.class_name,
+                "private_members": self.private_members,
+                "constructor_params": self.constructor_params,
+                "objects": self.objects,
+                "classes": self.classes,
+                "error": None
+            }
+
+        except MemoryError:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def parse_project(files: Dict[str, str]) -> Tuple[str, dict]:
+    """Parse a project through the shared caches; return ``(project key, compact result)``.
+
+    The parse itself runs in the :mod:`visualizer.sandbox`, under its limits.
+    """
+    if not files:
+        return "", {"error": "The project has no C++ source files."}
+    key = project_key(files)
+    parsed = lookup_parse(key)
+    if parsed is None:
+        known = {}
+        for text in files.values():
+            summary = header_cache.get(source_key(text))
+            if summary is not None:
+                known[source_key(text)] = summary
+        try:
+            parsed, made = parse_files(files, known)
+        except ParseLimitExceeded as e:
+            return key, {"error": str(e)}  # not cached, as in parse_with_key
+        for k, summary in made.items():
+            header_cache.put(k, summary)
+        remember_parse(key, parsed)
+    return key, parsed
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description="Parse a C++ project from a folder or a zip archive.")
+    ap.add_argument("path")
+    args = ap.parse_args(argv)
+
+    try:
+        files = load_folder(args.path) if os.path.isdir(args.path) else load_zip(args.path)
+    except (ProjectError, OSError) as e:
+        print(f"{args.path}: {e}")
+        return 1
+    parser = ProjectParser(files)
+    parsed = parser.parse_project()
+    print(json.dumps({
+        "files": len(files),
+        "main_file": parser.main_file,
+        "included": parser.included,
+        "missing_includes": parser.missing_includes,
+        "error": parsed["error"],
+        "classes": [c["name"] for c in parsed.get("classes", [])],
+        "objects": len(parsed.get("objects", [])),
+    }, indent=2))
+    return 0 if not parsed["error"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
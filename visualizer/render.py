@@ -0,0 +1,754 @@
+"""HTML rendering of the constructor animation.
+
+Everything here returns self-contained HTML documents for
+``components.html()``, which renders into an iframe, so the CSS has to
+travel with every document.
+"""
+import json
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+from visualizer.events import ClassSpec, ExecutionTrace, StepState, compile_trace
+from visualizer.templates import Template, escape, escape_all
+from visualizer.timing import phase
+
+# Static browser code: the stage component page and the scripts documents share.
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend")
+# Above this many objects, cards after the first are drawn in the browser,
+# and only while they are scrolled into view.
+VIRTUAL_LIST_THRESHOLD = 50
+
+# IMPORTANT: Include CSS INSIDE the HTML because components.html() is an iframe.
+ANIMATION_CSS = """
+      <style>
+        body {
+          margin: 0;
+          font-family: 'Segoe UI', Arial, sans-serif;
+          color: white;
+        }
+
+        .wrapper {
+          border: 4px solid #4CAF50;
+          border-radius: 20px;
+          padding: 25px;
+          background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+          box-shadow: 0 20px 30px rgba(0,0,0,0.3);
+        }
+
+        .step-badge {
+          background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%);
+          color: black;
+          padding: 15px 25px;
+          border-radius: 50px;
+          font-weight: bold;
+          font-size: 22px;
+          text-align: center;
+          margin-bottom: 20px;
+          border: 2px solid white;
+        }
+
+        .grid {
+          display: flex;
+          gap: 25px;
+          margin-top: 10px;
+        }
+
+        .class-box {
+          background: #1E1E1E;
+          border-radius: 15px;
+          padding: 20px;
+          border: 3px solid #4CAF50;
+          box-shadow: 0 5px 15px rgba(0,0,0,0.3);
+          flex: 1;
+        }
+
+        .object-box {
+          background: #2D2D2D;
+          border-radius: 15px;
+          padding: 20px;
+          border: 3px solid #FFD700;
+          box-shadow: 0 5px 15px rgba(0,0,0,0.3);
+          flex: 1;
+        }
+
+        .private-member {
+          color: #FF6B6B;
+          font-size: 16px;
+          margin: 8px 0;
+          padding-left: 10px;
+          font-family: 'Courier New', monospace;
+        }
+
+        .public-member {
+          color: #6BFF6B;
+          font-size: 16px;
+          margin: 8px 0;
+          padding-left: 10px;
+          font-family: 'Courier New', monospace;
+        }
+
+        .ctor-box {
+          margin-top: 20px;
+          padding: 15px;
+          background: #2D2D2D;
+          border-radius: 10px;
+          border-left: 5px solid #FFD700;
+        }
+        .ctor-title { color:#FFD700; margin:0 0 10px 0; }
+        .ctor-line {
+          color: white;
+          font-family: monospace;
+          margin: 5px 0;
+        }
+
+        .obj-card {
+          border-radius: 12px;
+          padding: 15px;
+          margin: 15px 0;
+          transition: all 0.3s;
+        }
+        .obj-title {
+          font-size: 20px;
+          font-weight: 700;
+          display:flex;
+          justify-content: space-between;
+          align-items:center;
+          margin-bottom: 10px;
+        }
+
+        .status-badge {
+          padding: 5px 12px;
+          border-radius: 20px;
+          font-size: 12px;
+          font-weight: 700;
+        }
+        .creating-badge { background:#FFD700; color:black; }
+        .created-badge { background:#4CAF50; color:white; }
+
+        .member-table {
+          width: 100%;
+          border-collapse: collapse;
+        }
+        .member-table th {
+          color: #FFD700;
+          text-align: left;
+          padding: 8px;
+          border-bottom: 2px solid #FFD700;
+        }
+        .member-table td {
+          padding: 8px;
+          border-bottom: 1px solid #444;
+        }
+        .init-check { color:#4CAF50; font-weight: 800; }
+        .init-pending { color:#BBB; }
+
+        .param-area { margin-top: 25px; text-align:center; }
+        .param-row {
+          display:flex;
+          justify-content:center;
+          gap: 20px;
+          flex-wrap: wrap;
+          margin-bottom: 10px;
+        }
+        .parameter-pill {
+          background: linear-gradient(135deg, #FF6B6B 0%, #FF8E8E 100%);
+          color: white;
+          padding: 10px 18px;
+          border-radius: 30px;
+          font-weight: bold;
+          font-size: 16px;
+          border: 2px solid white;
+          box-shadow: 0 5px 10px rgba(0,0,0,0.2);
+          animation: bounce 1s infinite;
+        }
+        @keyframes bounce {
+          0%,100% { transform: translateY(0); }
+          50% { transform: translateY(-8px); }
+        }
+
+        .arrow-animation {
+          font-size: 18px;
+          color: #FFD700;
+          font-weight: 800;
+          margin-top: 6px;
+        }
+
+        .control-flow {
+          background: #2D2D2D;
+          padding: 12px;
+          border-radius: 50px;
+          text-align: center;
+          font-weight: bold;
+          font-size: 18px;
+          margin-top: 20px;
+          border: 3px solid #FFD700;
+          color: #FFD700;
+        }
+
+        .obj-search {
+          width: 100%;
+          box-sizing: border-box;
+          padding: 10px 14px;
+          border-radius: 10px;
+          border: 2px solid #FFD700;
+          background: #1E1E1E;
+          color: white;
+          font-size: 15px;
+        }
+        .obj-count { color:#BBB; font-size: 13px; margin: 6px 0; }
+        .obj-index { color:#BBB; font-size: 13px; }
+        .obj-viewport {
+          height: 420px;
+          overflow-y: auto;
+          position: relative;
+        }
+        .obj-viewport .obj-card {
+          position: absolute;
+          left: 0;
+          right: 0;
+          margin: 0;
+        }
+      </style>
+"""
+
+
+
+def _read_frontend(name: str) -> str:
+    with open(os.path.join(FRONTEND_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+_NO_DATA_HTML = "<div style='color:red;padding:20px;font-family:sans-serif;'>No valid data to display</div>"
+
+# ---------- TEMPLATES (compiled once at import) ----------
+_DOC_HEAD = Template("""
+    <html>
+    <head>
+      <meta charset="utf-8" />
+""").render() + ANIMATION_CSS + Template("""
+    </head>
+    <body>
+""").render()
+_DOC_TAIL = Template("""
+    </body>
+    </html>
+""").render()
+
+_FRAME_HEAD = Template("""
+      <div class="wrapper">
+        <div class="step-badge">Step {step}/{total}: {text}</div>
+
+        <div class="grid">
+          <div class="class-box">
+""")
+_CLASS_HEAD = Template("""
+            <h2 style="color:#4CAF50;margin-top:0;border-bottom:2px solid #4CAF50;padding-bottom:10px;">📦 {class_name} {kind}</h2>
+
+            <div style="margin:20px 0;">
+              <h3 style="color:#FF6B6B;margin:10px 0;">{members_title}</h3>
+""")
+# Title and member heading of each kind of definition; structs show their public members too.
+_KIND_TITLES = {"class": ("Class", "🔒 Private Members:"), "struct": ("Struct", "📋 Data Members:")}
+_CLASS_DEF = Template('<div class="class-def" data-class="{index}"{hidden}>')
+_CLASS_DEF_CLOSE = "</div>"
+_PRIVATE_MEMBER = Template('<div class="private-member">• {name}</div>')
+_PUBLIC_METHODS = Template("""
+            </div>
+
+            <div style="margin:20px 0;">
+              <h3 style="color:#6BFF6B;margin:10px 0;">🔓 Public Methods:</h3>
+              <div class="public-member">+ {class_name}({params})</div>
+              <div class="public-member">+ display()</div>
+            </div>
+""")
+_CTOR_OPEN = Template("""
+        <div class="ctor-box">
+            <h4 class="ctor-title">⚙️ Constructor Execution:</h4>
+""").render()
+_CTOR_LINE = Template('<div class="ctor-line">{member} = {param};</div>')
+_CTOR_CLOSE = "</div>"
+_OBJECTS_OPEN = Template("""
+          </div>
+
+          <div class="object-box">
+            <h2 style="color:#FFD700;margin-top:0;border-bottom:2px solid #FFD700;padding-bottom:10px;">🎯 Objects</h2>
+""").render()
+_OBJ_CARD_OPEN = Template("""
+        <div class="obj-card" data-obj="{index}" style="background:{bg};border:2px solid {border};">
+            <div class="obj-title" style="color:{text};">
+                <span>{name}</span>
+                {badge}
+            </div>
+            <table class="member-table">
+                <thead>
+                    <tr><th>Member</th><th>Value</th><th>Status</th></tr>
+                </thead>
+                <tbody>
+""")
+_MEMBER_ROW = Template("""
+            <tr>
+                <td style="color:{text};">{member}</td>
+                <td style="color:{value_color};">{value}</td>
+                <td><span class="{status_class}">{status_text}</span></td>
+            </tr>
+""")
+_OBJ_CARD_CLOSE = Template("""
+                </tbody>
+            </table>
+        </div>
+""").render()
+_OBJECTS_CLOSE = Template("""
+          </div>
+        </div>
+""").render()
+_PARAM_AREA_OPEN = Template("""
+        <div class="param-area">
+            <div class="param-row">
+""").render()
+_PARAMETER_PILL = Template('<div class="parameter-pill">{param}: {value}</div>')
+_PARAM_AREA_CLOSE = Template("""
+            </div>
+            <div class="arrow-animation">⬇️ ⬇️ ⬇️ PARAMETERS FLOWING TO CONSTRUCTOR ⬇️ ⬇️ ⬇️</div>
+        </div>
+""").render()
+_VIRTUAL_LIST = Template("""
+        <div class="obj-virtual">
+            <input class="obj-search" type="search" placeholder="🔍 Search {count} more objects, or #number to jump" />
+            <div class="obj-count"></div>
+            <div class="obj-viewport"><div class="obj-spacer"></div></div>
+        </div>
+""")
+_VIRTUAL_DATA = Template("""
+      <script>
+        const OBJECT_LIST = {object_list};
+        const CARDS = {cards};
+        const OBJECT_STEP = {object_step};
+      </script>
+""")
+_CONTROL_FLOW = Template('<div class="control-flow">{text}</div>')
+_FRAME_CLOSE = "</div>"
+
+_CREATING_BADGE = '<span class="status-badge creating-badge">⚡ CREATING</span>'
+_CREATED_BADGE = '<span class="status-badge created-badge">✓ CREATED</span>'
+_STATUS_BADGES = {"": "", "creating": _CREATING_BADGE, "created": _CREATED_BADGE}
+
+
+class _FrameData(NamedTuple):
+    """Parse result with every user-supplied string escaped exactly once."""
+    classes: Tuple[ClassSpec, ...]
+    objects: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    class_of: Tuple[int, ...]  # as ExecutionTrace.class_of, for the objects above
+    # Unescaped ``{"members": [...], "rows": [[name, value, ...], ...]}`` for
+    # every object after the first, or None when the server renders every card.
+    # With objects of several classes, ``classes`` lists each class's members,
+    # ``class_of`` the class of each row and ``tallest`` the row with the most.
+    virtual_objects: Optional[dict] = None
+
+
+def _valid(parsed_data: dict) -> bool:
+    return bool(parsed_data) and not parsed_data.get("error")
+
+
+def _frame_data(trace: ExecutionTrace) -> _FrameData:
+    objects = trace.objects
+    class_of = trace.class_of
+    virtual_objects = None
+    if len(objects) > VIRTUAL_LIST_THRESHOLD:
+        counts = [len(spec.members) for spec in trace.classes]
+        rest = class_of[1:]
+        virtual_objects = {
+            "members": list(trace.classes[rest[0]].members),
+            "rows": [[name, *args[:counts[c]]] for (name, args), c in zip(objects[1:], rest)],
+        }
+        if len(set(rest)) > 1:
+            virtual_objects["classes"] = [list(spec.members) for spec in trace.classes]
+            virtual_objects["class_of"] = list(rest)
+            virtual_objects["tallest"] = max(range(len(rest)), key=lambda k: counts[rest[k]])
+        objects = objects[:1]
+        class_of = class_of[:1]
+    return _FrameData(
+        classes=tuple(ClassSpec(escape(spec.name), escape_all(spec.members), escape_all(spec.params), spec.kind)
+                      for spec in trace.classes),
+        objects=tuple((escape(name), escape_all(args)) for name, args in objects),
+        class_of=class_of,
+        virtual_objects=virtual_objects,
+    )
+
+
+class _CardStyle(NamedTuple):
+    bg: str
+    border: str
+    text: str
+    value: str
+
+
+_ACTIVE_CARD = _CardStyle(bg="#FFD700", border="#FFD700", text="black", value="black")
+_IDLE_CARD = _CardStyle(bg="#363636", border="#666", text="#FFD700", value="white")
+# How the browser draws cards; patches only say which object is where.
+_CARDS = {"active": _ACTIVE_CARD._asdict(), "idle": _IDLE_CARD._asdict(), "badges": _STATUS_BADGES}
+
+
+def _card_look(i: int, state: StepState, members: int) -> Tuple[_CardStyle, str, int]:
+    """Style, badge and initialized member count of object ``i`` at ``state``."""
+    obj = state.event.obj
+    if i < obj:
+        return _IDLE_CARD, _CREATED_BADGE, members
+    if i > obj:
+        return _IDLE_CARD, "", 0
+    return (_ACTIVE_CARD if state.active else _IDLE_CARD), _STATUS_BADGES[state.status], state.initialized
+
+
+def _write_card(out: List[str], index: int, name: str, params: Tuple[str, ...], members: Tuple[str, ...],
+                style: _CardStyle = _IDLE_CARD, badge: str = "", initialized: int = 0) -> None:
+    bg, border, text, value_color = style
+    out.append(_OBJ_CARD_OPEN.format(index=index, bg=bg, border=border, text=text, name=name, badge=badge))
+    for j, member in enumerate(members):
+        init_done = j < initialized
+        out.append(_MEMBER_ROW.format(
+            text=text,
+            member=member,
+            value_color=value_color,
+            value=params[j] if j < len(params) else "...",
+            status_class="init-check" if init_done else "init-pending",
+            status_text="✓ Initialized" if init_done else "○ Pending",
+        ))
+    out.append(_OBJ_CARD_CLOSE)
+
+
+def _pill(trace: ExecutionTrace, state: StepState) -> str:
+    """The parameter being bound at ``state``, as a pill, or "" when none is."""
+    if not state.show_pill:
+        return ""
+    j = state.bound - 1
+    param = trace.classes[state.cls].params[j]
+    return _PARAMETER_PILL.format(param=escape(param), value=escape(trace.argument(state.event.obj, j)))
+
+
+def _write_class(out: List[str], spec: ClassSpec) -> None:
+    """Append the definition box of one (escaped) class: its name, members and public methods."""
+    kind, members_title = _KIND_TITLES.get(spec.kind, _KIND_TITLES["class"])
+    _CLASS_HEAD.write(out, class_name=spec.name, kind=kind, members_title=members_title)
+    out.extend(_PRIVATE_MEMBER.format(name=member) for member in spec.members)
+    _PUBLIC_METHODS.write(out, class_name=spec.name, params=", ".join(spec.params))
+
+
+def _write_ctor(out: List[str], spec: ClassSpec) -> None:
+    out.append(_CTOR_OPEN)
+    out.extend(_CTOR_LINE.format(member=member, param=param) for member, param in zip(spec.members, spec.params))
+    out.append(_CTOR_CLOSE)
+
+
+def _write_frame(out: List[str], state: StepState, data: _FrameData, trace: ExecutionTrace) -> None:
+    """Append the markup of the animation wrapper for one step (no document shell)."""
+    classes, objects, class_of, virtual_objects = data
+    append = out.append
+
+    # the class of the object being constructed, with its constructor body (assignment view)
+    _FRAME_HEAD.write(out, step=state.step + 1, total=len(trace), text=escape(state.text))
+    _write_class(out, classes[state.cls])
+    if state.show_ctor:
+        _write_ctor(out, classes[state.cls])
+
+    # objects: the ones before event.obj are constructed, the ones after it untouched
+    append(_OBJECTS_OPEN)
+    for i, (name, params) in enumerate(objects):
+        members = classes[class_of[i]].members
+        _write_card(out, i, name, params, members, *_card_look(i, state, len(members)))
+    if virtual_objects is not None:
+        _VIRTUAL_LIST.write(out, count=len(virtual_objects["rows"]))
+    append(_OBJECTS_CLOSE)
+
+    # parameter flow
+    if state.show_pill:
+        append(_PARAM_AREA_OPEN)
+        append(_pill(trace, state))
+        append(_PARAM_AREA_CLOSE)
+
+    # control flow
+    if state.control:
+        _CONTROL_FLOW.write(out, text=state.control)
+    append(_FRAME_CLOSE)
+
+
+def create_animation_html(step: int, parsed_data: dict, trace: Optional[ExecutionTrace] = None) -> str:
+    """Return FULL HTML (with CSS) for components.html() rendering.
+
+    Pass the :func:`~visualizer.events.compile_trace` of ``parsed_data`` as
+    ``trace`` to skip compiling it again.
+    """
+    if not _valid(parsed_data):
+        return _NO_DATA_HTML
+
+    with phase("render_frame", len(parsed_data.get("objects", []))) as p:
+        trace = trace or compile_trace(parsed_data)
+        data = _frame_data(trace)
+        state = trace.state(step)
+        out = [_DOC_HEAD]
+        _write_frame(out, state, data, trace)
+        if data.virtual_objects is not None:
+            _VIRTUAL_DATA.write(out, object_list=_script_json(data.virtual_objects), cards=_script_json(_CARDS),
+                                object_step=_script_json(_patch(trace, state)))
+            out.append(_OBJECT_LIST_JS)
+            out.append(_MOUNT_DOCUMENT)
+        out.append(_DOC_TAIL)
+        html = "".join(out)
+        p.output_size = len(html)
+    return html
+
+
+_STAGE_SECTION = Template('<div id="{id}" hidden>')
+_STAGE_CTOR = '<div class="stage-ctor" hidden>'
+_STAGE_SECTION_CLOSE = "</div>"
+
+
+def create_stage_shell(parsed_data: dict, trace: Optional[ExecutionTrace] = None) -> dict:
+    """Return the markup the stage component loads once per parse.
+
+    It holds every element any step can show, with every object not yet
+    constructed. Sections that only some steps show start hidden, among them
+    the definition of every class but the first object's, and
+    :func:`create_stage_patch` says what each step changes.
+    """
+    if not _valid(parsed_data):
+        return {"html": _NO_DATA_HTML, "object_list": None, "cards": _CARDS}
+
+    with phase("render_stage_shell", len(parsed_data.get("objects", []))) as p:
+        trace = trace or compile_trace(parsed_data)
+        data = _frame_data(trace)
+        classes, objects, class_of, virtual_objects = data
+        out = [ANIMATION_CSS]
+        append = out.append
+
+        _FRAME_HEAD.write(out, step=1, total=len(trace), text="")
+        for k, spec in enumerate(classes):
+            _CLASS_DEF.write(out, index=k, hidden="" if k == class_of[0] else " hidden")
+            _write_class(out, spec)
+            append(_STAGE_CTOR)
+            _write_ctor(out, spec)
+            append(_STAGE_SECTION_CLOSE)
+            append(_CLASS_DEF_CLOSE)
+
+        append(_OBJECTS_OPEN)
+        for i, (name, params) in enumerate(objects):
+            _write_card(out, i, name, params, classes[class_of[i]].members)
+        if virtual_objects is not None:
+            _VIRTUAL_LIST.write(out, count=len(virtual_objects["rows"]))
+        append(_OBJECTS_CLOSE)
+
+        _STAGE_SECTION.write(out, id="stage-params")
+        append(_PARAM_AREA_OPEN)
+        append(_PARAM_AREA_CLOSE)
+        append(_STAGE_SECTION_CLOSE)
+
+        _STAGE_SECTION.write(out, id="stage-control")
+        _CONTROL_FLOW.write(out, text="")
+        append(_STAGE_SECTION_CLOSE)
+        append(_FRAME_CLOSE)
+        html = "".join(out)
+        p.output_size = len(html)
+    return {"html": html, "object_list": virtual_objects, "cards": _CARDS}
+
+
+def _patch(trace: ExecutionTrace, state: StepState) -> dict:
+    return {
+        "step": state.step,
+        "total": len(trace),
+        "text": escape(state.text),
+        "event": state.event.kind,
+        "obj": state.event.obj,
+        "cls": state.cls,
+        "active": state.active,
+        "status": state.status,
+        "initialized": state.initialized,
+        "ctor": state.show_ctor,
+        "pill": _pill(trace, state),
+        "control": state.control,
+    }
+
+
+def create_stage_patch(step: int, parsed_data: dict, trace: Optional[ExecutionTrace] = None) -> Optional[dict]:
+    """Return what the stage changes at ``step``: a few hundred bytes of JSON, or None without data.
+
+    A patch describes the object its event belongs to; the browser works out
+    the cards between it and the object on screen (see ``replay.js``), so
+    its size and cost do not grow with the number of objects or members.
+    ``text``, ``pill`` and ``control`` are HTML, escaped like the frames.
+    """
+    if not _valid(parsed_data):
+        return None
+    trace = trace or compile_trace(parsed_data)
+    return _patch(trace, trace.state(step))
+
+
+_OBJECT_LIST_JS = "<script>" + _read_frontend("object_list.js") + "</script>"
+_REPLAY_JS = "<script>" + _read_frontend("replay.js") + "</script>"
+_TRACE_JS = "<script>" + _read_frontend("trace.js") + "</script>"
+_MOUNT_DOCUMENT = "<script>mountObjectList(document);</script>"
+
+_PLAYER_CSS = """
+      <style>
+        .player-bar {
+          display: flex;
+          gap: 10px;
+          align-items: center;
+          margin-bottom: 12px;
+        }
+        .player-bar button {
+          flex: 1;
+          background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+          color: white;
+          font-size: 16px;
+          font-weight: bold;
+          padding: 10px;
+          border: none;
+          border-radius: 10px;
+          cursor: pointer;
+        }
+        .player-bar button:hover { box-shadow: 0 6px 12px rgba(0,0,0,0.2); }
+        .player-speed {
+          color: #333;
+          font-weight: bold;
+          white-space: nowrap;
+        }
+        .player-progress {
+          height: 10px;
+          background: #DDD;
+          border-radius: 5px;
+          margin-bottom: 12px;
+          overflow: hidden;
+        }
+        .player-progress-fill {
+          height: 100%;
+          background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+          transition: width 0.3s;
+        }
+      </style>
+"""
+
+# Base autoplay interval, the same 1.2 s the server-side autoplay sleeps for.
+_PLAYER_JS = """
+      <script>
+        const stage = document.getElementById("stage");
+        const fill = document.getElementById("progress-fill");
+        const playBtn = document.getElementById("play");
+        const speedInput = document.getElementById("speed");
+        const speedLabel = document.getElementById("speed-label");
+        const trace = compileTrace(TRACE);
+        const last = trace.total - 1;
+        let step = START_STEP;
+        let timer = null;
+
+        function show(i) {
+          step = Math.max(0, Math.min(last, i));
+          applyPatch(stage, stepPatch(trace, step));
+          fill.style.width = ((step + 1) / trace.total * 100) + "%";
+        }
+        function stop() {
+          clearInterval(timer);
+          timer = null;
+          playBtn.textContent = "▶️ Play";
+        }
+        function tick() {
+          show(step + 1);
+          if (step >= last) stop();
+        }
+        function start() {
+          if (step >= last) show(0);
+          clearInterval(timer);
+          timer = setInterval(tick, 1200 / parseFloat(speedInput.value));
+          playBtn.textContent = "⏸️ Pause";
+        }
+        document.getElementById("first").onclick = () => { stop(); show(0); };
+        document.getElementById("prev").onclick = () => { stop(); show(step - 1); };
+        document.getElementById("next").onclick = () => { stop(); show(step + 1); };
+        document.getElementById("last").onclick = () => { stop(); show(last); };
+        playBtn.onclick = () => (timer ? stop() : start());
+        speedInput.oninput = () => {
+          speedLabel.textContent = speedInput.value + "×";
+          if (timer) start();
+        };
+        if (VIRTUAL_LIST) SHELL.object_list = traceObjectList(trace);
+        applyShell(stage, SHELL);
+        show(step);
+      </script>
+"""
+
+
+def _script_json(value) -> str:
+    """JSON that is safe to inline inside a <script> element."""
+    return json.dumps(value).replace("</", "<\\/").replace("<!--", "<\\u0021--")
+
+
+_PLAYER_HEAD = Template("""
+    <html>
+    <head>
+      <meta charset="utf-8" />
+""").render() + ANIMATION_CSS + _PLAYER_CSS + Template("""
+    </head>
+    <body>
+      <div class="player-bar">
+        <button id="first">⏮️ First</button>
+        <button id="prev">⏪ Prev</button>
+        <button id="play">▶️ Play</button>
+        <button id="next">⏩ Next</button>
+        <button id="last">⏭️ Last</button>
+        <label class="player-speed">
+          Speed <input id="speed" type="range" min="0.25" max="3" step="0.25" value="1" />
+          <span id="speed-label">1×</span>
+        </label>
+      </div>
+      <div class="player-progress"><div id="progress-fill" class="player-progress-fill"></div></div>
+      <div id="stage"></div>
+""").render()
+_PLAYER_DATA = Template("""
+      <script>
+        let OBJECT_LIST = null, CARDS = null, OBJECT_STEP = null;
+        const SHELL = {shell};
+        const TRACE = {trace};
+        const VIRTUAL_LIST = {virtual_list};
+        const START_STEP = {start_step};
+      </script>
+""")
+
+
+def trace_spec(trace: ExecutionTrace) -> dict:
+    """The JSON ``trace.js`` compiles back into ``trace``: its classes, and each object's name and arguments."""
+    spec = {
+        "classes": [[c.name, list(c.members), list(c.params)] for c in trace.classes],
+        "objects": [[name, *args] for name, args in trace.objects],
+    }
+    if any(trace.class_of):
+        spec["class_of"] = list(trace.class_of)
+    return spec
+
+
+def create_player_html(parsed_data: dict, start_step: int = 0, trace: Optional[ExecutionTrace] = None) -> str:
+    """Return one HTML document that carries every step and steps through them in JavaScript.
+
+    It holds the stage shell and the trace spec, from which the page builds
+    each step's patch (``trace.js``) and replays it the way the stage
+    component does, so it grows with the objects and never with the steps;
+    a virtualized object list is built from the spec too. Navigation,
+    autoplay and speed changes happen inside the iframe, so they cost no
+    Streamlit reruns.
+    """
+    if not _valid(parsed_data):
+        return _NO_DATA_HTML
+
+    with phase("render_player", len(parsed_data.get("objects", []))) as p:
+        trace = trace or compile_trace(parsed_data)
+        shell = create_stage_shell(parsed_data, trace)
+        virtual_list = shell["object_list"] is not None
+
+        out = [_PLAYER_HEAD]
+        _PLAYER_DATA.write(out, shell=_script_json(dict(shell, object_list=None)),
+                           trace=_script_json(trace_spec(trace)), virtual_list=_script_json(virtual_list),
+                           start_step=trace.clamp(start_step))
+        out.append(_OBJECT_LIST_JS)
+        out.append(_TRACE_JS)
+        out.append(_REPLAY_JS)
+        out.append(_PLAYER_JS)
+        out.append(_DOC_TAIL)
+        html = "".join(out)
+        p.output_size = len(html)
+    return html
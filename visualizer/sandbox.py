@@ -0,0 +1,348 @@
+"""Parse untrusted code in resource-limited worker processes.
+
+The parsers are linear in the size of their input, but they are pure
+Python: run in a script thread, a large or hostile input still holds a
+core, and through the GIL every other session in the server, for as long
+as it takes, and a bug that made some input slow would do the same without
+bound. :class:`ParsePool` runs every parse of user input in worker
+processes instead (``python -m visualizer.sandbox``, each with the parser
+already imported), started before the first job arrives: sources from the
+editor (:func:`parse_source`), uploads streamed by
+:class:`~visualizer.streaming.StreamingParser` (:func:`stream_parse`) and
+multi-file projects (:func:`parse_files`).
+
+* each job may use :data:`PARSE_CPU_LIMIT` seconds of CPU time, plus one
+  second per :data:`PARSE_MIN_RATE` bytes for uploads and projects,
+  enforced with ``RLIMIT_CPU`` inside the worker and by a wall-clock
+  deadline in the caller, which kills a worker that does not answer in time;
+* each worker's address space is capped at :data:`PARSE_MEMORY_LIMIT` bytes
+  with ``RLIMIT_AS``;
+* a worker is replaced after :data:`PARSE_WORKER_MAX_JOBS` jobs, and after
+  any job that hit a limit.
+
+Jobs go to the most recently used idle worker. Workers keep the sections of
+the sources they parsed last, so an edit that names its ``base`` source is
+reparsed incrementally when it lands on the same worker.
+
+A job that hits a limit raises :class:`ParseLimitExceeded`, whose message is
+meant for the user. The caller's thread only waits on a pipe meanwhile, so
+other sessions keep running; a job that reports progress has it handed to
+the caller's callback as it arrives. Where there is no ``resource`` module
+(Windows), every job runs in-process as before.
+"""
+import math
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional
+
+from visualizer.incremental import ReparseCache
+from visualizer.model import compact
+
+try:
+    import resource
+except ImportError:  # not POSIX
+    resource = None
+
+PARSE_SANDBOX = os.environ.get("PARSE_SANDBOX", "1") == "1" and resource is not None
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "2"))
+PARSE_CPU_LIMIT = float(os.environ.get("PARSE_CPU_LIMIT", "2"))
+# Bytes per CPU second an upload or a project is allowed on top of PARSE_CPU_LIMIT.
+PARSE_MIN_RATE = float(os.environ.get("PARSE_MIN_RATE", "50000"))
+PARSE_MEMORY_LIMIT = int(os.environ.get("PARSE_MEMORY_LIMIT", str(512 * 1024 * 1024)))
+PARSE_WORKER_MAX_JOBS = int(os.environ.get("PARSE_WORKER_MAX_JOBS", "200"))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wall-clock seconds per CPU second, plus a fixed allowance, before the caller gives up on a
+# worker; generous, since workers share cores with the server under load.
+_DEADLINE_FACTOR = 2.0
+_DEADLINE_SLACK = 1.0
+
+# Each worker, and the in-process fallback, reparses edits from the sections of the source they edit.
+_reparses = ReparseCache()
+
+
+class ParseLimitExceeded(RuntimeError):
+    """A parse ran out of time or memory, or no worker was free to take it."""
+
+
+class _CPUTimeExceeded(BaseException):
+    # BaseException, so the parser's own ``except Exception`` cannot swallow it.
+    pass
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CPUTimeExceeded()
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+# ---------- jobs ----------
+# Each takes a progress callback first; in a worker, it sends the progress to the caller.
+def _parse_job(report, code: str, key: Optional[str], base: Optional[str]):
+    return compact(_reparses.parse(code, key, base))
+
+
+def _stream_job(report, source, interval: float, preview: int):
+    """Stream-parse a file path or a buffer; ``report(scanned, total, classes, objects, first objects)``."""
+    from visualizer.streaming import StreamingParser
+
+    opened = StreamingParser.from_path(source) if isinstance(source, str) else nullcontext(StreamingParser(source))
+    with opened as parser:
+        objects = []
+        next_update = 0.0
+        for obj in parser.iter_objects():
+            objects.append(obj)
+            now = time.monotonic()
+            if len(objects) <= preview or now >= next_update:
+                next_update = now + interval
+                report(parser.bytes_scanned, parser.total_bytes, len(parser.classes), len(objects), objects[:preview])
+        return compact(parser.result(objects))
+
+
+def _project_job(report, files: Dict[str, str], summaries: Dict[str, tuple]):
+    """Parse a project; return the result and the file summaries made for it, by content key.
+
+    ``summaries`` are the ones the caller already holds. A worker's own
+    cache is lost when it is replaced, so the caller keeps them.
+    """
+    from visualizer.cache import header_cache
+    from visualizer.project import ProjectParser
+
+    for key, summary in summaries.items():
+        header_cache.put(key, summary)
+    parser = ProjectParser(files)
+    return compact(parser.parse_project()), parser.new_summaries
+
+
+_JOBS = {"parse": _parse_job, "stream": _stream_job, "project": _project_job}
+
+
+def _ignore(*progress) -> None:
+    pass
+
+
+def _worker_main(conn, memory_limit: int) -> None:
+    """Serve ``(job, args, cpu limit)`` jobs from ``conn`` until told to stop with ``None``."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the server
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    if memory_limit > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        name, args, cpu_limit = job
+        # RLIMIT_CPU counts the whole process, so each job moves the soft limit past what is spent.
+        resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(_cpu_seconds() + cpu_limit), cpu_hard))
+        try:
+            reply = ("ok", _JOBS[name](lambda *progress: conn.send(("progress", progress)), *args))
+        except _CPUTimeExceeded:
+            reply = ("cpu", None)
+        except MemoryError:
+            reply = ("memory", None)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+        conn.send(reply)
+
+
+class _Worker:
+    # A fresh interpreter rather than a fork: the server's threads and its __main__
+    # (Streamlit's, or AppTest's stand-in) must not leak into the sandbox.
+    __slots__ = ("process", "conn", "jobs")
+
+    def __init__(self, memory_limit: int):
+        from multiprocessing.connection import Connection  # not needed until the pool starts
+
+        ours, theirs = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "visualizer.sandbox", str(theirs.fileno()), str(memory_limit)],
+            cwd=ROOT, pass_fds=(theirs.fileno(),), stdin=subprocess.DEVNULL,
+        )
+        theirs.close()
+        self.conn = Connection(ours.detach())
+        self.jobs = 0
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.conn.close()
+
+
+class ParsePool:
+    """A fixed set of pre-started parse worker processes, shared by every session."""
+
+    def __init__(self, workers: int = PARSE_WORKERS, cpu_limit: float = PARSE_CPU_LIMIT,
+                 memory_limit: int = PARSE_MEMORY_LIMIT, max_jobs: int = PARSE_WORKER_MAX_JOBS):
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.max_jobs = max_jobs
+        # Last in, first out: the worker that parsed the previous version of a text most likely
+        # still holds its sections (see visualizer.incremental), and a warm worker stays warm.
+        self._idle: "queue.LifoQueue[_Worker]" = queue.LifoQueue()
+        self._closed = False
+        for _ in range(max(1, workers)):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.memory_limit)
+
+    def parse(self, code: str, timeout: Optional[float] = None, key: Optional[str] = None,
+              base: Optional[str] = None):
+        """Parse ``code`` in a worker; raise :class:`ParseLimitExceeded` when it breaks a limit.
+
+        ``key`` names the source for a later edit of it, and ``base`` the
+        source it was edited from; see :class:`~visualizer.incremental.ReparseCache`.
+        """
+        return self.run("parse", (code, key, base), timeout=timeout)
+
+    def run(self, job: str, args: tuple, cpu_limit: Optional[float] = None, timeout: Optional[float] = None,
+            on_progress: Optional[Callable] = None):
+        """Run one job in a worker; ``on_progress`` gets whatever progress the job reports.
+
+        ``cpu_limit`` defaults to the pool's, and ``timeout``, the wall-clock
+        deadline, to a multiple of it. Raises :class:`ParseLimitExceeded`.
+        """
+        cpu_limit = self.cpu_limit if cpu_limit is None else cpu_limit
+        deadline = cpu_limit * _DEADLINE_FACTOR + _DEADLINE_SLACK if timeout is None else timeout
+        try:
+            worker = self._idle.get(timeout=deadline)
+        except queue.Empty:
+            raise ParseLimitExceeded("The parser is busy with other requests; please try again.") from None
+        status, result = "lost", None
+        end = time.monotonic() + deadline
+        try:
+            worker.conn.send((job, args, cpu_limit))
+            while True:
+                if not worker.conn.poll(max(0.0, end - time.monotonic())):
+                    status = "cpu"
+                    break
+                status, result = worker.conn.recv()
+                if status != "progress":
+                    break
+                if on_progress is not None:
+                    on_progress(*result)
+        except (EOFError, OSError):
+            pass  # the worker died, most likely killed by the kernel at a hard limit
+        finally:
+            # A job left running, e.g. when on_progress raised, takes its worker with it.
+            worker.jobs += 1
+            self._release(worker, healthy=status == "ok")
+        if status == "ok":
+            return result
+        if status == "cpu":
+            raise ParseLimitExceeded(
+                f"Parsing took longer than {cpu_limit:g} s and was stopped. "
+                "Check the code for unterminated sections or very deep nesting.")
+        if status == "memory":
+            raise ParseLimitExceeded(
+                f"Parsing needed more than {self.memory_limit // (1024 * 1024)} MB and was stopped.")
+        raise ParseLimitExceeded("The parser worker stopped unexpectedly.")
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        if healthy and worker.jobs < self.max_jobs and not self._closed:
+            self._idle.put(worker)
+            return
+        # Retire and replace it off the caller's thread; waiting callers take the next free worker.
+        threading.Thread(target=self._replace, args=(worker, not healthy), name="parse-worker-replace",
+                         daemon=True).start()
+
+    def _replace(self, worker: _Worker, kill: bool) -> None:
+        worker.stop(kill=kill)
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+
+_pool: Optional[ParsePool] = None
+_pool_lock = threading.Lock()
+
+
+def parse_pool() -> ParsePool:
+    """The process-wide pool, started on first use so importing this module stays cheap."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool()
+        return _pool
+
+
+def parse_source(code: str, key: Optional[str] = None, base: Optional[str] = None):
+    """Parse normalized source into a compact result, sandboxed when :data:`PARSE_SANDBOX` is on.
+
+    With the ``base`` source still cached, only the sections the edit changed are rescanned.
+    """
+    if not PARSE_SANDBOX:
+        return _parse_job(_ignore, code, key, base)
+    return parse_pool().parse(code, key=key, base=base)
+
+
+def _size_limit(size: int) -> float:
+    return PARSE_CPU_LIMIT + size / PARSE_MIN_RATE
+
+
+def stream_parse(buf, on_progress: Optional[Callable] = None, interval: float = 0.2, preview: int = 10):
+    """Stream-parse an uploaded buffer into a compact result, sandboxed when :data:`PARSE_SANDBOX` is on.
+
+    ``on_progress(bytes scanned, total bytes, classes, objects, first objects)``
+    is called at most every ``interval`` seconds, and for each of the first
+    ``preview`` objects, which it receives as dicts.
+    """
+    report = _ignore if on_progress is None else on_progress
+    if not PARSE_SANDBOX:
+        return _stream_job(report, buf, interval, preview)
+    # The worker maps the upload from a file rather than receiving a copy through the pipe.
+    with tempfile.NamedTemporaryFile(prefix="upload-", suffix=".cpp", delete=False) as f:
+        f.write(buf)
+    try:
+        return parse_pool().run("stream", (f.name, interval, preview), cpu_limit=_size_limit(len(buf)),
+                                on_progress=report)
+    finally:
+        os.unlink(f.name)
+
+
+def parse_files(files: Dict[str, str], summaries: Optional[Dict[str, tuple]] = None):
+    """Parse a project of ``{path: text}``; see :mod:`visualizer.project`.
+
+    Returns the compact result and the file summaries the parse made, by
+    content key; ``summaries`` are known ones it can start from.
+    """
+    if not PARSE_SANDBOX:
+        return _project_job(_ignore, files, summaries or {})
+    size = sum(len(text) for text in files.values())
+    return parse_pool().run("project", (files, summaries or {}), cpu_limit=_size_limit(size))
+
+
+if __name__ == "__main__":
+    from multiprocessing.connection import Connection
+
+    _worker_main(Connection(int(sys.argv[1])), int(sys.argv[2]))
@@ -0,0 +1,298 @@
+"""Persistent, content-addressed store for parse results and rendered frames.
+
+The caches in :mod:`visualizer.cache` live in one process and are gone
+after every deploy or restart, which is exactly when a lab starts and the
+same course samples are submitted hundreds of times. :class:`ArtifactStore`
+keeps the expensive artifacts on disk in one SQLite database, keyed by the
+source key plus the part of the source they are for (``"parse"``,
+``"shell"``, ``"frame:<step>"``, each tagged with the version of the code
+that made it):
+
+* every write is one transaction, and the database runs in WAL mode, so any
+  number of Streamlit worker processes can read and write it at once and a
+  reader never sees half an entry;
+* the total size of the values is capped at :data:`ARTIFACT_STORE_MAX_BYTES`;
+  a write that goes over it evicts the least recently used entries;
+* :meth:`ArtifactStore.hottest` returns the most used entries, which the
+  app loads into its in-memory caches at startup (see
+  :func:`visualizer.cache.warm_from_store`).
+
+The process-wide store (:func:`artifact_store`) is opt-in: it lives at
+:data:`ARTIFACT_STORE_PATH` when that is set, and the app, which calls
+:func:`enable_default_store`, otherwise keeps it in the user's cache
+directory. Library callers, the API and the tests get no store and write
+nothing to disk unless they set the path.
+
+Values are pickled and compressed. The database is written only by this
+server, so it is trusted like the code itself; a row that no longer
+decodes (a torn page, a class that has since moved) is deleted and read as
+a miss.
+
+Usage::
+
+    python -m visualizer.store [--path PATH] [--clear] [--max-bytes N]
+"""
+import os
+import pickle
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+
+_DEFAULT_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                             "cpp-visualizer", "artifacts.sqlite3")
+# Empty, the default, disables the process-wide store, unless enable_default_store() is called with this unset.
+ARTIFACT_STORE_PATH = os.environ.get("ARTIFACT_STORE_PATH", "")
+ARTIFACT_STORE_MAX_BYTES = int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Eviction frees down to this fraction of the cap, so it does not run on every write.
+_LOW_WATER = 0.9
+# Reads record their use at most this often per entry and process, so hot reads rarely write.
+_TOUCH_INTERVAL = 60.0
+# Past this many remembered uses, the ones older than _TOUCH_INTERVAL, which no longer hold back a write, are dropped.
+_MAX_TOUCHED = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT NOT NULL,
+    part TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    used REAL NOT NULL,
+    PRIMARY KEY (key, part)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS artifacts_used ON artifacts (used);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS artifacts_insert AFTER INSERT ON artifacts
+    BEGIN UPDATE totals SET bytes = bytes + new.size; END;
+CREATE TRIGGER IF NOT EXISTS artifacts_delete AFTER DELETE ON artifacts
+    BEGIN UPDATE totals SET bytes = bytes - old.size; END;
+CREATE TRIGGER IF NOT EXISTS artifacts_update AFTER UPDATE OF size ON artifacts
+    BEGIN UPDATE totals SET bytes = bytes - old.size + new.size; END;
+"""
+
+
+class StoreStats(NamedTuple):
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
+def _dumps(value: Any) -> bytes:
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def _loads(blob: bytes) -> Any:
+    return pickle.loads(zlib.decompress(blob))
+
+
+class ArtifactStore:
+    """A size-capped LRU mapping of ``(key, part)`` to values, in a SQLite file shared by processes."""
+
+    def __init__(self, path: str = _DEFAULT_PATH, max_bytes: int = ARTIFACT_STORE_MAX_BYTES):
+        import sqlite3  # only when the store is used; see bench_startup
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self._sqlite3 = sqlite3
+        self._local = threading.local()
+        self._touched = {}  # (key, part) -> when this process last recorded a use
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; SQLite serializes writers across processes itself.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str, part: str, default: Any = None) -> Any:
+        """The value stored under ``(key, part)``; ``default`` when there is none or the database is unusable."""
+        try:
+            db = self._connect()
+            row = db.execute("SELECT value FROM artifacts WHERE key = ? AND part = ?", (key, part)).fetchone()
+            if row is None:
+                return default
+            now = time.time()
+            if now - self._touched.get((key, part), 0.0) >= _TOUCH_INTERVAL:
+                if len(self._touched) >= _MAX_TOUCHED:
+                    self._forget_touches(now)
+                self._touched[(key, part)] = now
+                db.execute("UPDATE artifacts SET used = ?, hits = hits + 1 WHERE key = ? AND part = ?",
+                           (now, key, part))
+        except self._sqlite3.Error:
+            # Locked past the timeout, or the disk went away: a miss, never an error for the user.
+            return default
+        try:
+            return _loads(row[0])
+        except Exception:
+            self._discard(key, part)
+            return default
+
+    def _forget_touches(self, now: float) -> None:
+        recent = {entry: when for entry, when in list(self._touched.items()) if now - when < _TOUCH_INTERVAL}
+        # Still too many means this many entries are hot at once; forgetting them costs only extra writes.
+        self._touched = recent if len(recent) < _MAX_TOUCHED else {}
+
+    def _discard(self, key: str, part: str) -> None:
+        """Delete an entry that no longer decodes, so it is made again instead of failing every read."""
+        self._touched.pop((key, part), None)
+        try:
+            self._connect().execute("DELETE FROM artifacts WHERE key = ? AND part = ?", (key, part))
+        except self._sqlite3.Error:
+            pass
+
+    def put(self, key: str, part: str, value: Any) -> None:
+        """Store ``value`` under ``(key, part)``, evicting old entries when over the cap; never raises."""
+        blob = _dumps(value)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            self._put(key, part, blob)
+        except self._sqlite3.Error:
+            pass  # the entry is simply not persisted
+
+    def _put(self, key: str, part: str, blob: bytes) -> None:
+        db = self._connect()
+        with self._transaction(db):
+            db.execute(
+                "INSERT INTO artifacts (key, part, value, size, hits, used) VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (key, part) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "used = excluded.used",
+                (key, part, blob, len(blob), time.time()),
+            )
+            total = db.execute("SELECT bytes FROM totals").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(db, total - int(self.max_bytes * _LOW_WATER))
+
+    @staticmethod
+    def _evict(db, excess: int) -> None:
+        """Delete least recently used entries until ``excess`` bytes are freed."""
+        while excess > 0:
+            oldest = db.execute("SELECT key, part, size FROM artifacts ORDER BY used LIMIT 256").fetchall()
+            if not oldest:
+                return
+            doomed: List[Tuple[str, str]] = []
+            for key, part, size in oldest:
+                if excess <= 0:
+                    break
+                doomed.append((key, part))
+                excess -= size
+            db.executemany("DELETE FROM artifacts WHERE key = ? AND part = ?", doomed)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(db):
+        # Take the write lock up front, so two processes never both act on the old total.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def prune(self, max_bytes: Optional[int] = None) -> None:
+        """Evict least recently used entries until the store holds at most ``max_bytes``."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        db = self._connect()
+        with self._transaction(db):
+            total = db.execute("SELECT bytes FROM totals").fetchone()[0]
+            if total > limit:
+                self._evict(db, total - limit)
+
+    def hottest(self, limit: int) -> Iterator[Tuple[str, str, Any]]:
+        """Yield ``(key, part, value)`` for the ``limit`` most used entries, most used first.
+
+        Like :meth:`get`, it skips, and deletes, entries that do not decode, and
+        yields nothing when the database is unusable.
+        """
+        try:
+            rows = self._connect().execute(
+                "SELECT key, part, value FROM artifacts ORDER BY hits DESC, used DESC LIMIT ?", (limit,)
+            ).fetchall()
+        except self._sqlite3.Error:
+            return
+        for key, part, blob in rows:
+            try:
+                value = _loads(blob)
+            except Exception:
+                self._discard(key, part)
+                continue
+            yield key, part, value
+
+    def stats(self) -> StoreStats:
+        db = self._connect()
+        entries = db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        return StoreStats(entries, db.execute("SELECT bytes FROM totals").fetchone()[0], self.max_bytes)
+
+    def clear(self) -> None:
+        db = self._connect()
+        with self._transaction(db):
+            db.execute("DELETE FROM artifacts")
+        self._touched.clear()
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+_path = ARTIFACT_STORE_PATH
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def enable_default_store() -> None:
+    """Keep the process-wide store in the user's cache directory, unless ``ARTIFACT_STORE_PATH`` is set."""
+    global _path
+    if "ARTIFACT_STORE_PATH" not in os.environ:
+        _path = _DEFAULT_PATH
+
+
+def artifact_store() -> Optional[ArtifactStore]:
+    """The process-wide store, opened on first use; None when disabled or the path is unusable."""
+    global _store, _store_failed
+    if _store is not None or _store_failed or not _path:
+        return _store
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = ArtifactStore(_path)
+            except Exception:
+                # A read-only or full disk must not take the app down; it just runs without the store.
+                _store_failed = True
+    return _store
+
+
+def main(argv=None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--path", default=ARTIFACT_STORE_PATH or _DEFAULT_PATH)
+    ap.add_argument("--max-bytes", type=int, default=ARTIFACT_STORE_MAX_BYTES,
+                    help="evict least recently used entries down to this size")
+    ap.add_argument("--clear", action="store_true", help="delete every entry")
+    args = ap.parse_args(argv)
+
+    store = ArtifactStore(args.path, args.max_bytes)
+    if args.clear:
+        store.clear()
+    else:
+        store.prune()
+    entries, size, cap = store.stats()
+    print(f"{args.path}: {entries} entries, {size:,} bytes of {cap:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+"""Incremental parsing of large sources from a memory-mapped file or buffer.
+
+:class:`StreamingParser` runs the same recognizer as
+:class:`~visualizer.parser.CPPCodeParser`, but over a token stream read
+straight out of a bytes buffer. It keeps only the current top-level
+declaration, or inside ``main`` only the current statement, so memory stays
+bounded by the largest single declaration rather than by the file size.
+Objects declared in ``main`` are yielded as soon as their statement ends.
+
+A declaration or statement longer than :data:`STREAMING_MAX_STATEMENT`
+bytes stops the scan with an error instead of being buffered, so the bound
+holds whatever the input looks like; every step of the scan is linear in
+the size of what it buffers.
+"""
+import os
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from visualizer.parser import CPPCodeParser, Token, pair_brackets, tokenize_buffer
+
+STREAMING_MAX_STATEMENT = int(os.environ.get("STREAMING_MAX_STATEMENT", str(1024 * 1024)))
+
+
+class _BufferText:
+    """Slice a byte buffer the way the recognizer slices a ``str`` source."""
+
+    __slots__ = ("_buf",)
+
+    def __init__(self, buf):
+        self._buf = buf
+
+    def __getitem__(self, span: slice) -> str:
+        return bytes(self._buf[span]).decode("utf-8", "replace")
+
+
+class StreamingParser(CPPCodeParser):
+    """Parse a bytes-like buffer incrementally; iterate :meth:`iter_objects` to drive it.
+
+    Each class enters the symbol table, with its members and constructor
+    parameters, as soon as its definition has been read, which is before any
+    object of it in ``main`` is yielded. ``bytes_scanned`` and
+    ``total_bytes`` report progress.
+    """
+
+    def __init__(self, buf, max_statement: int = STREAMING_MAX_STATEMENT):
+        super().__init__()
+        self.max_statement = max_statement
+        self._buf = buf
+        self._text = _BufferText(buf)
+        self.total_bytes = len(buf)
+        self.bytes_scanned = 0
+        self._has_ctor = set()  # classes whose constructor was found in their definition
+
+    @classmethod
+    @contextmanager
+    def from_path(cls, path: str) -> Iterator["StreamingParser"]:
+        """Memory-map ``path`` read-only for the duration of the ``with`` block."""
+        import mmap
+        with open(path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                yield cls(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield cls(mapped)
+
+    def iter_objects(self) -> Iterator[dict]:
+        """Scan the buffer, yielding each object found in ``main`` as it is found."""
+        self.class_name = ""
+        self.private_members = []
+        self.constructor_params = []
+        self.objects = []
+        self.classes = []
+        self.symbols = {}
+        self.error = None
+        self._has_ctor = set()
+        out_of_class_ctors = {}
+
+        chunk: List[Token] = []  # current top-level declaration
+        depth = 0
+        main_head = False  # the chunk has int main( in it
+        in_main = False
+        statement: List[Token] = []  # current statement inside main
+        parens = 0  # open ( and [ inside the current main statement
+        braces = 0  # open { of the statement's own, as in Cls a{1, 2
+        blocks = 0  # open { blocks inside main, counting main's own body
+
+        for tok in tokenize_buffer(self._buf):
+            self.bytes_scanned = tok.end
+            text = tok.text if tok.kind == "op" else None
+
+            if in_main:
+                if text in ("(", "["):
+                    parens += 1
+                elif text in (")", "]"):
+                    parens = max(0, parens - 1)
+                elif not parens and text == "{" and (not statement or statement[-1].text in (")", "else", "do", "try")):
+                    # A block such as if (...) { or else { -- not brace-initialisation.
+                    statement.clear()
+                    braces = 0
+                    blocks += 1
+                    continue
+                elif not parens and text == "}" and braces <= 0:
+                    statement.clear()
+                    braces = 0
+                    blocks -= 1
+                    if blocks == 0:
+                        in_main = False
+                    continue
+                if text == "{":
+                    braces += 1
+                elif text == "}":
+                    braces -= 1
+                statement.append(tok)
+                if text == ";" and not parens:
+                    if self.symbols:
+                        yield from self._statement_objects(statement)
+                    statement.clear()
+                    braces = 0
+                elif tok.end - statement[0].start > self.max_statement:
+                    self._too_long(statement[0].start)
+                    return
+                continue
+
+            if text in ("(", "[", "{"):
+                if text == "{" and depth == 0 and main_head and chunk[-1].text == ")":
+                    chunk.clear()
+                    main_head = False
+                    in_main = True
+                    blocks = 1
+                    continue
+                if text == "(" and len(chunk) >= 2 and chunk[-1].text == "main" and chunk[-2].text == "int":
+                    main_head = True
+                depth += 1
+            elif text in (")", "]", "}"):
+                depth = max(0, depth - 1)
+            chunk.append(tok)
+            if depth == 0 and text in (";", "}"):
+                self._scan_chunk(chunk, out_of_class_ctors)
+                chunk.clear()
+                main_head = False
+            elif tok.end - chunk[0].start > self.max_statement:
+                self._too_long(chunk[0].start)
+                return
+
+        if chunk:
+            self._scan_chunk(chunk, out_of_class_ctors)
+        if not self.classes:
+            self.error = "No class found. Please include a C++ class definition."
+        for symbol in self.classes:
+            if symbol["name"] not in self._has_ctor and symbol["name"] in out_of_class_ctors:
+                symbol["constructor_params"] = out_of_class_ctors[symbol["name"]]
+        self._set_primary()
+
+    def result(self, objects: List[dict]) -> dict:
+        """The same dict ``CPPCodeParser.parse`` returns, once :meth:`iter_objects` is exhausted."""
+        if self.error:
+            return {"error": self.error}
+        return {
+            "class_name": self.class_name,
+            "private_members": self.private_members,
+            "constructor_params": self.constructor_params,
+            "objects": objects,
+            "classes": self.classes,
+            "error": None
+        }
+
+    # ---------- per-chunk recognition ----------
+    def _too_long(self, start: int) -> None:
+        self.error = (f"The declaration at byte {start} is longer than {self.max_statement} bytes; "
+                      f"split it up or raise STREAMING_MAX_STATEMENT.")
+
+    def _scan_chunk(self, chunk: List[Token], out_of_class_ctors: dict) -> None:
+        partner = pair_brackets(chunk)
+        definitions, _main, ctors = self._scan_translation_unit(chunk, partner)
+        for name, (a, b) in ctors.items():
+            out_of_class_ctors.setdefault(name, self._param_names(chunk, partner, a, b))
+        for kind, name, body in definitions:
+            if name in self.symbols:
+                continue
+            ctor_parens = self._add_class(chunk, partner, kind, name, body)
+            if ctor_parens is not None:
+                self.symbols[name]["constructor_params"] = self._param_names(chunk, partner, *ctor_parens)
+                self._has_ctor.add(name)
+        self._set_primary()
+
+    def _statement_objects(self, statement: List[Token]) -> Iterator[dict]:
+        before = len(self.objects)
+        self._scan_main(self._text, statement, pair_brackets(statement), 0, len(statement))
+        new = self.objects[before:]
+        # The parent class accumulates into self.objects; hand them over instead.
+        del self.objects[before:]
+        yield from new
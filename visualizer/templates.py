@@ -0,0 +1,71 @@
+"""A tiny template layer compiled once at import.
+
+Templates use ``str.format`` field syntax and are compiled into f-string
+functions. Static parts of a document, such as the head and the CSS, are
+rendered once into plain strings; dynamic fragments are rendered individually
+and appended to one list that is joined at the end, so nothing is
+re-formatted and no string grows by repeated ``+=``.
+"""
+import re
+from string import Formatter
+from typing import List, Tuple
+
+_BETWEEN_TAGS_RE = re.compile(r">\s+<")
+_LEADING_SPACE_RE = re.compile(r"\n\s*")
+
+
+# The same replacements as html.escape(quote=True), in one pass.
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+
+
+def escape(value) -> str:
+    """Escape user text for an HTML text node or a quoted attribute value."""
+    return str(value).translate(_ESCAPES)
+
+
+def escape_all(values) -> Tuple[str, ...]:
+    """:func:`escape` every string in ``values``."""
+    return tuple(value.translate(_ESCAPES) for value in values)
+
+
+class Template:
+    """``str.format``-style template compiled once, at import, into a function.
+
+    Compiling minifies the markup and turns the template into a generated
+    function returning an f-string, so rendering costs the same as a
+    hand-written f-string and a missing value fails loudly. Values are written
+    verbatim; callers escape user text once, before rendering, with
+    :func:`escape`.
+    """
+
+    __slots__ = ("source", "fields", "format")
+
+    def __init__(self, source: str, minify: bool = True):
+        if minify:
+            source = _BETWEEN_TAGS_RE.sub("><", _LEADING_SPACE_RE.sub("\n", source.strip()))
+        self.source = source
+
+        fields: List[str] = []
+        body: List[str] = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            body.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise ValueError(f"template field must be a plain name: {field!r}")
+            if field not in fields:
+                fields.append(field)
+            body.append("{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+        self.fields = tuple(fields)
+
+        namespace: dict = {}
+        exec(f"def format({', '.join(fields)}):\n    return f{''.join(body)!r}\n", namespace)
+        # Hot loops call ``format`` directly to skip one Python-level frame.
+        self.format = namespace["format"]
+
+    def write(self, out: List[str], **values) -> None:
+        """Append the rendered template to ``out``."""
+        out.append(self.format(**values))
+
+    def render(self, **values) -> str:
+        return self.format(**values)
@@ -0,0 +1,197 @@
+"""Lightweight per-phase timing and opt-in profiling.
+
+Code marks its phases with :func:`phase`. Phases are recorded only while a
+:func:`collect` block is active in the current context (Streamlit runs each
+script rerun in its own thread, so traces never mix between sessions);
+otherwise ``phase`` costs one context-variable lookup.
+
+:func:`timed_imports` times a block of imports and records which modules
+it loaded, which is how a script's cold-start import cost is reported. It
+compares ``sys.modules`` before and after rather than hooking
+``__import__``, so imports elsewhere in the process cost nothing extra; for
+a per-module breakdown, run under ``python -X importtime`` (see
+``benchmarks/bench_startup.py``).
+
+Finished traces are logged as one JSON object per line on the
+``visualizer.timing`` logger. Set ``VISUALIZER_TIMING_LOG`` to a file path,
+or to ``-`` for stderr, to write them out.
+"""
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger("visualizer.timing")
+
+_log_target = os.environ.get("VISUALIZER_TIMING_LOG")
+if _log_target:
+    _handler = logging.StreamHandler(sys.stderr) if _log_target == "-" else logging.FileHandler(_log_target)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Phase:
+    __slots__ = ("name", "seconds", "input_size", "output_size")
+
+    def __init__(self, name: str, input_size: Optional[int] = None):
+        self.name = name
+        self.seconds = 0.0
+        self.input_size = input_size
+        self.output_size: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return {"phase": self.name, "seconds": round(self.seconds, 6),
+                "input_size": self.input_size, "output_size": self.output_size}
+
+
+class Trace:
+    """The phases recorded during one request, in the order they finished."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.phases: List[Phase] = []
+        self.seconds = 0.0
+        self.input_size: Optional[int] = None
+        self.output_size: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "trace": self.name,
+            "seconds": round(self.seconds, 6),
+            "input_size": self.input_size,
+            "output_size": self.output_size,
+            "phases": [p.to_dict() for p in self.phases],
+        }
+
+
+class ImportTrace(Trace):
+    """A :func:`timed_imports` trace: ``modules`` lists the modules the block loaded."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.modules: List[str] = []
+
+    def to_dict(self) -> dict:
+        return dict(super().to_dict(), modules=self.modules)
+
+
+class _NullPhase:
+    """Stand-in yielded when nothing is collecting; attribute writes are dropped."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+_current: ContextVar[Optional[Trace]] = ContextVar("visualizer_trace", default=None)
+
+
+@contextmanager
+def phase(name: str, input_size: Optional[int] = None) -> Iterator[Phase]:
+    """Time the enclosed block as one phase of the active trace.
+
+    Set ``output_size`` on the yielded object to record how much the phase
+    produced.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield _NULL_PHASE
+        return
+    record = Phase(name, input_size)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        trace.phases.append(record)
+
+
+@contextmanager
+def collect(name: str) -> Iterator[Trace]:
+    """Record every :func:`phase` in the enclosed block into a new trace, then log it."""
+    trace = Trace(name)
+    token = _current.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.seconds = time.perf_counter() - start
+        _current.reset(token)
+        _log(trace)
+
+
+def _log(trace: Trace) -> None:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(trace.to_dict()))
+
+
+_imports_lock = threading.Lock()
+_import_traces: List[ImportTrace] = []
+
+
+@contextmanager
+def timed_imports(name: str = "imports") -> Iterator[ImportTrace]:
+    """Time the enclosed block and record the modules it loaded into ``sys.modules``.
+
+    Modules already loaded do not count, so wrapping a script's imports
+    reports them on the process's first run and nothing on later reruns.
+    A trace that loaded anything is logged and kept for :func:`import_traces`;
+    its time includes any other work in the block.
+    """
+    trace = ImportTrace(name)
+    before = set(sys.modules)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.seconds = time.perf_counter() - start
+        # Another thread may import meanwhile; its modules are counted too.
+        trace.modules = sorted(set(sys.modules) - before)
+        trace.output_size = len(trace.modules)
+        if trace.modules:
+            with _imports_lock:
+                _import_traces.append(trace)
+            _log(trace)
+
+
+def import_traces() -> List[ImportTrace]:
+    """Every non-empty :func:`timed_imports` trace recorded in this process, oldest first."""
+    with _imports_lock:
+        return list(_import_traces)
+
+
+class Profile:
+    """Text report of an opt-in cProfile capture; empty when profiling was off."""
+
+    def __init__(self):
+        self.text = ""
+
+
+@contextmanager
+def profiled(enabled: bool, limit: int = 30) -> Iterator[Profile]:
+    """Run the enclosed block under cProfile when ``enabled``."""
+    result = Profile()
+    if not enabled:
+        yield result
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        result.text = out.getvalue()